@@ -7,6 +7,9 @@ from collections import defaultdict
 import time
 import gc
 
+from kanji_matcher import get_matcher
+from kanji_normalize import clean_kanji_word, is_clean_key, normalize_for_matching, to_original_span
+
 # Compile regex patterns một lần duy nhất để tăng tốc
 KANJI_PATTERN = re.compile(r'[\u4e00-\u9fff]')
 JAPANESE_PATTERN = re.compile(r'[\u3040-\u309f\u30a0-\u30ff\u4e00-\u9fff]')
@@ -59,21 +62,6 @@ def has_japanese(text):
     """Kiểm tra xem text có chứa ký tự tiếng Nhật không"""
     return bool(JAPANESE_PATTERN.search(text))
 
-def clean_kanji_word(word):
-    """Làm sạch từ Kanji bằng cách loại bỏ ký tự không phải tiếng Nhật, nhưng giữ lại dấu câu tiếng Nhật"""
-    radical_to_kanji = {
-        "⼀": "一", "⼁": "｜", "⼂": "丶", "⼃": "丿", "⼄": "乙", "⼅": "亅", "⼆": "二", "⼇": "亠", "⼈": "人", "⼉": "儿", "⼊": "入", "⼋": "八", "⼌": "冂", "⼍": "冖", "⼎": "冫", "⼏": "几", "⼐": "凵", "⼑": "刀", "⼒": "力", "⼓": "勹", "⼔": "匕", "⼕": "匚", "⼖": "匸", "⼗": "十", "⼘": "卜", "⼙": "卩", "⼚": "厂", "⼛": "厶", "⼜": "又", "⼝": "口", "⼞": "囗", "⼟": "土", "⼠": "士", "⼡": "夂", "⼢": "夊", "⼣": "夕", "⼤": "大", "⼥": "女", "⼦": "子", "⼧": "宀", "⼨": "寸", "⼩": "小", "⼪": "尢", "⼫": "尸", "⼬": "屮", "⼭": "山", "⼮": "巛", "⼯": "工", "⼰": "己", "⼱": "巾", "⼲": "干", "⼳": "幺", "⼴": "广", "⼵": "廴", "⼶": "廾", "⼷": "弋", "⼸": "弓", "⼹": "彐", "⼺": "彡", "⼻": "彳", "⼼": "心", "⼽": "戈", "⼾": "戸", "⼿": "手", "⽀": "支", "⽁": "攴", "⽂": "文", "⽃": "斗", "⽄": "斤", "⽅": "方", "⽆": "无", "⽇": "日", "⽈": "曰", "⽉": "月", "⽊": "木", "⽋": "欠", "⽌": "止", "⽍": "歹", "⽎": "殳", "⽏": "毋", "⽐": "比", "⽑": "毛", "⽒": "氏", "⽓": "气", "⽔": "水", "⽕": "火", "⽖": "爪", "⽗": "父", "⽘": "爻", "⽙": "爿", "⽚": "片", "⽛": "牙", "⽜": "牛", "⽝": "犬", "⽞": "玄", "⽟": "玉", "⽠": "瓜", "⽡": "瓦", "⽢": "甘", "⽣": "生", "⽤": "用", "⽥": "田", "⽦": "疋", "⽧": "疒", "⽨": "癶", "⽩": "白", "⽪": "皮", "⽫": "皿", "⽬": "目", "⽭": "矛", "⽮": "矢", "⽯": "石", "⽰": "示", "⽱": "禸", "⽲": "禾", "⽳": "穴", "⽴": "立", "⽵": "竹", "⽶": "米", "⽷": "糸", "⽸": "缶", "⽹": "网", "⽺": "羊", "⽻": "羽", "⽼": "老", "⽽": "而", "⽾": "耒", "⽿": "耳", "⾀": "聿", "⾁": "肉", "⾂": "臣", "⾃": "自", "⾄": "至", "⾅": "臼", "⾆": "舌", "⾇": "舛", "⾈": "舟", "⾉": "艮", "⾊": "色", "⾋": "艸", "⾌": "虍", "⾍": "虫", "⾎": "血", "⾏": "行", "⾐": "衣", "⾑": "襾", "⾒": "見", "⾓": "角", "⾔": "言", "⾕": "谷", "⾖": "豆", "⾗": "豕", "⾘": "豸", "⾙": "貝", "⾚": "赤", "⾛": "走", "⾜": "足", "⾝": "身", "⾞": "車", "⾟": "辛", "⾠": "辰", "⾡": "辵", "⾢": "邑", "⾣": "酉", "⾤": "釆", "⾥": "里", "⾦": "金", "⾧": "長", "⾨": "門", "⾩": "阜", "⾪": "隶", "⾫": "隹", "⾬": "雨", "⾭": "青", "⾮": "非", "⾯": "面", "⾰": "革", "⾱": "韋", "⾲": "韭", "⾳": "音", "⾴": "頁", "⾵": "風", "⾶": "飛", "⾷": "食", "⾸": "首", "⾹": "香", "⾺": "馬", "⾻": "骨", "⾼": "高", "⾽": "髟", "⾾": "鬥", "⾿": "鬯", "⿀": "鬲", "⿁": "鬼", "⿂": "魚", "⿃": "鳥", "⿄": "鹵", "⿅": "鹿", "⿆": "麦", "⿇": "麻", "⿈": "黄", "⿉": "黍", "⿊": "黒", "⿋": "黹", "⿌": "黽", "⿍": "鼎", "⿎": "鼓", "⿏": "鼠", "⿐": "鼻", "⿑": "齊", "⿒": "歯", "⿓": "竜", "⿔": "亀", "⿕": "龠"
-    }
-    # Thay thế các radical bằng Kanji chuẩn
-    word = ''.join([radical_to_kanji.get(ch, ch) for ch in word])
-    # Giữ lại các dấu câu tiếng Nhật phổ biến
-    cleaned = re.sub(
-        r'[^\u3040-\u309f\u30a0-\u30ff\u4e00-\u9fff0-9０-９、。！？「」『』（）［］【】〈〉《》〔〕…‥ー～—・：；]', 
-        '', 
-        word
-    )
-    return cleaned
-
 def extract_kanji_words(text):
     """Trích xuất tất cả các từ có chứa Kanji từ text"""
     kanji_words = set()
@@ -166,55 +154,25 @@ def create_ruby_element(kanji, hiragana, source_run=None):
     return ruby
 
 def find_kanji_matches_optimized(text, dictionary):
-    """Tìm matches với thuật toán cải tiến - tìm tất cả từ có thể"""
+    """Tìm matches bằng automaton - chuẩn hóa text 1 lần, quét 1 lần, ưu tiên từ dài -> ngắn như cũ"""
     if not text or not has_japanese(text):
         return []
     
-    matches = []
-    text_len = len(text)
-    covered = [False] * text_len  # Theo dõi vị trí đã được xử lý
+    matcher = get_matcher(dictionary, key_filter=is_clean_key)
+    normalized, offsets = normalize_for_matching(text)
+    spans, covered = matcher.find_spans(normalized)
     
-    # Lần 1: Tìm từ dài nhất trước (ưu tiên từ ghép)
-    for length in range(min(12, text_len), 2, -1):  # Từ 12 ký tự xuống 3 ký tự
-        for i in range(text_len - length + 1):
-            if any(covered[i:i+length]):  # Bỏ qua nếu đã có ruby
-                continue
-                
-            substring = text[i:i+length]
-            cleaned_substring = clean_kanji_word(substring)
-            
-            if (cleaned_substring and 
-                has_kanji(cleaned_substring) and 
-                cleaned_substring in dictionary):
-                matches.append((i, i + length, cleaned_substring, dictionary[cleaned_substring]))
-                # Đánh dấu vùng đã xử lý
-                for j in range(i, i + length):
-                    covered[j] = True
-    
-    # Lần 2: Tìm từ ngắn (1-2 ký tự) cho những vị trí chưa xử lý
-    for length in range(2, 0, -1):  # 2 ký tự rồi 1 ký tự
-        for i in range(text_len - length + 1):
-            if any(covered[i:i+length]):  # Bỏ qua nếu đã có ruby
-                continue
-                
-            substring = text[i:i+length]
-            cleaned_substring = clean_kanji_word(substring)
-            
-            if (cleaned_substring and 
-                has_kanji(cleaned_substring) and 
-                cleaned_substring in dictionary):
-                matches.append((i, i + length, cleaned_substring, dictionary[cleaned_substring]))
-                # Đánh dấu vùng đã xử lý
-                for j in range(i, i + length):
-                    covered[j] = True
+    matches = []
+    for start, end in spans:
+        key = normalized[start:end]
+        orig_start, orig_end = to_original_span(start, end, offsets)
+        matches.append((orig_start, orig_end, key, dictionary[key]))
     
     # Ghi lại các Kanji không tìm thấy
-    for i in range(text_len):
-        if not covered[i] and has_kanji(text[i]):
-            missing_kanji.add(text[i])
+    for m in KANJI_PATTERN.finditer(normalized):
+        if not covered[m.start()]:
+            missing_kanji.add(m.group())
     
-    # Sắp xếp matches theo vị trí
-    matches.sort(key=lambda x: x[0])
     return matches
 
 def has_section_break(paragraph):
@@ -1,20 +1,48 @@
+import argparse
+import cProfile
+import glob
 import json
+import math
+import os
+import pstats
 import re
+import sys
 import time
+import tracemalloc
 import gc
 from collections import defaultdict
+from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from docx import Document
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
+from lxml import etree
+
+from char_classes import CJK_CHARS, JAPANESE_PATTERN, KANJI_CHARS, KANJI_PATTERN
+from compiled_dict import (
+    COMPILED_SUFFIX,
+    CompiledDictionary,
+    SourceDictionary,
+    compiled_path_for,
+    fingerprint_hex,
+    is_compiled_fresh,
+    source_fingerprint,
+    write_compiled_dictionary,
+)
+from kanji_matcher import get_matcher
+from kanji_reading_index import KanjiReadingIndex
+from kanji_normalize import is_clean_key, normalize_for_matching, to_original_span
+from match_cache import MatchCache
+from process_pool import pool_context
+from reading_index import ReadingIndex
+from ruby_instrument import instrument
+from ruby_manifest import RubyManifest, manifest_path_for
 
 # =========================
-# Regex compile (tăng tốc)
+# Lớp ký tự (regex/frozenset dùng chung trong char_classes):
+# KANJI_PATTERN cho "có kanji trong chuỗi", KANJI_CHARS cho "một ký tự kanji" (kể cả 々)
 # =========================
-KANJI_PATTERN = re.compile(r'[\u4e00-\u9fff]')                 # dùng cho "có kanji trong chuỗi"
-KANJI_CHAR_PATTERN = re.compile(r'[\u4e00-\u9fff々]')          # dùng cho "một ký tự kanji"
-JAPANESE_PATTERN = re.compile(r'[\u3040-\u309f\u30a0-\u30ff\u4e00-\u9fff]')
-
 # Set để lưu các kanji không tìm thấy
 missing_kanji = set()
 
@@ -26,7 +54,7 @@ def has_kanji(text: str) -> bool:
 
 def is_kanji_char(ch: str) -> bool:
     """Kiểm tra 1 ký tự có phải kanji không"""
-    return bool(KANJI_CHAR_PATTERN.fullmatch(ch or ""))
+    return ch in KANJI_CHARS
 
 
 def has_japanese(text: str) -> bool:
@@ -37,6 +65,7 @@ def has_japanese(text: str) -> bool:
 # =========================================
 # Copy formatting (giữ nguyên định dạng run)
 # =========================================
+@instrument.timed("run_copy")
 def copy_run_rpr(src_run, dst_run):
     """Copy toàn bộ run properties (rPr) từ src_run sang dst_run"""
     try:
@@ -66,46 +95,6 @@ def copy_run_formatting(source_run, target_rpr):
                     pass
 
 
-# =========================================
-# Clean word (radical -> kanji, remove noise)
-# =========================================
-def clean_kanji_word(word: str) -> str:
-    """Làm sạch từ Kanji: thay radical, loại bỏ ký tự không phải tiếng Nhật (giữ dấu câu JP)"""
-    radical_to_kanji = {
-        "⼀": "一", "⼁": "｜", "⼂": "丶", "⼃": "丿", "⼄": "乙", "⼅": "亅", "⼆": "二", "⼇": "亠", "⼈": "人", "⼉": "儿",
-        "⼊": "入", "⼋": "八", "⼌": "冂", "⼍": "冖", "⼎": "冫", "⼏": "几", "⼐": "凵", "⼑": "刀", "⼒": "力", "⼓": "勹",
-        "⼔": "匕", "⼕": "匚", "⼖": "匸", "⼗": "十", "⼘": "卜", "⼙": "卩", "⼚": "厂", "⼛": "厶", "⼜": "又", "⼝": "口",
-        "⼞": "囗", "⼟": "土", "⼠": "士", "⼡": "夂", "⼢": "夊", "⼣": "夕", "⼤": "大", "⼥": "女", "⼦": "子", "⼧": "宀",
-        "⼨": "寸", "⼩": "小", "⼪": "尢", "⼫": "尸", "⼬": "屮", "⼭": "山", "⼮": "巛", "⼯": "工", "⼰": "己", "⼱": "巾",
-        "⼲": "干", "⼳": "幺", "⼴": "广", "⼵": "廴", "⼶": "廾", "⼷": "弋", "⼸": "弓", "⼹": "彐", "⼺": "彡", "⼻": "彳",
-        "⼼": "心", "⼽": "戈", "⼾": "戸", "⼿": "手", "⽀": "支", "⽁": "攴", "⽂": "文", "⽃": "斗", "⽄": "斤", "⽅": "方",
-        "⽆": "无", "⽇": "日", "⽈": "曰", "⽉": "月", "⽊": "木", "⽋": "欠", "⽌": "止", "⽍": "歹", "⽎": "殳", "⽏": "毋",
-        "⽐": "比", "⽑": "毛", "⽒": "氏", "⽓": "气", "⽔": "水", "⽕": "火", "⽖": "爪", "⽗": "父", "⽘": "爻", "⽙": "爿",
-        "⽚": "片", "⽛": "牙", "⽜": "牛", "⽝": "犬", "⽞": "玄", "⽟": "玉", "⽠": "瓜", "⽡": "瓦", "⽢": "甘", "⽣": "生",
-        "⽤": "用", "⽥": "田", "⽦": "疋", "⽧": "疒", "⽨": "癶", "⽩": "白", "⽪": "皮", "⽫": "皿", "⽬": "目", "⽭": "矛",
-        "⽮": "矢", "⽯": "石", "⽰": "示", "⽱": "禸", "⽲": "禾", "⽳": "穴", "⽴": "立", "⽵": "竹", "⽶": "米", "⽷": "糸",
-        "⽸": "缶", "⽹": "网", "⽺": "羊", "⽻": "羽", "⽼": "老", "⽽": "而", "⽾": "耒", "⽿": "耳", "⾀": "聿", "⾁": "肉",
-        "⾂": "臣", "⾃": "自", "⾄": "至", "⾅": "臼", "⾆": "舌", "⾇": "舛", "⾈": "舟", "⾉": "艮", "⾊": "色", "⾋": "艸",
-        "⾌": "虍", "⾍": "虫", "⾎": "血", "⾏": "行", "⾐": "衣", "⾑": "襾", "⾒": "見", "⾓": "角", "⾔": "言", "⾕": "谷",
-        "⾖": "豆", "⾗": "豕", "⾘": "豸", "⾙": "貝", "⾚": "赤", "⾛": "走", "⾜": "足", "⾝": "身", "⾞": "車", "⾟": "辛",
-        "⾠": "辰", "⾡": "辵", "⾢": "邑", "⾣": "酉", "⾤": "釆", "⾥": "里", "⾦": "金", "⾧": "長", "⾨": "門", "⾩": "阜",
-        "⾪": "隶", "⾫": "隹", "⾬": "雨", "⾭": "青", "⾮": "非", "⾯": "面", "⾰": "革", "⾱": "韋", "⾲": "韭", "⾳": "音",
-        "⾴": "頁", "⾵": "風", "⾶": "飛", "⾷": "食", "⾸": "首", "⾹": "香", "⾺": "馬", "⾻": "骨", "⾼": "高", "⾽": "髟",
-        "⾾": "鬥", "⾿": "鬯", "⿀": "鬲", "⿁": "鬼", "⿂": "魚", "⿃": "鳥", "⿄": "鹵", "⿅": "鹿", "⿆": "麦", "⿇": "麻",
-        "⿈": "黄", "⿉": "黍", "⿊": "黒", "⿋": "黹", "⿌": "黽", "⿍": "鼎", "⿎": "鼓", "⿏": "鼠", "⿐": "鼻", "⿑": "齊",
-        "⿒": "歯", "⿓": "竜", "⿔": "亀", "⿕": "龠"
-    }
-
-    word = ''.join([radical_to_kanji.get(ch, ch) for ch in (word or "")])
-
-    cleaned = re.sub(
-        r'[^\u3040-\u309f\u30a0-\u30ff\u4e00-\u9fff0-9０-９、。！？「」『』（）［］【】〈〉《》〔〕…‥ー～—・：；]',
-        '',
-        word
-    )
-    return cleaned
-
-
 # =========================================
 # Dictionary schema mới/cũ -> normalize
 # =========================================
@@ -176,35 +165,72 @@ def _normalize_dict_value(key: str, val):
     return None
 
 
-def load_dictionary(dictionary_path):
-    """Đọc dictionary từ file JSON và tối ưu hóa cho tìm kiếm nhanh (schema mới/cũ)"""
-    print("Đang load dictionary...")
-    start_time = time.time()
+def _load_dictionary_json(dictionary_path):
+    """Đọc file JSON, lọc key và chuẩn hóa value (schema mới/cũ)"""
+    with open(dictionary_path, 'r', encoding='utf-8') as f:
+        dictionary = json.load(f)
 
-    try:
-        with open(dictionary_path, 'r', encoding='utf-8') as f:
-            dictionary = json.load(f)
+    optimized_dict = {}
+    for key, val in dictionary.items():
+        if (has_kanji(key) and
+            1 <= len(key) <= 12 and
+            not re.search(r'[a-zA-Z0-9]', key)):
+
+            norm = _normalize_dict_value(key, val)
+            if norm is None:
+                continue
 
-        optimized_dict = {}
-        kanji_count = 0
+            optimized_dict[key] = norm
 
-        for key, val in dictionary.items():
-            if (has_kanji(key) and
-                1 <= len(key) <= 12 and
-                not re.search(r'[a-zA-Z0-9]', key)):
+    return optimized_dict
 
-                norm = _normalize_dict_value(key, val)
-                if norm is None:
-                    continue
 
-                optimized_dict[key] = norm
-                kanji_count += 1
+def compile_dictionary(dictionary_path, compiled_path=None):
+    """Build file dictionary binary (mmap được) từ file JSON; trả về dict đã chuẩn hóa"""
+    compiled_path = compiled_path or compiled_path_for(dictionary_path)
+    fingerprint = source_fingerprint(dictionary_path)
+    optimized_dict = _load_dictionary_json(dictionary_path)
+    write_compiled_dictionary(optimized_dict, compiled_path, fingerprint)
+    print(f"Đã compile {len(optimized_dict)} từ Kanji -> {compiled_path}")
+    return SourceDictionary(optimized_dict, fingerprint_hex(fingerprint[2]))
+
+
+def load_dictionary(dictionary_path):
+    """
+    Đọc dictionary và tối ưu hóa cho tìm kiếm nhanh (schema mới/cũ).
+    - Ưu tiên file compiled (.rubydict) cạnh file JSON -> mmap, gần như tức thì
+    - File JSON đổi (mtime/hash) hoặc chưa có file compiled -> parse JSON rồi compile lại
+    - Có thể truyền thẳng đường dẫn .rubydict
+    """
+    print("Đang load dictionary...")
+    start_time = time.time()
 
-        sorted_dict = dict(sorted(optimized_dict.items(), key=lambda x: len(x[0]), reverse=True))
+    try:
+        if dictionary_path.endswith(COMPILED_SUFFIX):
+            dictionary = CompiledDictionary(dictionary_path)
+            source = "compiled"
+        else:
+            compiled_path = compiled_path_for(dictionary_path)
+            dictionary = None
+            if is_compiled_fresh(compiled_path, dictionary_path):
+                try:
+                    dictionary = CompiledDictionary(compiled_path)
+                    source = "compiled"
+                except ValueError as e:
+                    # file compiled hỏng nhưng JSON nguồn còn -> compile lại thay vì trả dictionary rỗng
+                    print(f"File dictionary compiled hỏng, compile lại: {e}")
+            if dictionary is None:
+                try:
+                    dictionary = compile_dictionary(dictionary_path, compiled_path)
+                except OSError as e:
+                    # Không ghi được file compiled (vd. thư mục read-only) -> vẫn dùng JSON
+                    print(f"Không thể compile dictionary: {e}")
+                    dictionary = _load_dictionary_json(dictionary_path)
+                source = "JSON"
 
         load_time = time.time() - start_time
-        print(f"Đã load {kanji_count} từ Kanji trong {load_time:.2f} giây")
-        return sorted_dict
+        print(f"Đã load {len(dictionary)} từ Kanji ({source}) trong {load_time:.2f} giây")
+        return dictionary
 
     except FileNotFoundError:
         print(f"Không tìm thấy file dictionary: {dictionary_path}")
@@ -212,13 +238,25 @@ def load_dictionary(dictionary_path):
     except json.JSONDecodeError:
         print(f"Lỗi định dạng JSON trong file: {dictionary_path}")
         return {}
+    except ValueError as e:
+        print(f"Lỗi file dictionary compiled: {e}")
+        return {}
 
 
 # =========================================
 # Ruby element builder (Word XML)
 # =========================================
-def create_ruby_element(kanji, hiragana, source_run=None):
-    """Tạo element ruby cho Word document với spacing tối ưu để tránh che khuất"""
+RUBY_RT_SIZE = '12'    # 6pt
+RUBY_BASE_SIZE = '22'  # 11pt
+RUBY_TEMPLATE_CACHE_MAX = 256
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+# (rPr signature, rt size, base size) -> ruby template
+_ruby_template_cache = {}
+
+
+def _build_ruby_element(kanji, hiragana, source_run=None, rt_size=RUBY_RT_SIZE, base_size=RUBY_BASE_SIZE):
+    """Dựng element ruby từ đầu bằng OxmlElement (dùng để tạo template)"""
     ruby = OxmlElement('w:ruby')
 
     ruby_pr = OxmlElement('w:rubyPr')
@@ -245,17 +283,17 @@ def create_ruby_element(kanji, hiragana, source_run=None):
     copy_run_formatting(source_run, rt_rpr)
 
     rt_sz = OxmlElement('w:sz')
-    rt_sz.set(qn('w:val'), '12')  # 6pt
+    rt_sz.set(qn('w:val'), rt_size)
     rt_rpr.append(rt_sz)
 
     rt_szcs = OxmlElement('w:szCs')
-    rt_szcs.set(qn('w:val'), '12')
+    rt_szcs.set(qn('w:val'), rt_size)
     rt_rpr.append(rt_szcs)
 
     rt_r.append(rt_rpr)
     rt_t = OxmlElement('w:t')
     if ' ' in hiragana:
-        rt_t.set('{http://www.w3.org/XML/1998/namespace}space', 'preserve')
+        rt_t.set(XML_SPACE, 'preserve')
     rt_t.text = hiragana
     rt_r.append(rt_t)
     rt.append(rt_r)
@@ -269,11 +307,11 @@ def create_ruby_element(kanji, hiragana, source_run=None):
     copy_run_formatting(source_run, base_rpr)
 
     base_sz = OxmlElement('w:sz')
-    base_sz.set(qn('w:val'), '22')  # 11pt
+    base_sz.set(qn('w:val'), base_size)
     base_rpr.append(base_sz)
 
     base_szcs = OxmlElement('w:szCs')
-    base_szcs.set(qn('w:val'), '22')
+    base_szcs.set(qn('w:val'), base_size)
     base_rpr.append(base_szcs)
 
     base_r.append(base_rpr)
@@ -286,6 +324,41 @@ def create_ruby_element(kanji, hiragana, source_run=None):
     return ruby
 
 
+def _run_rpr_signature(source_run):
+    """Chữ ký định dạng của run nguồn (rPr serialize), None nếu không có"""
+    if source_run is None:
+        return None
+    rPr = source_run._element.rPr
+    if rPr is None:
+        return None
+    return etree.tostring(rPr)
+
+
+@instrument.timed("ruby_element")
+def create_ruby_element(kanji, hiragana, source_run=None):
+    """
+    Tạo element ruby cho Word document với spacing tối ưu để tránh che khuất.
+    Mỗi (định dạng run nguồn, cỡ rt, cỡ base) chỉ dựng 1 template; các lần sau chỉ deepcopy + gán text.
+    """
+    key = (_run_rpr_signature(source_run), RUBY_RT_SIZE, RUBY_BASE_SIZE)
+    template = _ruby_template_cache.get(key)
+    if template is None:
+        if len(_ruby_template_cache) >= RUBY_TEMPLATE_CACHE_MAX:
+            _ruby_template_cache.clear()
+        template = _build_ruby_element("", "", source_run)
+        _ruby_template_cache[key] = template
+
+    ruby = deepcopy(template)
+    # cấu trúc: ruby -> [rubyPr, rt -> r -> [rPr, t], rubyBase -> r -> [rPr, t]]
+    rt_t = ruby[1][0][-1]
+    base_t = ruby[2][0][-1]
+    if ' ' in hiragana:
+        rt_t.set(XML_SPACE, 'preserve')
+    rt_t.text = hiragana
+    base_t.text = kanji
+    return ruby
+
+
 def append_surface_with_map(paragraph, surface, mp, src_run):
     """
     Apply ruby theo 'map' per-char:
@@ -302,7 +375,7 @@ def append_surface_with_map(paragraph, surface, mp, src_run):
             continue
 
     for idx, ch in enumerate(surface):
-        if idx in idx_to_rt and is_kanji_char(ch):
+        if idx in idx_to_rt and ch in KANJI_CHARS:
             paragraph._element.append(create_ruby_element(ch, idx_to_rt[idx], src_run))
         else:
             r = paragraph.add_run(ch)
@@ -312,54 +385,167 @@ def append_surface_with_map(paragraph, surface, mp, src_run):
 # =========================================
 # Match finder: return (start, end, key, rt, map)
 # =========================================
-def find_kanji_matches_optimized(text, dictionary):
-    """Tìm matches; mỗi match trả (start, end, surface_key, rt, map_or_none)"""
-    if not text or not has_japanese(text):
-        return []
+# Cache kết quả match: LRU trong RAM + SQLite tùy chọn (configure_match_cache)
+_match_cache = None
+_match_cache_path = None
+
+
+def configure_match_cache(db_path=None):
+    """Bật/tắt cache SQLite trên đĩa cho kết quả match (None = chỉ LRU trong RAM)"""
+    global _match_cache, _match_cache_path
+    if _match_cache is not None:
+        _match_cache.flush()
+    _match_cache_path = db_path
+    _match_cache = None
+
+
+def get_match_cache(dictionary):
+    """Cache gắn với dictionary (và kanji index fallback) đang dùng; đổi một trong hai -> cache mới"""
+    global _match_cache
+    variant = match_variant()
+    if _match_cache is None or _match_cache.dictionary is not dictionary or _match_cache.variant != variant:
+        if _match_cache is not None:
+            _match_cache.flush()
+        _match_cache = MatchCache(dictionary, db_path=_match_cache_path, variant=variant)
+    return _match_cache
+
+
+# Kanji reading index (tùy chọn, .kanjiidx tạo bằng kanji_reading_index.py): reading phổ biến nhất của
+# từng kanji, dùng làm fallback cho kanji đơn không nằm trong match nào của dictionary
+_kanji_index = None
+_kanji_index_path = None
+
+
+def configure_kanji_index(index_path=None):
+    """Bật/tắt fallback reading theo từng kanji; None = tắt"""
+    global _kanji_index, _kanji_index_path
+    _kanji_index = None
+    _kanji_index_path = None
+    if index_path:
+        try:
+            _kanji_index = KanjiReadingIndex(index_path)
+            _kanji_index_path = index_path
+        except (OSError, ValueError) as e:
+            print(f"Không thể mở kanji reading index: {e}")
 
-    matches = []
-    text_len = len(text)
-    covered = [False] * text_len
 
-    def try_add_match(i, length):
-        if any(covered[i:i + length]):
-            return
+def match_variant():
+    """Cấu hình ngoài dictionary làm đổi kết quả match (cho cache / manifest): "" hoặc fingerprint kanji index"""
+    return f"kanji-index:{_kanji_index.fingerprint}" if _kanji_index is not None else ""
+
+
+def kanji_fallback_reading(ch):
+    """Reading fallback của 1 kanji từ kanji index (None nếu tắt index hoặc không có kanji)"""
+    if _kanji_index is None:
+        return None
+    return _kanji_index.best_reading(ch)
+
+
+# Reading index JMdict (tùy chọn): mọi reading đã xếp hạng cho mỗi từ, dùng để gợi ý cho từ thiếu
+_reading_index = None
+_reading_index_path = None
+
+
+def configure_reading_index(index_path=None):
+    """Mở reading index (.readidx, tạo bằng download_jmdict.build_jmdict_reading_index); None = tắt"""
+    global _reading_index, _reading_index_path
+    if _reading_index is not None:
+        _reading_index.close()
+    _reading_index = None
+    _reading_index_path = None
+    if index_path:
+        try:
+            _reading_index = ReadingIndex(index_path)
+            _reading_index_path = index_path
+        except (OSError, ValueError) as e:
+            print(f"Không thể mở reading index: {e}")
 
-        substring = text[i:i + length]
-        cleaned_substring = clean_kanji_word(substring)
 
-        if not cleaned_substring or not has_kanji(cleaned_substring):
-            return
+def lookup_readings(word):
+    """Các reading JMdict (Reading, đã xếp hạng) của word; () nếu không bật index hoặc không có từ"""
+    if _reading_index is None:
+        return ()
+    return _reading_index.readings(word)
 
-        if cleaned_substring in dictionary:
-            entry = dictionary[cleaned_substring]
-            rt = entry.get("rt") if isinstance(entry, dict) else entry
-            mp = entry.get("map") if isinstance(entry, dict) else None
 
-            matches.append((i, i + length, cleaned_substring, rt, mp))
+def _is_isolated_kanji(normalized, covered, pos):
+    """
+    Kanji chưa match ở pos không nằm trong 1 cụm kanji chưa match (2 bên không phải kanji chưa match):
+    reading từng kanji của cụm lạ (vd 明日 -> めい/にち) thường sai nên không dùng fallback cho cụm.
+    """
+    for i in (pos - 1, pos + 1):
+        if 0 <= i < len(normalized) and normalized[i] in KANJI_CHARS and not covered[i]:
+            return False
+    return True
 
-            for j in range(i, i + length):
-                covered[j] = True
 
-    # Pass 1: từ dài -> ngắn
-    for length in range(min(12, text_len), 2, -1):
-        for i in range(text_len - length + 1):
-            try_add_match(i, length)
+@instrument.timed("match")
+def find_kanji_matches_optimized(text, dictionary, missing=None):
+    """
+    Tìm matches; mỗi match trả (start, end, surface_key, rt, map_or_none).
+    Text được chuẩn hóa 1 lần (radical -> kanji, bỏ ký tự nhiễu), match trên bản chuẩn hóa,
+    rồi (start, end) được map về vị trí trong text gốc.
+    Kanji không tìm thấy được thêm vào missing (mặc định: missing_kanji toàn cục); nếu bật kanji index
+    (configure_kanji_index) thì kanji đứng riêng (không thuộc cụm kanji chưa match) vẫn được gắn ruby
+    bằng reading phổ biến nhất của nó.
+    Kết quả được cache theo (run text, dictionary) - xem get_match_cache.
+    """
+    if not text or not has_japanese(text):
+        return []
+    if missing is None:
+        missing = missing_kanji
 
-    # Pass 2: 2 -> 1
-    for length in range(2, 0, -1):
-        for i in range(text_len - length + 1):
-            try_add_match(i, length)
+    cache = get_match_cache(dictionary)
+    cached = cache.get(text)
+    if cached is not None:
+        matches, text_missing = cached
+        missing.update(text_missing)
+        return matches
 
-    # Ghi lại Kanji không tìm thấy
-    for i in range(text_len):
-        if not covered[i] and has_kanji(text[i]):
-            missing_kanji.add(text[i])
+    matcher = get_matcher(dictionary, key_filter=is_clean_key)
+    normalized, offsets = normalize_for_matching(text)
+    spans, covered = matcher.find_spans(normalized)
 
-    matches.sort(key=lambda x: x[0])
+    matches = []
+    for start, end in spans:
+        key = normalized[start:end]
+        entry = dictionary[key]
+        rt = entry.get("rt") if isinstance(entry, dict) else entry
+        mp = entry.get("map") if isinstance(entry, dict) else None
+        orig_start, orig_end = to_original_span(start, end, offsets)
+        matches.append((orig_start, orig_end, key, rt, mp))
+
+    # Ghi lại Kanji không tìm thấy (+ fallback reading theo từng kanji nếu có index)
+    text_missing = set()
+    fallback = False
+    for m in KANJI_PATTERN.finditer(normalized):
+        start = m.start()
+        if covered[start]:
+            continue
+        ch = m.group()
+        text_missing.add(ch)
+        rt = kanji_fallback_reading(ch)
+        if rt is not None and _is_isolated_kanji(normalized, covered, start):
+            orig_start, orig_end = to_original_span(start, start + 1, offsets)
+            matches.append((orig_start, orig_end, ch, rt, [{"i": 0, "ch": ch, "rt": rt}]))
+            fallback = True
+    if fallback:
+        matches.sort(key=lambda match: match[0])
+    missing.update(text_missing)
+
+    cache.put(text, (matches, sorted(text_missing)))
     return matches
 
 
+def match_texts(texts, dictionary):
+    """Tìm match cho nhiều run text: {text: (matches, kanji không tìm thấy trong text)}"""
+    results = {}
+    for text in texts:
+        missing = set()
+        results[text] = (find_kanji_matches_optimized(text, dictionary, missing), sorted(missing))
+    return results
+
+
 # =========================================
 # Section break helpers
 # =========================================
@@ -387,8 +573,12 @@ def remove_section_breaks_and_add_spacing(paragraph):
 # =========================================
 # Core: add ruby to paragraph preserving runs
 # =========================================
-def add_ruby_to_paragraph_preserve_runs(paragraph, dictionary):
-    """Thêm ruby vào paragraph, giữ nguyên định dạng/run, hỗ trợ dict schema mới (map)."""
+@instrument.timed("paragraph")
+def add_ruby_to_paragraph_preserve_runs(paragraph, dictionary, matches_by_text=None):
+    """
+    Thêm ruby vào paragraph, giữ nguyên định dạng/run, hỗ trợ dict schema mới (map).
+    matches_by_text: {run_text: matches} đã tính sẵn (vd. từ process pool); thiếu thì tự tính.
+    """
 
     # Line spacing cho paragraph có tiếng Nhật
     if has_japanese(paragraph.text):
@@ -424,7 +614,10 @@ def add_ruby_to_paragraph_preserve_runs(paragraph, dictionary):
             copy_run_rpr(run, new_run)
             continue
 
-        matches = find_kanji_matches_optimized(text, dictionary)
+        if matches_by_text is not None and text in matches_by_text:
+            matches = matches_by_text[text]
+        else:
+            matches = find_kanji_matches_optimized(text, dictionary)
         if not matches:
             new_run = paragraph.add_run(text)
             copy_run_rpr(run, new_run)
@@ -462,7 +655,7 @@ def add_ruby_to_paragraph_preserve_runs(paragraph, dictionary):
             elif len(kanji_key) > 1 and hiragana_actual_len == 1:
                 # chỉ add ruby cho kanji đầu tiên trong cụm
                 for idx, ch in enumerate(kanji_key):
-                    if has_kanji(ch):
+                    if ch in CJK_CHARS:
                         if idx > 0:
                             new_run = paragraph.add_run(kanji_key[:idx])
                             copy_run_rpr(run, new_run)
@@ -521,30 +714,196 @@ def save_missing_kanji_report(missing_kanji, output_path):
         for word in sorted_missing:
             f.write(f"{word}\n")
 
+        suggestions = [(word, lookup_readings(word)) for word in sorted_missing]
+        suggestions = [(word, readings) for word, readings in suggestions if readings]
+        if suggestions:
+            f.write("\n=== GỢI Ý READING TỪ JMDICT (phổ biến trước) ===\n")
+            for word, readings in suggestions:
+                f.write(f"{word}: " + ", ".join(
+                    f"{r.reading} (common)" if r.common else r.reading for r in readings) + "\n")
+
+        fallbacks = [(word, kanji_fallback_reading(word)) for word in sorted_missing if len(word) == 1]
+        fallbacks = [(word, rt) for word, rt in fallbacks if rt is not None]
+        if fallbacks:
+            f.write("\n=== READING FALLBACK TỪ KANJI INDEX (chỉ gắn cho kanji đứng riêng, "
+                    "không thuộc cụm kanji chưa có trong dictionary) ===\n")
+            for word, rt in fallbacks:
+                f.write(f"{word}: {rt}\n")
+
     print(f"Đã lưu báo cáo từ Kanji thiếu: {report_file}")
     print(f"Tổng số từ Kanji không tìm thấy: {len(missing_kanji)}")
 
 
+# =========================================
+# Parallel matching (process pool)
+# =========================================
+# Dictionary dùng trong worker: kế thừa qua fork, hoặc load lại (mmap) khi spawn
+_worker_dictionary = None
+
+
+def _init_match_worker(dictionary_path, match_cache_path=None, reading_index_path=None, kanji_index_path=None):
+    global _worker_dictionary
+    # không dùng lại kết nối SQLite / cache / mmap / sink đo thời gian kế thừa từ process cha
+    configure_match_cache(match_cache_path)
+    configure_reading_index(reading_index_path)
+    configure_kanji_index(kanji_index_path)
+    instrument.disable()
+    if _worker_dictionary is None:
+        _worker_dictionary = load_dictionary(dictionary_path)
+
+
+def _match_texts_worker(texts):
+    """Chạy trong worker: trả [(matches, missing)] theo đúng thứ tự texts"""
+    return list(match_texts(texts, _worker_dictionary).values())
+
+
+def iter_table_cells(table):
+    """Các ô của table, kể cả ô của table lồng trong ô (engine stream cũng đi vào table lồng)"""
+    for row in table.rows:
+        for cell in row.cells:
+            yield cell
+            for nested in cell.tables:
+                yield from iter_table_cells(nested)
+
+
+def iter_document_paragraphs(doc):
+    """Duyệt paragraph theo đúng thứ tự process_word_document: body trước, rồi tables"""
+    yield from doc.paragraphs
+    for table in doc.tables:
+        for cell in iter_table_cells(table):
+            yield from cell.paragraphs
+
+
+def collect_run_texts(doc):
+    """Lấy các run text (không trùng, giữ thứ tự) có tiếng Nhật cần tìm match"""
+    texts = {}
+    for paragraph in iter_document_paragraphs(doc):
+        for run in paragraph.runs:
+            text = run.text or ""
+            if has_japanese(text):
+                texts[text] = None
+    return list(texts)
+
+
+def compute_matches_parallel(texts, dictionary, dictionary_path, workers):
+    """
+    Như match_texts nhưng chạy trong ProcessPoolExecutor.
+    Cache match được tra/ghi ở process chính, worker chỉ nhận các text bị miss.
+    Trả {text: (matches, kanji không tìm thấy trong text)}.
+    """
+    global _worker_dictionary
+    cache = get_match_cache(dictionary)
+    results = {}
+    todo = []
+    for text in texts:
+        cached = cache.get(text)
+        if cached is not None:
+            results[text] = cached
+        else:
+            todo.append(text)
+    texts = todo
+    if not texts:
+        return results
+
+    # Build automaton trước khi fork để các worker dùng chung (copy-on-write)
+    get_matcher(dictionary, key_filter=is_clean_key)
+    _worker_dictionary = dictionary
+
+    ctx = pool_context()
+
+    chunk_size = max(1, math.ceil(len(texts) / (workers * 4)))
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_match_worker,
+                                 initargs=(dictionary_path, None, None, _kanji_index_path)) as executor:
+            for chunk, chunk_results in zip(chunks, executor.map(_match_texts_worker, chunks)):
+                for text, value in zip(chunk, chunk_results):
+                    cache.put(text, value)
+                    results[text] = value
+    finally:
+        _worker_dictionary = None
+
+    return results
+
+
 # =========================================
 # Process Word document
 # =========================================
-def process_word_document(input_path, output_path, dictionary_path):
-    """Xử lý file Word"""
+def _prefetch_matches(doc, dictionary, dictionary_path, output_path, workers, incremental):
+    """
+    Tìm match cho mọi run text trước khi sửa DOM (process pool và/hoặc manifest incremental).
+    Trả (matches_by_text, manifest, match_results, số run text dùng lại từ manifest).
+    """
+    match_start = time.time()
+    texts = collect_run_texts(doc)
+    todo = texts
+    manifest = None
+    match_results = {}
+
+    if incremental:
+        manifest = RubyManifest(manifest_path_for(output_path), dictionary, texts, match_variant())
+        match_results = manifest.reusable(texts)
+        todo = [text for text in texts if text not in match_results]
+        print(f"Manifest: dùng lại {len(match_results)}/{len(texts)} run text, cần tính lại {len(todo)}")
+    reused_texts = len(match_results)
+
+    if workers > 1:
+        print(f"Đang tìm match song song ({workers} workers) cho {len(todo)} run text...")
+        match_results.update(compute_matches_parallel(todo, dictionary, dictionary_path, workers))
+    else:
+        match_results.update(match_texts(todo, dictionary))
+
+    matches_by_text = {}
+    for text, (matches, missing) in match_results.items():
+        matches_by_text[text] = matches
+        missing_kanji.update(missing)
+    instrument.count("run_texts", len(texts))
+    instrument.count("run_texts_reused", reused_texts)
+    print(f"Đã tìm match trong {time.time() - match_start:.2f} giây")
+    return matches_by_text, manifest, match_results, reused_texts
+
+
+def process_word_document(input_path, output_path, dictionary_path, workers=1, dictionary=None,
+                          incremental=False):
+    """
+    Xử lý file Word (workers > 1: tìm match song song bằng process pool, output giống hệt).
+    dictionary: truyền dictionary đã load sẵn để không load lại (batch mode).
+    incremental: dùng lại kết quả match từ manifest của lần chạy trước, chỉ tính lại
+                 run text mới hoặc bị ảnh hưởng bởi từ đã thêm/sửa trong dictionary.
+    Trả dict thống kê, hoặc None nếu lỗi.
+    """
     global missing_kanji
     missing_kanji.clear()
 
     print("=== Xử lý file Word (hỗ trợ dictionary schema mới) ===")
     start_time = time.time()
 
-    dictionary = load_dictionary(dictionary_path)
+    if dictionary is None:
+        with instrument.stage("dictionary_load"):
+            dictionary = load_dictionary(dictionary_path)
     if not dictionary:
         print("Dictionary trống hoặc không đọc được.")
-        return
+        return None
+
+    match_cache = get_match_cache(dictionary)
+    match_cache.reset_stats()
 
     print(f"Đang xử lý file: {input_path}")
 
     try:
-        doc = Document(input_path)
+        with instrument.stage("document_open"):
+            doc = Document(input_path)
+
+        matches_by_text = None
+        manifest = None
+        match_results = {}
+        reused_texts = 0
+        if workers > 1 or incremental:
+            with instrument.stage("match_prefetch", workers=workers, incremental=incremental):
+                matches_by_text, manifest, match_results, reused_texts = _prefetch_matches(
+                    doc, dictionary, dictionary_path, output_path, workers, incremental)
 
         japanese_paragraphs = 0
         total_paragraphs = 0
@@ -555,59 +914,78 @@ def process_word_document(input_path, output_path, dictionary_path):
 
         paragraphs_to_add_spacing = []
 
-        for i, paragraph in enumerate(doc.paragraphs):
-            total_paragraphs += 1
+        with instrument.stage("body_paragraphs"):
+            for i, paragraph in enumerate(doc.paragraphs):
+                total_paragraphs += 1
 
-            if has_section_break(paragraph):
-                section_breaks_removed += 1
-                paragraphs_to_add_spacing.append(i)
+                if has_section_break(paragraph):
+                    section_breaks_removed += 1
+                    paragraphs_to_add_spacing.append(i)
 
-            if paragraph.text.strip() and has_japanese(paragraph.text):
-                japanese_paragraphs += 1
+                if paragraph.text.strip() and has_japanese(paragraph.text):
+                    japanese_paragraphs += 1
 
-                if add_ruby_to_paragraph_preserve_runs(paragraph, dictionary):
-                    processed_count += 1
+                    if add_ruby_to_paragraph_preserve_runs(paragraph, dictionary, matches_by_text):
+                        processed_count += 1
 
-                if japanese_paragraphs % 50 == 0:
-                    elapsed = time.time() - start_time
-                    print(f"Đã xử lý {japanese_paragraphs} paragraph tiếng Nhật - {elapsed:.1f}s")
+                    if japanese_paragraphs % 50 == 0:
+                        elapsed = time.time() - start_time
+                        print(f"Đã xử lý {japanese_paragraphs} paragraph tiếng Nhật - {elapsed:.1f}s")
 
-                    if japanese_paragraphs % 200 == 0:
-                        gc.collect()
-            else:
-                add_ruby_to_paragraph_preserve_runs(paragraph, dictionary)
+                        if japanese_paragraphs % 200 == 0:
+                            gc.collect()
+                else:
+                    add_ruby_to_paragraph_preserve_runs(paragraph, dictionary, matches_by_text)
 
-        # Thêm 2 dòng trống sau các paragraph có section break
-        for i in reversed(paragraphs_to_add_spacing):
-            p1 = doc.add_paragraph()
-            p2 = doc.add_paragraph()
-            doc._element.body.insert(i + 1, p1._element)
-            doc._element.body.insert(i + 2, p2._element)
+            # Thêm 2 dòng trống sau các paragraph có section break
+            for i in reversed(paragraphs_to_add_spacing):
+                p1 = doc.add_paragraph()
+                p2 = doc.add_paragraph()
+                doc._element.body.insert(i + 1, p1._element)
+                doc._element.body.insert(i + 2, p2._element)
+        body_paragraphs = total_paragraphs
 
         print("Đang xử lý tables...")
 
         table_count = 0
-        for table in doc.tables:
-            table_count += 1
-            for row in table.rows:
-                for cell in row.cells:
+        with instrument.stage("tables"):
+            for table in doc.tables:
+                table_count += 1
+                for cell in iter_table_cells(table):
+                    instrument.count("table_cells")
                     for paragraph in cell.paragraphs:
                         total_paragraphs += 1
                         if paragraph.text.strip() and has_japanese(paragraph.text):
                             japanese_paragraphs += 1
-                            if add_ruby_to_paragraph_preserve_runs(paragraph, dictionary):
+                            if add_ruby_to_paragraph_preserve_runs(paragraph, dictionary, matches_by_text):
                                 processed_count += 1
 
-            if table_count % 20 == 0:
-                elapsed = time.time() - start_time
-                print(f"Đã xử lý {table_count} tables - {elapsed:.1f}s")
+                if table_count % 20 == 0:
+                    elapsed = time.time() - start_time
+                    print(f"Đã xử lý {table_count} tables - {elapsed:.1f}s")
 
         print("Đang lưu file...")
         save_start = time.time()
-        doc.save(output_path)
+        with instrument.stage("save"):
+            doc.save(output_path)
         save_time = time.time() - save_start
 
-        save_missing_kanji_report(missing_kanji, output_path)
+        with instrument.stage("reports"):
+            save_missing_kanji_report(missing_kanji, output_path)
+
+            if manifest is not None:
+                manifest.save(match_results)
+            match_cache.flush()
+
+        instrument.count("body_paragraphs", body_paragraphs)
+        instrument.count("table_paragraphs", total_paragraphs - body_paragraphs)
+        instrument.count("tables", table_count)
+        instrument.count("japanese_paragraphs", japanese_paragraphs)
+        instrument.count("processed_paragraphs", processed_count)
+        instrument.count("section_breaks_removed", section_breaks_removed)
+        instrument.count("missing_kanji", len(missing_kanji))
+        instrument.count("match_cache_hits", match_cache.hits)
+        instrument.count("match_cache_misses", match_cache.misses)
 
         total_time = time.time() - start_time
 
@@ -620,15 +998,199 @@ def process_word_document(input_path, output_path, dictionary_path):
             print(f"Tỷ lệ xử lý thành công: {processed_count / japanese_paragraphs * 100:.1f}%")
         print(f"Section breaks đã xóa: {section_breaks_removed}")
         print(f"Từ Kanji không tìm thấy: {len(missing_kanji)}")
+        print(f"Cache match: {match_cache.summary()}")
         print(f"Thời gian xử lý: {total_time:.2f} giây")
         print(f"Thời gian lưu file: {save_time:.2f} giây")
         if japanese_paragraphs > 0:
             print(f"Tốc độ xử lý: {japanese_paragraphs / total_time:.1f} paragraph/giây")
 
+        return {
+            "input": input_path,
+            "output": output_path,
+            "total_paragraphs": total_paragraphs,
+            "japanese_paragraphs": japanese_paragraphs,
+            "processed_paragraphs": processed_count,
+            "section_breaks_removed": section_breaks_removed,
+            "missing_kanji": sorted(missing_kanji),
+            "reused_run_texts": reused_texts,
+            "match_cache_hits": match_cache.hits,
+            "match_cache_misses": match_cache.misses,
+            "time": round(total_time, 3),
+            "save_time": round(save_time, 3),
+        }
+
     except Exception as e:
         print(f"Lỗi khi xử lý file Word: {e}")
         import traceback
         traceback.print_exc()
+        return None
+
+
+# =========================================
+# Batch mode (nhiều file, mỗi file 1 worker process)
+# =========================================
+BATCH_OUTPUT_SUFFIX = "_ruby.docx"
+
+
+def resolve_batch_inputs(pattern):
+    """Thư mục -> mọi *.docx bên trong; ngược lại coi là glob pattern"""
+    if os.path.isdir(pattern):
+        paths = glob.glob(os.path.join(pattern, "*.docx"))
+    else:
+        paths = glob.glob(pattern)
+    return sorted(
+        p for p in paths
+        if p.lower().endswith(".docx")
+        and not os.path.basename(p).startswith("~$")     # file lock của Word
+        and not p.endswith(BATCH_OUTPUT_SUFFIX)           # output của lần chạy trước
+    )
+
+
+def batch_output_path(input_path, output_dir=None):
+    base = os.path.splitext(os.path.basename(input_path))[0] + BATCH_OUTPUT_SUFFIX
+    return os.path.join(output_dir or os.path.dirname(input_path), base)
+
+
+def is_output_up_to_date(input_path, output_path, dictionary_path):
+    """Output mới hơn cả input lẫn dictionary -> không cần xử lý lại"""
+    if not os.path.exists(output_path):
+        return False
+    output_mtime = os.path.getmtime(output_path)
+    newest_source = os.path.getmtime(input_path)
+    if os.path.exists(dictionary_path):
+        newest_source = max(newest_source, os.path.getmtime(dictionary_path))
+    return output_mtime > newest_source
+
+
+def _process_file_worker(input_path, output_path, dictionary_path, engine="docx", incremental=False):
+    """Chạy trong worker: xử lý 1 file với dictionary dùng chung"""
+    if engine == "stream":
+        from stream_docx import process_word_document_streaming
+        return process_word_document_streaming(input_path, output_path, dictionary_path,
+                                               dictionary=_worker_dictionary)
+    return process_word_document(input_path, output_path, dictionary_path, dictionary=_worker_dictionary,
+                                 incremental=incremental)
+
+
+def process_batch(pattern, dictionary_path, output_dir=None, jobs=None, force=False, engine="docx",
+                  incremental=False):
+    """
+    Xử lý nhiều file Word: dictionary load 1 lần, các file chạy song song trên nhiều core.
+    Bỏ qua file có output mới hơn input và dictionary (trừ khi force=True).
+    Ghi báo cáo tổng hợp batch_summary.json.
+    """
+    global _worker_dictionary
+    if engine == "stream" and incremental:
+        raise ValueError("incremental chỉ dùng được với engine docx")
+    start_time = time.time()
+
+    inputs = resolve_batch_inputs(pattern)
+    if not inputs:
+        print(f"Không tìm thấy file .docx nào: {pattern}")
+        return None
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    jobs_to_run = []
+    skipped = []
+    for input_path in inputs:
+        output_path = batch_output_path(input_path, output_dir)
+        if not force and is_output_up_to_date(input_path, output_path, dictionary_path):
+            skipped.append(input_path)
+        else:
+            jobs_to_run.append((input_path, output_path))
+
+    print(f"=== Batch: {len(inputs)} file, cần xử lý {len(jobs_to_run)}, bỏ qua {len(skipped)} ===")
+
+    results = []
+    failed = []
+    if jobs_to_run:
+        dictionary = load_dictionary(dictionary_path)
+        if not dictionary:
+            print("Dictionary trống hoặc không đọc được.")
+            return None
+
+        # Build automaton trước khi fork để các worker dùng chung
+        get_matcher(dictionary, key_filter=is_clean_key)
+        _worker_dictionary = dictionary
+
+        ctx = pool_context()
+
+        jobs = max(1, min(jobs or os.cpu_count() or 1, len(jobs_to_run)))
+        try:
+            with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx,
+                                     initializer=_init_match_worker,
+                                     initargs=(dictionary_path, _match_cache_path,
+                                               _reading_index_path, _kanji_index_path)) as executor:
+                futures = {
+                    executor.submit(_process_file_worker, input_path, output_path, dictionary_path,
+                                    engine, incremental): input_path
+                    for input_path, output_path in jobs_to_run
+                }
+                for future in as_completed(futures):
+                    input_path = futures[future]
+                    try:
+                        stats = future.result()
+                    except Exception as e:
+                        print(f"Lỗi khi xử lý {input_path}: {e}")
+                        stats = None
+                    if stats is None:
+                        failed.append(input_path)
+                    else:
+                        results.append(stats)
+        finally:
+            _worker_dictionary = None
+
+    results.sort(key=lambda s: s["input"])
+    all_missing = set()
+    for stats in results:
+        all_missing.update(stats["missing_kanji"])
+
+    summary = {
+        "dictionary": dictionary_path,
+        "files_total": len(inputs),
+        "files_processed": len(results),
+        "files_skipped": len(skipped),
+        "files_failed": len(failed),
+        "total_paragraphs": sum(s["total_paragraphs"] for s in results),
+        "japanese_paragraphs": sum(s["japanese_paragraphs"] for s in results),
+        "processed_paragraphs": sum(s["processed_paragraphs"] for s in results),
+        "match_cache_hits": sum(s["match_cache_hits"] for s in results),
+        "match_cache_misses": sum(s["match_cache_misses"] for s in results),
+        "missing_kanji_count": len(all_missing),
+        "wall_time": round(time.time() - start_time, 3),
+        "files": [
+            {
+                "input": s["input"],
+                "output": s["output"],
+                "time": s["time"],
+                "japanese_paragraphs": s["japanese_paragraphs"],
+                "processed_paragraphs": s["processed_paragraphs"],
+                "missing_kanji_count": len(s["missing_kanji"]),
+            }
+            for s in results
+        ],
+        "skipped": skipped,
+        "failed": failed,
+    }
+
+    summary_dir = output_dir or os.path.dirname(inputs[0]) or "."
+    summary_path = os.path.join(summary_dir, "batch_summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print("\n=== KẾT QUẢ BATCH ===")
+    for item in summary["files"]:
+        print(f"{item['input']}: {item['time']:.2f}s | "
+              f"{item['processed_paragraphs']}/{item['japanese_paragraphs']} paragraph | "
+              f"thiếu {item['missing_kanji_count']} kanji")
+    print(f"File đã xử lý: {len(results)} | bỏ qua: {len(skipped)} | lỗi: {len(failed)}")
+    print(f"Paragraph đã thêm ruby: {summary['processed_paragraphs']}")
+    print(f"Kanji không tìm thấy (gộp): {len(all_missing)}")
+    print(f"Cache match: {summary['match_cache_hits']} hit / {summary['match_cache_misses']} miss")
+    print(f"Tổng thời gian: {summary['wall_time']:.2f} giây")
+    print(f"Báo cáo tổng hợp: {summary_path}")
+    return summary
 
 
 # =========================================
@@ -679,13 +1241,122 @@ def create_japanese_run_with_font_size(paragraph, text, font_size_pt=11):
     return run
 
 
+# =========================================
+# Profiling (--profile)
+# =========================================
+PROFILE_TOP_FUNCTIONS = 40
+PROFILE_TOP_ALLOCATIONS = 25
+
+
+def profile_report_paths(output_path):
+    """out.docx -> (out_profile.txt, out_profile.prof)"""
+    base = os.path.splitext(output_path)[0]
+    return base + "_profile.txt", base + "_profile.prof"
+
+
+def run_profiled(output_path, func, *args, **kwargs):
+    """
+    Chạy func dưới cProfile + tracemalloc, ghi báo cáo cạnh file output:
+      *_profile.txt  : top hàm theo cumulative time, peak bộ nhớ, top dòng cấp phát, timing theo stage
+      *_profile.prof : dữ liệu cProfile gốc (mở bằng pstats / snakeviz)
+    """
+    report_path, prof_path = profile_report_paths(output_path)
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        profiler.dump_stats(prof_path)
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(f"=== PROFILE: {output_path} ===\n\n")
+            f.write(f"Peak bộ nhớ Python (tracemalloc): {peak / (1024 * 1024):.1f} MB\n\n")
+
+            if instrument.enabled:
+                f.write("=== Thời gian theo stage (inclusive) ===\n")
+                f.write(json.dumps(instrument.summary(), ensure_ascii=False, indent=2))
+                f.write("\n\n")
+
+            f.write(f"=== Top {PROFILE_TOP_ALLOCATIONS} dòng cấp phát bộ nhớ ===\n")
+            for stat in snapshot.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+
+            f.write(f"\n=== Top {PROFILE_TOP_FUNCTIONS} hàm (cumulative) ===\n")
+            stats = pstats.Stats(profiler, stream=f)
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+        print(f"Đã lưu báo cáo profile: {report_path}")
+
+
 # =========================================
 # Main
 # =========================================
-def main():
-    input_file = "Operetion 2025.03.24.docx"
-    output_file = "asdasdasd_ruby_test.docx"
-    dictionary_file = "dict_struct.json"  # giờ có thể là schema mới/cũ đều được
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Thêm Ruby (furigana) cho file Word")
+    parser.add_argument("input", nargs="?", default="Operetion 2025.03.24.docx",
+                        help="File Word đầu vào, hoặc thư mục / glob pattern (batch mode)")
+    parser.add_argument("output", nargs="?", default=None,
+                        help="File Word đầu ra (batch mode: thư mục đầu ra)")
+    # giờ có thể là schema mới/cũ đều được, hoặc file .rubydict đã compile
+    parser.add_argument("--dict", dest="dictionary", default="dict_struct.json", help="File dictionary")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Số process tìm match song song (1 = tuần tự; chỉ engine docx)")
+    parser.add_argument("--engine", choices=["docx", "stream"], default="docx",
+                        help="docx: python-docx object model; stream: sửa document.xml theo kiểu streaming (ít RAM)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Dùng lại kết quả match từ manifest lần trước (engine docx)")
+    parser.add_argument("--match-cache", default=None, metavar="PATH",
+                        help="File SQLite cache kết quả match, dùng lại giữa các lần chạy")
+    parser.add_argument("--readings", default=None, metavar="PATH",
+                        help="Reading index JMdict (.readidx): gợi ý reading cho từ Kanji thiếu trong báo cáo")
+    parser.add_argument("--kanji-index", default=None, metavar="PATH",
+                        help="Kanji reading index (.kanjiidx): gắn ruby cho kanji đơn không có trong dictionary")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Batch mode: số file xử lý song song (mặc định = số CPU)")
+    parser.add_argument("--force", action="store_true",
+                        help="Batch mode: xử lý lại cả file có output đã mới hơn input")
+    parser.add_argument("--compile-dictionary", action="store_true",
+                        help="Chỉ compile dictionary JSON -> .rubydict rồi thoát")
+    parser.add_argument("--timings", default=None, metavar="PATH",
+                        help="Ghi thời gian/bộ đếm theo stage dạng JSON lines (\"-\" = stderr; chế độ 1 file)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Chạy dưới cProfile + tracemalloc (chậm hơn), ghi *_profile.txt cạnh file output")
+    args = parser.parse_args(argv)
+    # engine stream xử lý tuần tự từng paragraph, không có prefetch song song / manifest
+    if args.engine == "stream" and args.workers > 1:
+        parser.error("--workers chỉ dùng được với --engine docx")
+    if args.engine == "stream" and args.incremental:
+        parser.error("--incremental chỉ dùng được với --engine docx")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    input_file = args.input
+    dictionary_file = args.dictionary
+
+    if args.compile_dictionary:
+        compile_dictionary(dictionary_file)
+        return
+
+    if args.match_cache:
+        configure_match_cache(args.match_cache)
+    if args.readings:
+        configure_reading_index(args.readings)
+    if args.kanji_index:
+        configure_kanji_index(args.kanji_index)
+
+    if os.path.isdir(input_file) or glob.has_magic(input_file):
+        process_batch(input_file, dictionary_file, output_dir=args.output, jobs=args.jobs,
+                      force=args.force, engine=args.engine, incremental=args.incremental)
+        print("\nHoàn thành!")
+        return
+
+    output_file = args.output or "asdasdasd_ruby_test.docx"
 
     print("=== Chương trình thêm Ruby cho file Word (schema dictionary mới) ===")
     print(f"Input file: {input_file}")
@@ -693,7 +1364,27 @@ def main():
     print(f"Dictionary file: {dictionary_file}")
     print()
 
-    process_word_document(input_file, output_file, dictionary_file)
+    timings_file = None
+    if args.timings:
+        timings_file = sys.stderr if args.timings == "-" else open(args.timings, "w", encoding="utf-8")
+    if timings_file is not None or args.profile:
+        instrument.start(timings_file)
+
+    if args.engine == "stream":
+        from stream_docx import process_word_document_streaming
+        run = lambda: process_word_document_streaming(input_file, output_file, dictionary_file)
+    else:
+        run = lambda: process_word_document(input_file, output_file, dictionary_file, workers=args.workers,
+                                            incremental=args.incremental)
+    try:
+        if args.profile:
+            run_profiled(output_file, run)
+        else:
+            run()
+    finally:
+        instrument.stop(input=input_file, output=output_file, engine=args.engine, workers=args.workers)
+        if timings_file is not None and timings_file is not sys.stderr:
+            timings_file.close()
     print("\nHoàn thành!")
 
 
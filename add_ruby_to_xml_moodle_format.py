@@ -1,18 +1,35 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import argparse
 import json
 import re
 import os
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from collections import defaultdict
+from xml.sax.saxutils import escape, quoteattr
+
+from lxml import etree
+
+from char_classes import (
+    CJK_CHARS,
+    FULLWIDTH_DIGIT_RANGE,
+    HIRAGANA_RANGE,
+    KANJI_RANGE,
+    KATAKANA_RANGE,
+)
+from process_pool import pool_context
 
 # Compile regex patterns
-KANJI_PATTERN = re.compile(r'[\u4e00-\u9fff]')
-JAPANESE_PATTERN = re.compile(r'[\u3040-\u309f\u30a0-\u30ff\u4e00-\u9fff\uff10-\uff19]')  # Thêm full-width numbers
+KANJI_PATTERN = re.compile(f'[{KANJI_RANGE}]')
+KANJI_OR_NUMBER_PATTERN = re.compile(f'[{KANJI_RANGE}{FULLWIDTH_DIGIT_RANGE}]')
+JAPANESE_PATTERN = re.compile(f'[{HIRAGANA_RANGE}{KATAKANA_RANGE}{KANJI_RANGE}{FULLWIDTH_DIGIT_RANGE}]')  # Thêm full-width numbers
+NON_JAPANESE_PATTERN = re.compile(f'[^{HIRAGANA_RANGE}{KATAKANA_RANGE}{KANJI_RANGE}{FULLWIDTH_DIGIT_RANGE}]')
 RUBY_PATTERN = re.compile(r'<ruby>.*?</ruby>', re.DOTALL)
 CHOICE_PATTERN = re.compile(r'^[アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワヲン]\.', re.MULTILINE)
-FULLWIDTH_NUMBER_PATTERN = re.compile(r'[\uff10-\uff19]')  # Full-width numbers pattern
+FULLWIDTH_NUMBER_PATTERN = re.compile(f'[{FULLWIDTH_DIGIT_RANGE}]')  # Full-width numbers pattern
+CHOICE_CHARS = 'アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワヲン'
 
 # Set để lưu các kanji không tìm thấy
 missing_kanji = set()
@@ -64,7 +81,7 @@ def load_dictionary(dictionary_path):
 
 def has_kanji(text):
     """Kiểm tra xem text có chứa ký tự Kanji hoặc full-width number không"""
-    return bool(KANJI_PATTERN.search(text)) or bool(FULLWIDTH_NUMBER_PATTERN.search(text))
+    return bool(KANJI_OR_NUMBER_PATTERN.search(text))
 
 def has_japanese(text):
     """Kiểm tra xem text có chứa ký tự tiếng Nhật không"""
@@ -79,103 +96,181 @@ def is_choice_marker(text, pos):
     if pos == 0:
         return False
     char_before = text[pos-1]
-    if char_before in 'アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワヲン':
+    if char_before in CHOICE_CHARS:
         if pos < len(text) and text[pos] == '．':
             return True
     return False
 
+# Trie cho find_kanji_matches: dict lồng nhau, node[None] = reading của key kết thúc tại node
+MAX_MATCH_LEN = 10
+_match_index = None
+_match_index_key = None
+# Fragment <ruby> đã render theo (kanji, reading) - mỗi entry dictionary chỉ format 1 lần
+_ruby_fragments = {}
+
+def build_match_trie(dictionary, max_len=MAX_MATCH_LEN):
+    """Trie của các key dài <= max_len (key dài hơn không bao giờ được match)"""
+    root = {}
+    for key, reading in dictionary.items():
+        if not key or len(key) > max_len:
+            continue
+        node = root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[None] = reading
+    return root
+
+def build_start_pattern(trie):
+    """
+    Regex tìm vị trí tiếp theo cần xét: ký tự đầu của key, số full-width, kanji (để ghi nhận thiếu).
+    Các ký tự khác (HTML, ASCII, kana không mở đầu từ nào) được nhảy qua trong C.
+    """
+    extra = sorted(ch for ch in trie if ch is not None and ch not in CJK_CHARS)
+    return re.compile(f'[{KANJI_RANGE}{FULLWIDTH_DIGIT_RANGE}' + ''.join(re.escape(ch) for ch in extra) + ']')
+
+def get_match_index(dictionary):
+    """(trie, regex vị trí bắt đầu) - build 1 lần cho mỗi dictionary"""
+    global _match_index, _match_index_key
+    key = (id(dictionary), len(dictionary))
+    if _match_index is None or _match_index_key != key:
+        trie = build_match_trie(dictionary)
+        _match_index = (trie, build_start_pattern(trie))
+        _match_index_key = key
+        _ruby_fragments.clear()
+    return _match_index
+
 def find_kanji_matches(text, dictionary):
-    """Tìm tất cả matches của kanji trong text với dictionary"""
+    """
+    Tìm tất cả matches của kanji trong text với dictionary - quét text đúng 1 lần:
+    tại mỗi vị trí đi theo trie lấy từ dài nhất (tối đa MAX_MATCH_LEN), không đi xuyên vào
+    vùng <ruby> có sẵn; không có từ thì gom chuỗi số full-width; còn lại ghi nhận kanji thiếu.
+    """
     if not text or not has_japanese(text):
         return []
-    
+    ruby_spans = [m.span() for m in RUBY_PATTERN.finditer(text)]
+    return _scan_matches(text, get_match_index(dictionary), ruby_spans)
+
+def _scan_matches(text, match_index, ruby_spans):
+    """Thân của find_kanji_matches (không kiểm tra lại input); ruby_spans: vùng <ruby> có sẵn"""
+    trie, start_pattern = match_index
+    next_start = start_pattern.search
     matches = []
     text_len = len(text)
-    covered = [False] * text_len
     
-    # Đánh dấu các vùng có ruby tags để bỏ qua
-    ruby_matches = list(RUBY_PATTERN.finditer(text))
-    for ruby_match in ruby_matches:
-        start, end = ruby_match.span()
-        for i in range(start, end):
-            if i < text_len:
-                covered[i] = True
+    # thêm sentinel ở cuối
+    ruby_spans.append((text_len, text_len))
+    ruby_idx = 0
+    ruby_start, ruby_end = ruby_spans[0]
     
-    # Tìm các chuỗi Kanji hoặc số full-width liên tiếp, ưu tiên vùng dài nhất
     i = 0
     while i < text_len:
-        if covered[i] or is_choice_marker(text, i):
+        if i >= ruby_start:
+            i = ruby_end
+            ruby_idx += 1
+            ruby_start, ruby_end = ruby_spans[ruby_idx]
+            continue
+        
+        # Nhảy tới ký tự tiếp theo có thể bắt đầu match / là kanji
+        m = next_start(text, i, ruby_start)
+        if m is None:
+            i = ruby_start
+            continue
+        i = m.start()
+        
+        ch = text[i]
+        # Ký tự lựa chọn + dấu chấm (ア．) -> bỏ qua dấu chấm
+        if ch == '．' and i > 0 and text[i-1] in CHOICE_CHARS:
             i += 1
             continue
-        # Ưu tiên nhận diện chuỗi dài nhất có trong dictionary
-        found = False
-        for length in range(min(10, text_len - i), 0, -1):
-            substring = text[i:i+length]
-            if substring in dictionary and not any(covered[i:i+length]):
-                matches.append((i, i+length, substring, dictionary[substring]))
-                for j in range(i, i+length):
-                    covered[j] = True
-                i += length
-                found = True
+        
+        # Từ dài nhất trong dictionary bắt đầu tại i
+        limit = i + MAX_MATCH_LEN
+        if limit > ruby_start:
+            limit = ruby_start
+        node = trie
+        j = i
+        best_end = 0
+        best_reading = None
+        while j < limit:
+            node = node.get(text[j])
+            if node is None:
                 break
-        if found:
+            j += 1
+            if None in node:
+                best_end = j
+                best_reading = node[None]
+        if best_end:
+            matches.append((i, best_end, text[i:best_end], best_reading))
+            i = best_end
             continue
-        # Nếu không có từ ghép, kiểm tra số full-width liên tiếp
-        if FULLWIDTH_NUMBER_PATTERN.match(text[i]):
+        
+        # Nếu không có từ ghép, gom số full-width liên tiếp
+        if ch in fullwidth_numbers:
             start = i
-            while i < text_len and not covered[i] and FULLWIDTH_NUMBER_PATTERN.match(text[i]):
+            while i < ruby_start and text[i] in fullwidth_numbers:
                 i += 1
-            end = i
-            num_str = text[start:end]
-            num_reading = ''.join([fullwidth_numbers.get(ch, ch) for ch in num_str])
-            matches.append((start, end, num_str, num_reading))
-            for j in range(start, end):
-                covered[j] = True
+            num_str = text[start:i]
+            num_reading = ''.join([fullwidth_numbers[c] for c in num_str])
+            matches.append((start, i, num_str, num_reading))
             continue
+        
+        # Ghi lại Kanji không tìm thấy
+        if ch in CJK_CHARS:
+            missing_kanji.add(ch)
         i += 1
     
-    # Ghi lại các Kanji không tìm thấy
-    for i in range(text_len):
-        if not covered[i] and has_kanji(text[i]) and not is_choice_marker(text, i):
-            missing_kanji.add(text[i])
-    
-    matches.sort(key=lambda x: x[0])
     return matches
 
 def clean_kanji_word(word):
     """Làm sạch từ Kanji bằng cách loại bỏ ký tự không phải tiếng Nhật"""
-    cleaned = re.sub(r'[^\u3040-\u309f\u30a0-\u30ff\u4e00-\u9fff\uff10-\uff19]', '', word)
+    cleaned = NON_JAPANESE_PATTERN.sub('', word)
     return cleaned
 
-def add_ruby_to_text(text, dictionary):
-    """Thêm ruby annotations vào text với format đúng cho Moodle"""
-    if not text or not has_japanese(text) or has_ruby_tags(text):
-        return text
-    
+# "問題" + số full-width -> ruby cho cả 2 (xử lý trước khi tìm match)
+PROBLEM_NUMBER_PATTERN = re.compile(r'問題([\uff10-\uff19]+)')
+
+def ruby_fragment(kanji, hiragana):
+    key = (kanji, hiragana)
+    fragment = _ruby_fragments.get(key)
+    if fragment is None:
+        fragment = f"<ruby>{kanji}<rt>{hiragana}</rt></ruby>"
+        _ruby_fragments[key] = fragment
+    return fragment
+
+def replace_problem_number(match):
+    number = match.group(1)
+    number_reading = ''.join([fullwidth_numbers.get(ch, ch) for ch in number])
+    return ruby_fragment('問題', 'もんだい') + ruby_fragment(number, number_reading)
+
+def annotate_text(text, dictionary):
+    """
+    Thêm ruby cho text đã biết chắc có tiếng Nhật và chưa có ruby (caller đã kiểm tra).
+    Kết quả được ghép bằng list + ''.join 1 lần.
+    """
     # Xử lý trước các pattern đặc biệt như "問題[chuỗi số full-width]"
-    pattern = r'問題([\uff10-\uff19]+)'
-    def replace_problem_number(match):
-        number = match.group(1)
-        number_reading = ''.join([fullwidth_numbers.get(ch, ch) for ch in number])
-        return f'<ruby>問題<rt>もんだい</rt></ruby><ruby>{number}<rt>{number_reading}</rt></ruby>'
-    processed_text = re.sub(pattern, replace_problem_number, text)
+    processed_text, replaced = PROBLEM_NUMBER_PATTERN.subn(replace_problem_number, text)
+    # Chỉ có ruby tags nếu vừa thay "問題..." (text gốc không có ruby)
+    ruby_spans = [m.span() for m in RUBY_PATTERN.finditer(processed_text)] if replaced else []
     
     # Xử lý các từ còn lại
-    matches = find_kanji_matches(processed_text, dictionary)
+    matches = _scan_matches(processed_text, get_match_index(dictionary), ruby_spans)
     if not matches:
         return processed_text
     
-    # Xây dựng text mới với ruby tags
-    result = ""
+    parts = []
     last_end = 0
-    
     for start, end, kanji, hiragana in matches:
-        result += processed_text[last_end:start]
-        result += f"<ruby>{kanji}<rt>{hiragana}</rt></ruby>"
+        parts.append(processed_text[last_end:start])
+        parts.append(ruby_fragment(kanji, hiragana))
         last_end = end
-    
-    result += processed_text[last_end:]
-    return result
+    parts.append(processed_text[last_end:])
+    return ''.join(parts)
+
+def add_ruby_to_text(text, dictionary):
+    """Thêm ruby annotations vào text với format đúng cho Moodle"""
+    if not text or not has_japanese(text) or has_ruby_tags(text):
+        return text
+    return annotate_text(text, dictionary)
 
 def process_cdata_content(content, dictionary):
     """Xử lý nội dung trong CDATA section với format đúng"""
@@ -199,8 +294,12 @@ def process_cdata_content(content, dictionary):
         processed = add_ruby_to_text(content, dictionary)
         return f'<p>{processed}</p>'
 
-def process_xml_file(input_file, output_file, dictionary_path):
-    """Xử lý file XML và thêm ruby annotations với format đúng"""
+def process_xml_file(input_file, output_file, dictionary_path, dictionary=None):
+    """
+    Xử lý file XML và thêm ruby annotations với format đúng.
+    dictionary: dictionary đã load sẵn (chạy nhiều file), None = load từ dictionary_path.
+    Trả dict thống kê (None nếu lỗi).
+    """
     global missing_kanji
     missing_kanji.clear()
 
@@ -208,10 +307,11 @@ def process_xml_file(input_file, output_file, dictionary_path):
     start_time = time.time()
 
     # Load dictionary
-    dictionary = load_dictionary(dictionary_path)
+    if dictionary is None:
+        dictionary = load_dictionary(dictionary_path)
     if not dictionary:
         print("Dictionary trống hoặc không đọc được.")
-        return
+        return None
 
     try:
         # Đọc file XML
@@ -223,14 +323,15 @@ def process_xml_file(input_file, output_file, dictionary_path):
         # Xử lý các tag có format="html" (name, questiontext, answer, feedback, ...)
         def process_html_tag(match):
             tag = match.group(1)
-            attrs = match.group(2)
             content = match.group(3)
             # Chỉ xử lý nếu có tiếng Nhật và chưa có ruby
             if has_japanese(content) and not has_ruby_tags(content):
-                processed = add_ruby_to_text(content, dictionary)
+                processed = annotate_text(content, dictionary)
                 nonlocal processed_html_count
                 processed_html_count += 1
-                return f'<{tag}{attrs}>{processed}</{tag}>'
+                # Giữ nguyên thẻ mở (kể cả format="html" để Moodle hiển thị <ruby>)
+                open_tag = match.group(0)[:match.start(3) - match.start()]
+                return f'{open_tag}{processed}</{tag}>'
             return match.group(0)
 
         # Regex cho các tag có format="html"
@@ -254,23 +355,134 @@ def process_xml_file(input_file, output_file, dictionary_path):
             f.write(xml_content)
 
         processing_time = time.time() - start_time
+        return print_xml_stats(input_file, output_file, processed_html_count, processing_time)
 
-        print(f"\n=== THỐNG KÊ XỬ LÝ ===")
-        print(f"File đầu vào: {input_file}")
-        print(f"File đầu ra: {output_file}")
-        print(f"Tag format=\"html\" đã xử lý: {processed_html_count}")
-        print(f"Từ Kanji không tìm thấy: {len(missing_kanji)}")
-        print(f"Thời gian xử lý: {processing_time:.2f} giây")
+    except Exception as e:
+        print(f"Lỗi xử lý file: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def print_xml_stats(input_file, output_file, processed_html_count, processing_time):
+    """In thống kê + lưu báo cáo kanji thiếu (dùng chung cho 2 chế độ), trả dict thống kê"""
+    print(f"\n=== THỐNG KÊ XỬ LÝ ===")
+    print(f"File đầu vào: {input_file}")
+    print(f"File đầu ra: {output_file}")
+    print(f"Tag format=\"html\" đã xử lý: {processed_html_count}")
+    print(f"Từ Kanji không tìm thấy: {len(missing_kanji)}")
+    print(f"Thời gian xử lý: {processing_time:.2f} giây")
+
+    if missing_kanji:
+        save_missing_kanji_report(missing_kanji, f"{output_file}_missing_kanji.txt")
+
+    print("Xử lý hoàn tất!")
+    return {
+        "input": input_file,
+        "output": output_file,
+        "processed_html_count": processed_html_count,
+        "missing_kanji": sorted(missing_kanji),
+        "time": round(processing_time, 3),
+    }
+
+# Các tag có format="html" được thêm ruby (giống html_tag_pattern ở trên)
+HTML_TAGS = {'name', 'questiontext', 'answer', 'feedback', 'generalfeedback', 'correctfeedback',
+             'partiallycorrectfeedback', 'incorrectfeedback'}
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+def _start_tag(elem):
+    """Thẻ mở của element (không gồm con) - dùng cho root <quiz>"""
+    attrs = ''.join(f' {k}={quoteattr(v)}' for k, v in elem.attrib.items())
+    return f'<{elem.tag}{attrs}>'
+
+def _trailing_whitespace(path):
+    """Khoảng trắng sau thẻ đóng root (lxml bỏ phần này) -> đọc thẳng từ cuối file"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        tail = f.read()
+    return tail[len(tail.rstrip()):]
+
+def process_xml_file_streaming(input_file, output_file, dictionary_path, dictionary=None):
+    """
+    Chế độ streaming của process_xml_file: lxml iterparse theo sự kiện, bộ nhớ ~ 1 câu hỏi.
+    - <text> của các tag format="html" (questiontext, answer, feedback, ...) được thêm ruby tại chỗ
+    - mọi <text> được ghi lại dạng CDATA (như bước wrap_text_cdata)
+    - mỗi phần tử con của <quiz> (câu hỏi, comment) được ghi ra ngay khi đọc xong rồi xóa khỏi cây
+    Khác chế độ regex: chỉ sửa nội dung <text> (không đụng <file>, thuộc tính) và giữ nguyên
+    thuộc tính format="html" của tag đã xử lý.
+    Trả dict thống kê như process_xml_file.
+    """
+    global missing_kanji
+    missing_kanji.clear()
+
+    print(f"=== Xử lý file XML (streaming): {input_file} ===")
+    start_time = time.time()
+
+    if dictionary is None:
+        dictionary = load_dictionary(dictionary_path)
+    if not dictionary:
+        print("Dictionary trống hoặc không đọc được.")
+        return None
 
-        if missing_kanji:
-            save_missing_kanji_report(missing_kanji, f"{output_file}_missing_kanji.txt")
+    processed_html_count = 0
+    try:
+        with open(output_file, 'wb') as out:
+            root = None
+            root_open = False
+
+            def flush_children(before=None):
+                """
+                Ghi (kèm tail) rồi xóa các con của root đứng trước `before` (None = tất cả).
+                Phần tử vừa kết thúc chưa chắc đã có đủ tail -> để lần sau mới ghi.
+                """
+                nonlocal root_open
+                if not root_open:
+                    out.write(_start_tag(root).encode('utf-8'))
+                    out.write(escape(root.text or '').encode('utf-8'))
+                    root_open = True
+                for child in list(root):
+                    if child is before:
+                        break
+                    out.write(etree.tostring(child, encoding='utf-8'))
+                    root.remove(child)
+
+            context = etree.iterparse(input_file, events=('start', 'end'), strip_cdata=False,
+                                      remove_blank_text=False, huge_tree=True)
+            for event, elem in context:
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                        out.write(XML_DECLARATION.encode('utf-8'))
+                    continue
+
+                if elem.tag == 'text':
+                    text = elem.text or ''
+                    parent = elem.getparent()
+                    if (parent is not None and parent.tag in HTML_TAGS and parent.get('format') == 'html'
+                            and has_japanese(text) and not has_ruby_tags(text)):
+                        text = annotate_text(text, dictionary)
+                        processed_html_count += 1
+                    elem.text = etree.CDATA(text)
+                else:
+                    # Moodle export ghi phần tử rỗng dạng <tag></tag>, không phải <tag/>
+                    if elem.text is None and len(elem) == 0:
+                        elem.text = ''
+                    if elem.getparent() is root:
+                        flush_children(elem)
+
+            flush_children()
+            out.write(f'</{root.tag}>'.encode('utf-8'))
+            out.write(_trailing_whitespace(input_file))
 
-        print("Xử lý hoàn tất!")
+        processing_time = time.time() - start_time
+        return print_xml_stats(input_file, output_file, processed_html_count, processing_time)
 
     except Exception as e:
         print(f"Lỗi xử lý file: {e}")
         import traceback
         traceback.print_exc()
+        return None
 
 def save_missing_kanji_report(missing_kanji, report_file):
     """Lưu báo cáo các kanji không tìm thấy"""
@@ -281,10 +493,156 @@ def save_missing_kanji_report(missing_kanji, report_file):
     
     print(f"Đã lưu báo cáo kanji thiếu: {report_file}")
 
-def main():
+OUTPUT_SUFFIX = '_ruby_moodle_format.xml'
+
+# Dictionary dùng trong worker: kế thừa qua fork, hoặc load lại khi spawn
+_worker_dictionary = None
+
+def _init_xml_worker(dictionary_path):
+    global _worker_dictionary
+    if _worker_dictionary is None:
+        _worker_dictionary = load_dictionary(dictionary_path)
+
+def _process_xml_worker(input_file, output_file, dictionary_path, stream=False):
+    """Chạy trong worker: xử lý 1 file với dictionary dùng chung"""
+    if stream:
+        return process_xml_file_streaming(input_file, output_file, dictionary_path, _worker_dictionary)
+    return process_xml_file(input_file, output_file, dictionary_path, _worker_dictionary)
+
+def list_xml_inputs(input_folder):
+    """Các file .xml trong thư mục (bỏ qua file output của lần chạy trước), sắp theo tên"""
+    return [
+        os.path.join(input_folder, filename)
+        for filename in sorted(os.listdir(input_folder))
+        if filename.lower().endswith('.xml') and not filename.endswith(OUTPUT_SUFFIX)
+    ]
+
+def process_xml_folder(input_folder, dictionary_path, jobs=None, stream=False):
+    """
+    Xử lý mọi file XML trong thư mục: dictionary load 1 lần, các file chạy song song
+    trên nhiều core (jobs=1: chạy tuần tự trong process hiện tại).
+    Ghi báo cáo tổng hợp moodle_batch_summary.json + báo cáo kanji thiếu gộp missing_kanji_all.txt.
+    """
+    global _worker_dictionary
+    start_time = time.time()
+
+    inputs = list_xml_inputs(input_folder)
+    if not inputs:
+        print(f"Không tìm thấy file .xml nào trong: {input_folder}")
+        return None
+
+    dictionary = load_dictionary(dictionary_path)
+    if not dictionary:
+        print("Dictionary trống hoặc không đọc được.")
+        return None
+
+    jobs_to_run = [(input_file, input_file[:-len('.xml')] + OUTPUT_SUFFIX) for input_file in inputs]
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(jobs_to_run)))
+    print(f"=== Moodle batch: {len(jobs_to_run)} file, {jobs} process ===")
+
+    results = []
+    failed = []
+
+    def collect(input_file, stats):
+        if stats is None:
+            failed.append(input_file)
+        else:
+            results.append(stats)
+
+    # Build trie trước khi fork để các worker dùng chung
+    get_match_index(dictionary)
+    _worker_dictionary = dictionary
+    try:
+        if jobs == 1:
+            for input_file, output_file in jobs_to_run:
+                print(f"\n--- Đang xử lý: {input_file} ---")
+                collect(input_file, _process_xml_worker(input_file, output_file, dictionary_path, stream))
+        else:
+            with ProcessPoolExecutor(max_workers=jobs, mp_context=pool_context(),
+                                     initializer=_init_xml_worker,
+                                     initargs=(dictionary_path,)) as executor:
+                futures = {
+                    executor.submit(_process_xml_worker, input_file, output_file, dictionary_path,
+                                    stream): input_file
+                    for input_file, output_file in jobs_to_run
+                }
+                for future in as_completed(futures):
+                    input_file = futures[future]
+                    try:
+                        stats = future.result()
+                    except Exception as e:
+                        print(f"Lỗi khi xử lý {input_file}: {e}")
+                        stats = None
+                    collect(input_file, stats)
+    finally:
+        _worker_dictionary = None
+
+    results.sort(key=lambda s: s["input"])
+    failed.sort()
+    all_missing = set()
+    for stats in results:
+        all_missing.update(stats["missing_kanji"])
+
+    missing_report = None
+    if all_missing:
+        missing_report = os.path.join(input_folder, "missing_kanji_all.txt")
+        save_missing_kanji_report(all_missing, missing_report)
+
+    summary = {
+        "dictionary": dictionary_path,
+        "mode": "stream" if stream else "regex",
+        "jobs": jobs,
+        "files_total": len(inputs),
+        "files_processed": len(results),
+        "files_failed": len(failed),
+        "processed_html_count": sum(s["processed_html_count"] for s in results),
+        "missing_kanji_count": len(all_missing),
+        "missing_kanji_report": missing_report,
+        "wall_time": round(time.time() - start_time, 3),
+        "files": [
+            {
+                "input": s["input"],
+                "output": s["output"],
+                "time": s["time"],
+                "processed_html_count": s["processed_html_count"],
+                "missing_kanji_count": len(s["missing_kanji"]),
+            }
+            for s in results
+        ],
+        "failed": failed,
+    }
+
+    summary_path = os.path.join(input_folder, "moodle_batch_summary.json")
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print("\n=== KẾT QUẢ BATCH ===")
+    for item in summary["files"]:
+        print(f"{item['input']}: {item['time']:.2f}s | "
+              f"{item['processed_html_count']} tag html | thiếu {item['missing_kanji_count']} kanji")
+    print(f"File đã xử lý: {len(results)} | lỗi: {len(failed)}")
+    print(f"Tag format=\"html\" đã xử lý: {summary['processed_html_count']}")
+    print(f"Kanji không tìm thấy (gộp): {len(all_missing)}")
+    print(f"Tổng thời gian: {summary['wall_time']:.2f} giây")
+    print(f"Báo cáo tổng hợp: {summary_path}")
+    return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Thêm Ruby cho file XML Moodle")
+    parser.add_argument("input_folder", nargs="?", default="test", help="Thư mục chứa file XML")
+    parser.add_argument("--dict", dest="dictionary", default="dictionary_hiragana 12-08 14h55.json",
+                        help="File dictionary JSON")
+    parser.add_argument("--stream", action="store_true",
+                        help="Xử lý kiểu streaming (lxml iterparse, ít RAM cho file lớn)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Số process xử lý song song (mặc định: số core, 1 = tuần tự)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main function"""
-    dictionary_file = "dictionary_hiragana 12-08 14h55.json"
-    input_folder = "test"
+    args = parse_args(argv)
+    dictionary_file = args.dictionary
+    input_folder = args.input_folder
     if not os.path.exists(dictionary_file):
         print(f"Không tìm thấy dictionary: {dictionary_file}")
         return
@@ -297,12 +655,7 @@ def main():
     print(f"Dictionary file: {dictionary_file}")
     print()
 
-    for filename in os.listdir(input_folder):
-        if filename.lower().endswith('.xml'):
-            input_file = os.path.join(input_folder, filename)
-            output_file = os.path.join(input_folder, filename.replace('.xml', '_ruby_moodle_format.xml'))
-            print(f"\n--- Đang xử lý: {input_file} ---")
-            process_xml_file(input_file, output_file, dictionary_file)
+    process_xml_folder(input_folder, dictionary_file, jobs=args.jobs, stream=args.stream)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark phân loại ký tự kanji/kana: regex.fullmatch từng ký tự (cách cũ) vs char_classes
+(frozenset + finditer). Đo chi phí mỗi entry của heuristic anchor trong convert_dict_to_struct
+(infer_segments + segments_to_map) và kiểm tra luôn kết quả 2 cách giống hệt nhau
+(bản fullmatch cũ + dữ liệu giả lập dùng chung với test_char_classes).
+
+Không truyền file thì tạo dictionary giả lập (surface kanji + okurigana, reading hiragana).
+
+    python bench_char_classes.py [--dictionary dictionary.json] [--entries 100000] [--repeat 3]
+"""
+
+import argparse
+import json
+import time
+from contextlib import contextmanager
+
+import add_ruby_new
+import convert_dict_to_struct as converter
+from char_classes import KANJI_CHARS
+from test_char_classes import (
+    legacy_contains_kanji,
+    legacy_extract_kana_runs,
+    legacy_is_kana,
+    legacy_is_kanji,
+    synthetic_dictionary,
+)
+
+
+class _LegacyKanjiChars:
+    """Thay KANJI_CHARS: `ch in ...` đi qua fullmatch như trước"""
+
+    def __contains__(self, ch):
+        return legacy_is_kanji(ch)
+
+
+@contextmanager
+def legacy_classes():
+    """Tạm thay các hàm phân loại trong convert_dict_to_struct bằng bản fullmatch cũ"""
+    patched = {
+        "extract_kana_runs": legacy_extract_kana_runs,
+        "contains_kanji": legacy_contains_kanji,
+        "KANJI_CHARS": _LegacyKanjiChars(),
+    }
+    saved = {name: getattr(converter, name) for name in patched}
+    for name, value in patched.items():
+        setattr(converter, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(converter, name, value)
+
+
+def anchor_entry(surface, reading):
+    """Heuristic anchor (infer_segments + segments_to_map) - phần phân loại ký tự theo từng entry"""
+    if not converter.contains_kanji(surface):
+        return None
+    segments, skipped_any = converter.infer_segments(surface, reading)
+    return converter.segments_to_map(surface, segments, reading), skipped_any
+
+
+def time_entries(items, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = [anchor_entry(surface, reading) for surface, reading in items]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, out
+
+
+def time_chars(func, chars, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for ch in chars:
+            func(ch)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark phân loại kanji/kana: fullmatch vs char_classes")
+    parser.add_argument("--dictionary", default=None, help="dictionary.json (mặc định: tạo dữ liệu giả lập)")
+    parser.add_argument("--entries", type=int, default=100000, help="Số entry giả lập")
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần đo (lấy lần nhanh nhất)")
+    args = parser.parse_args(argv)
+
+    if args.dictionary:
+        with open(args.dictionary, "r", encoding="utf-8") as f:
+            source = json.load(f)
+    else:
+        source = synthetic_dictionary(args.entries)
+    items = list(source.items())
+    chars = "".join(surface for surface, _ in items)
+
+    print(f"=== Phân loại ký tự: {len(items):,} entry, {len(chars):,} ký tự ===")
+    for name, old, new in (
+        ("is_kanji (convert)", legacy_is_kanji, converter.is_kanji),
+        ("is_kana (convert)", legacy_is_kana, converter.is_kana),
+        ("is_kanji_char (add_ruby_new)", legacy_is_kanji, add_ruby_new.is_kanji_char),
+        ("ch in KANJI_CHARS", legacy_is_kanji, KANJI_CHARS.__contains__),
+    ):
+        t_old = time_chars(old, chars, args.repeat)
+        t_new = time_chars(new, chars, args.repeat)
+        print(f"{name:<30} {t_old * 1e9 / len(chars):6.1f} ns -> {t_new * 1e9 / len(chars):6.1f} ns/ký tự "
+              f"| x{t_old / t_new:.2f}")
+
+    with legacy_classes():
+        t_old, out_old = time_entries(items, args.repeat)
+    t_new, out_new = time_entries(items, args.repeat)
+    assert out_old == out_new, "kết quả heuristic anchor khác cách cũ"
+    print(f"{'anchor segments':<30} {t_old * 1e6 / len(items):6.2f} us -> {t_new * 1e6 / len(items):6.2f} us/entry "
+          f"| x{t_old / t_new:.2f} (kết quả giống hệt)")
+
+
+if __name__ == "__main__":
+    main()
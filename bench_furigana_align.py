@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark tách furigana: heuristic anchor cũ (infer_segments + segments_to_map) vs DP align
+(furigana_align + bảng reading kanji dựng từ chính dictionary).
+
+Đo: tỉ lệ entry `uncertain`, tỉ lệ map đúng từng kanji (so với đáp án của dữ liệu giả lập),
+thời gian mỗi entry. Không truyền file thì tạo từ điển giả lập có đáp án: mỗi kanji có 1-2 on'yomi
+và 1 kun'yomi, từ ghép on'yomi (có rendaku/sokuon), từ kun + okurigana, từ 1 kanji.
+Với file thật (--dictionary) chỉ đo được tỉ lệ uncertain và thời gian.
+
+    python bench_furigana_align.py [--dictionary dictionary.json] [--entries 50000]
+"""
+
+import argparse
+import json
+import random
+import time
+
+import convert_dict_to_struct as converter
+from furigana_align import KanjiReadingTable, collect_kanji_readings, reading_variants
+
+ON_FINALS = "んういつく"
+CONSONANTS = "かきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわ"
+
+
+def synthetic_lexicon(entries, kanji_count=2000, seed=0):
+    """{surface: (reading, [reading từng ký tự hoặc None cho kana])}"""
+    rng = random.Random(seed)
+    kanji = [chr(0x4e00 + i * 7) for i in range(kanji_count)]
+    on = {k: [rng.choice(CONSONANTS) + rng.choice(["", "", rng.choice(ON_FINALS)])
+              for _ in range(rng.randint(1, 2))] for k in kanji}
+    kun = {k: "".join(rng.choice(CONSONANTS) for _ in range(rng.randint(2, 3))) for k in kanji}
+
+    lexicon = {}
+    while len(lexicon) < entries:
+        roll = rng.random()
+        if roll < 0.55:
+            # từ ghép on'yomi 2-3 kanji, ~15% rendaku/sokuon
+            chars = rng.sample(kanji, rng.randint(2, 3))
+            pieces = [rng.choice(on[k]) for k in chars]
+            for t in range(1, len(pieces)):
+                variants = sorted(reading_variants(pieces[t]))
+                if variants and rng.random() < 0.15:
+                    pieces[t] = rng.choice(variants)
+            surface, truth = "".join(chars), pieces
+        elif roll < 0.85:
+            # kun + okurigana
+            k = rng.choice(kanji)
+            okuri = rng.choice(["る", "い", "く", "す", "む", "べる", "しい"])
+            surface, truth = k + okuri, [kun[k]] + [None] * len(okuri)
+            pieces = [kun[k], okuri]
+        else:
+            k = rng.choice(kanji)
+            surface, truth = k, [rng.choice([kun[k]] + on[k])]
+            pieces = truth
+        if surface not in lexicon:
+            lexicon[surface] = ("".join(pieces), truth)
+    return lexicon
+
+
+def map_matches(mapping, truth):
+    expected = {i: rt for i, rt in enumerate(truth) if rt is not None}
+    return {m["i"]: m["rt"] for m in mapping} == expected
+
+
+def run_old(items):
+    result = []
+    for surface, reading in items:
+        segments, skipped_any = converter.infer_segments(surface, reading)
+        mapping, uncertain = converter.segments_to_map(surface, segments, reading)
+        result.append((mapping, bool(skipped_any or uncertain)))
+    return result
+
+
+def run_new(items, table):
+    result = []
+    for surface, reading in items:
+        entry = converter.convert_entry(surface, reading, table)
+        result.append((entry["map"], entry["uncertain"]))
+    return result
+
+
+def report(name, results, seconds, truths):
+    total = len(results)
+    uncertain = sum(1 for _, u in results if u)
+    line = f"{name:<14} uncertain {uncertain:>7,} ({uncertain / total:6.1%}) | {seconds * 1e6 / total:6.1f} us/entry"
+    if truths is not None:
+        correct = sum(1 for (mp, _), truth in zip(results, truths) if map_matches(mp, truth))
+        certain = [(mp, truth) for (mp, u), truth in zip(results, truths) if not u]
+        certain_ok = sum(1 for mp, truth in certain if map_matches(mp, truth))
+        line += f" | map đúng {correct / total:6.1%}"
+        if certain:
+            line += f" (entry không uncertain: {certain_ok / len(certain):6.1%})"
+    print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark tách furigana: anchor cũ vs DP align")
+    parser.add_argument("--dictionary", default=None, help="dictionary.json {surface: reading} thật")
+    parser.add_argument("--entries", type=int, default=50000, help="Số entry giả lập")
+    args = parser.parse_args(argv)
+
+    if args.dictionary:
+        with open(args.dictionary, "r", encoding="utf-8") as f:
+            source = json.load(f)
+        items = [(s, r) for s, r in source.items()
+                 if isinstance(r, str) and r and converter.contains_kanji(s)]
+        truths = None
+    else:
+        lexicon = synthetic_lexicon(args.entries)
+        items = [(s, r) for s, (r, _) in lexicon.items()]
+        truths = [truth for _, truth in lexicon.values()]
+
+    print(f"=== Tách furigana: {len(items):,} entry có kanji ===")
+    start = time.perf_counter()
+    old = run_old(items)
+    report("anchor cũ", old, time.perf_counter() - start, truths)
+
+    start = time.perf_counter()
+    table = KanjiReadingTable(collect_kanji_readings(items))
+    table = KanjiReadingTable(collect_kanji_readings(items, table))
+    build_seconds = time.perf_counter() - start
+    print(f"bảng reading: {len(table):,} kanji, dựng trong {build_seconds:.2f}s "
+          f"({build_seconds * 1e6 / len(items):.1f} us/entry)")
+    start = time.perf_counter()
+    new = run_new(items, table)
+    report("DP align", new, time.perf_counter() - start, truths)
+
+
+if __name__ == "__main__":
+    main()
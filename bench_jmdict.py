@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark chuyển JMdict -> dictionary kanji-hiragana: 1 process vs N process (shard song song).
+Kiểm tra luôn kết quả N process giống hệt 1 process (cả thứ tự key).
+
+Không truyền file thì tạo JMdict_e.gz giả lập (entry ngẫu nhiên, DTD có entity như file thật).
+
+    python bench_jmdict.py [--jmdict JMdict_e.gz] [--entries 200000] [--workers 1 2 4]
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import os
+import random
+import tempfile
+import time
+
+import download_jmdict
+
+HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE JMdict [
+<!ELEMENT JMdict (entry*)>
+<!ENTITY n "noun (common) (futsuumeishi)">
+<!ENTITY vs "noun or participle which takes the aux. verb suru">
+<!ENTITY uk "word usually written using kana alone">
+<!ENTITY oK "word containing out-dated kanji or kanji usage">
+]>
+<JMdict>
+"""
+
+
+def write_synthetic_jmdict(path, entries, seed=0):
+    """JMdict giả lập: 1-3 keb, 1-3 reb (có re_restr, katakana, ke_pri), ~10% entry chỉ có kana"""
+    rng = random.Random(seed)
+    kana = [chr(c) for c in range(0x3041, 0x3094)]
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(HEADER)
+        for seq in range(entries):
+            kebs = [] if rng.random() < 0.1 else [
+                "".join(chr(0x4e00 + rng.randrange(3000)) for _ in range(rng.randint(1, 3)))
+                for _ in range(rng.randint(1, 3))
+            ]
+            f.write(f"<entry>\n<ent_seq>{1000000 + seq}</ent_seq>\n")
+            for keb in kebs:
+                pri = f"<ke_pri>nf{rng.randint(1, 48):02d}</ke_pri>\n" if rng.random() < 0.3 else ""
+                f.write(f"<k_ele>\n<keb>{keb}</keb>\n{pri}</k_ele>\n")
+            for i in range(rng.randint(1, 3)):
+                reb = "".join(rng.choice(kana) for _ in range(rng.randint(2, 5)))
+                restr = f"<re_restr>{kebs[0]}</re_restr>\n" if kebs and i == 2 else ""
+                f.write(f"<r_ele>\n<reb>{reb}</reb>\n{restr}</r_ele>\n")
+            f.write("<sense>\n<pos>&n;</pos>\n<pos>&vs;</pos>\n<misc>&uk;</misc>\n"
+                    "<gloss>synthetic gloss</gloss>\n</sense>\n</entry>\n")
+        f.write("</JMdict>\n")
+
+
+def run(jmdict_path, workers):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = download_jmdict.parse_jmdict_to_dict_full(jmdict_path, workers=workers)
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark parse JMdict 1 vs N process")
+    parser.add_argument("--jmdict", default=None, help="File JMdict_e.gz thật (mặc định: tạo file giả lập)")
+    parser.add_argument("--entries", type=int, default=200000, help="Số entry của file giả lập")
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="Các số process cần đo (mặc định: 1 và số CPU)")
+    args = parser.parse_args(argv)
+
+    workers_list = args.workers or sorted({1, os.cpu_count() or 1})
+    with tempfile.TemporaryDirectory() as folder:
+        jmdict_path = args.jmdict
+        if jmdict_path is None:
+            jmdict_path = os.path.join(folder, "JMdict_e.gz")
+            write_synthetic_jmdict(jmdict_path, args.entries)
+
+        print(f"=== Parse JMdict: {jmdict_path} ({os.path.getsize(jmdict_path) // 1024} KB gzip), "
+              f"{os.cpu_count()} CPU ===")
+        baseline = None
+        for workers in workers_list:
+            seconds, result = run(jmdict_path, workers)
+            if baseline is None:
+                baseline = (seconds, result)
+            else:
+                assert list(result.items()) == list(baseline[1].items()), "kết quả khác 1 process"
+            print(f"{workers:>2} process: {seconds:.2f}s | {len(result):,} từ | x{baseline[0] / seconds:.2f}")
+
+
+if __name__ == "__main__":
+    main()
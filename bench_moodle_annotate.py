@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Micro-benchmark add_ruby_to_text (Moodle) trên file XML câu hỏi mẫu:
+bản cũ (result += ..., format lại <ruby> mỗi lần, kiểm tra lặp) vs annotate_text hiện tại,
+cùng dùng find_kanji_matches hiện tại; in thêm thời gian chỉ tìm match để thấy phần ghép chuỗi.
+
+Ruby có sẵn trong file mẫu được gỡ ra để lấy text gốc; dictionary dựng lại từ chính các cặp ruby đó
+(bản cũ và load_sample dùng chung với test_moodle_matcher).
+
+    python bench_moodle_annotate.py [số vòng]
+"""
+
+import sys
+import time
+
+import add_ruby_to_xml_moodle_format as moodle
+from test_moodle_matcher import legacy_add_ruby_to_text, load_sample
+
+
+def bench(func, texts, dictionary, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            func(text, dictionary)
+    return time.perf_counter() - start
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    texts, dictionary = load_sample()
+    chars = sum(len(t) for t in texts) * rounds
+
+    for text in texts:
+        assert moodle.add_ruby_to_text(text, dictionary) == legacy_add_ruby_to_text(text, dictionary)
+
+    legacy_time = bench(legacy_add_ruby_to_text, texts, dictionary, rounds)
+    new_time = bench(moodle.add_ruby_to_text, texts, dictionary, rounds)
+    match_time = bench(moodle.find_kanji_matches, texts, dictionary, rounds)
+
+    print(f"=== add_ruby_to_text: {len(texts)} text x {rounds} vòng, dictionary {len(dictionary)} từ ===")
+    print(f"Bản cũ      : {legacy_time:.3f}s ({chars / legacy_time:,.0f} ký tự/giây)")
+    print(f"annotate    : {new_time:.3f}s ({chars / new_time:,.0f} ký tự/giây)")
+    print(f"Nhanh hơn   : x{legacy_time / new_time:.2f}")
+    print(f"Chỉ tìm match: {match_time:.3f}s ({match_time / new_time * 100:.0f}% thời gian annotate)")
+
+
+if __name__ == "__main__":
+    main()
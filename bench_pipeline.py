@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark toàn pipeline thêm ruby, đo riêng từng giai đoạn cho 3 engine:
+  add_ruby.py, add_ruby_new.py, add_ruby_to_xml_moodle_format.py
+
+Giai đoạn: load dictionary -> match -> rewrite (DOM / text) -> save.
+Mỗi engine chạy trong 1 process spawn riêng (không dùng chung cache, không kế thừa RSS của process cha).
+Kết quả (giây, ký tự/giây, paragraph/giây, peak RSS tăng thêm khi chạy engine) ghi ra file JSON
+để so sánh giữa các lần chạy.
+
+    python bench_pipeline.py                             # dữ liệu tổng hợp, ghi bench_baseline.json
+    python bench_pipeline.py --paragraphs 5000 --dict-size 100000
+    python bench_pipeline.py --docx kienthucchung.docx --dict dict_struct.json   # dữ liệu thật
+    python bench_pipeline.py --output new.json --compare bench_baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from docx import Document
+
+try:
+    import resource
+except ImportError:     # Windows: không đo được peak RSS
+    resource = None
+
+ENGINES = ("add_ruby", "add_ruby_new", "moodle")
+DEFAULT_OUTPUT = "bench_baseline.json"
+REGRESSION_THRESHOLD = 10.0     # % chậm hơn baseline thì đánh dấu
+
+HIRAGANA = [chr(c) for c in range(0x3041, 0x3094)]
+PARTICLES = ["の", "は", "を", "に", "が", "と", "で", "する。", "について", "として、", "です。"]
+CHOICES = "アイウエオ"
+
+# Giống regex trong add_ruby_to_xml_moodle_format.process_xml_file
+HTML_TAG_PATTERN = re.compile(r'<(name|questiontext|answer|feedback|generalfeedback|correctfeedback|'
+                              r'partiallycorrectfeedback|incorrectfeedback)([^>]*)format="html"[^>]*>(.*?)</\1>',
+                              re.DOTALL)
+
+
+# =========================================
+# Sinh dữ liệu tổng hợp
+# =========================================
+def generate_dictionary(size, rng):
+    """Dictionary giả: từ 1-4 kanji -> reading hiragana"""
+    pool = [chr(c) for c in rng.sample(range(0x4E00, 0x9FA6), 800)]
+    dictionary = {}
+    while len(dictionary) < size:
+        length = rng.choice((1, 2, 2, 2, 3, 4))
+        word = "".join(rng.choice(pool) for _ in range(length))
+        dictionary[word] = "".join(rng.choice(HIRAGANA) for _ in range(length * 2))
+    return dictionary
+
+
+def generate_paragraphs(count, dictionary, rng, length=80):
+    """Câu giả trộn từ có trong dictionary, kanji lạ, kana và số full-width"""
+    words = list(dictionary)
+    paragraphs = []
+    for n in range(count):
+        parts = [f"問題{chr(0xFF11 + n % 9)}　"] if n % 5 == 0 else []
+        size = 0
+        while size < length:
+            roll = rng.random()
+            if roll < 0.55:
+                part = rng.choice(words)
+            elif roll < 0.6:
+                part = chr(rng.randrange(0x9FA6, 0x9FFF))       # kanji không có trong dictionary
+            elif roll < 0.63:
+                part = "".join(chr(0xFF10 + rng.randrange(10)) for _ in range(rng.randint(1, 3)))
+            else:
+                part = rng.choice(PARTICLES)
+            parts.append(part)
+            size += len(part)
+        paragraphs.append("".join(parts))
+    return paragraphs
+
+
+def write_docx(paragraphs, path):
+    """Mỗi paragraph tách thành vài run (1 run in đậm) như tài liệu thật"""
+    doc = Document()
+    for text in paragraphs:
+        p = doc.add_paragraph()
+        cut = len(text) // 3
+        p.add_run(text[:cut])
+        p.add_run(text[cut:2 * cut]).bold = True
+        p.add_run(text[2 * cut:])
+    doc.save(path)
+
+
+def write_moodle_xml(paragraphs, path):
+    """Quiz Moodle: mỗi câu hỏi = questiontext + 2 đáp án (format html, CDATA)"""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', "<quiz>"]
+    for n in range(0, len(paragraphs), 3):
+        question, *answers = paragraphs[n:n + 3]
+        lines.append('  <question type="multichoice">')
+        lines.append(f"    <name><text>問題{n // 3 + 1}</text></name>")
+        lines.append(f'    <questiontext format="html"><text><![CDATA[<p>{question}</p>]]></text></questiontext>')
+        for k, answer in enumerate(answers):
+            lines.append(f'    <answer fraction="{100 if k == 0 else 0}" format="html">'
+                         f"<text><![CDATA[<p>{CHOICES[k]}．{answer}</p>]]></text></answer>")
+        lines.append("  </question>")
+    lines.append("</quiz>")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def read_moodle_texts(path):
+    """Nội dung các tag format="html" (đúng phần mà engine Moodle xử lý)"""
+    import add_ruby_to_xml_moodle_format as moodle
+    with open(path, "r", encoding="utf-8") as f:
+        return [m.group(3) for m in HTML_TAG_PATTERN.finditer(f.read()) if moodle.has_japanese(m.group(3))]
+
+
+def prepare_corpus(folder, args):
+    """Tạo (hoặc dùng file thật) dictionary / docx / Moodle XML"""
+    rng = random.Random(args.seed)
+    corpus = {}
+
+    if args.dict:
+        corpus["dictionary"] = args.dict
+        with open(args.dict, "r", encoding="utf-8") as f:
+            words = {k: v for k, v in json.load(f).items() if isinstance(k, str)}
+    else:
+        words = generate_dictionary(args.dict_size, rng)
+        corpus["dictionary"] = os.path.join(folder, "bench_dict.json")
+        with open(corpus["dictionary"], "w", encoding="utf-8") as f:
+            json.dump(words, f, ensure_ascii=False)
+
+    paragraphs = None
+    if not (args.docx and args.xml):
+        paragraphs = generate_paragraphs(args.paragraphs, words, rng)
+
+    if args.docx:
+        corpus["docx"] = args.docx
+    else:
+        corpus["docx"] = os.path.join(folder, "bench.docx")
+        write_docx(paragraphs, corpus["docx"])
+
+    if args.xml:
+        corpus["xml"] = args.xml
+    else:
+        corpus["xml"] = os.path.join(folder, "bench.xml")
+        write_moodle_xml(paragraphs, corpus["xml"])
+
+    corpus["folder"] = folder
+    return corpus
+
+
+# =========================================
+# Đo từng engine (chạy trong process riêng)
+# =========================================
+def _stage(results, name, func, chars, paragraphs):
+    start = time.perf_counter()
+    value = func()
+    seconds = time.perf_counter() - start
+    results[name] = {
+        "seconds": round(seconds, 4),
+        "chars_per_s": round(chars / seconds, 1) if seconds and chars else None,
+        "paragraphs_per_s": round(paragraphs / seconds, 1) if seconds and paragraphs else None,
+    }
+    return value
+
+
+def _docx_workload(path, has_japanese):
+    doc = Document(path)
+    texts = [p.text for p in doc.paragraphs if has_japanese(p.text)]
+    return len(texts), sum(len(t) for t in texts)
+
+
+def bench_add_ruby(corpus):
+    import add_ruby as engine
+
+    stages = {}
+    n_par, n_chars = _docx_workload(corpus["docx"], engine.has_japanese)
+    dictionary = _stage(stages, "load", lambda: engine.load_dictionary(corpus["dictionary"]), 0, 0)
+
+    doc = Document(corpus["docx"])
+    texts = [run.text for p in doc.paragraphs for run in p.runs if engine.has_japanese(run.text)]
+    _stage(stages, "match", lambda: [engine.find_kanji_matches_optimized(t, dictionary) for t in texts],
+           n_chars, n_par)
+
+    # engine cũ tự tìm match trong lúc rewrite -> "rewrite" bao gồm cả match
+    def rewrite():
+        for paragraph in doc.paragraphs:
+            engine.add_ruby_to_paragraph_preserve_runs(paragraph, dictionary)
+    _stage(stages, "rewrite", rewrite, n_chars, n_par)
+
+    out = os.path.join(corpus["folder"], "out_add_ruby.docx")
+    _stage(stages, "save", lambda: doc.save(out), n_chars, n_par)
+    return stages
+
+
+def bench_add_ruby_new(corpus):
+    import add_ruby_new as engine
+    from compiled_dict import compiled_path_for
+
+    stages = {}
+    n_par, n_chars = _docx_workload(corpus["docx"], engine.has_japanese)
+
+    compiled = compiled_path_for(corpus["dictionary"])
+    if os.path.exists(compiled) and not corpus.get("keep_compiled"):
+        os.remove(compiled)
+    _stage(stages, "load", lambda: engine.load_dictionary(corpus["dictionary"]), 0, 0)
+    dictionary = _stage(stages, "load_compiled", lambda: engine.load_dictionary(corpus["dictionary"]), 0, 0)
+
+    doc = Document(corpus["docx"])
+    texts = engine.collect_run_texts(doc)
+    engine.configure_match_cache(None)
+    results = _stage(stages, "match", lambda: engine.match_texts(texts, dictionary), n_chars, n_par)
+    matches_by_text = {text: matches for text, (matches, _) in results.items()}
+
+    def rewrite():
+        for paragraph in doc.paragraphs:
+            engine.add_ruby_to_paragraph_preserve_runs(paragraph, dictionary, matches_by_text)
+    _stage(stages, "rewrite", rewrite, n_chars, n_par)
+
+    out = os.path.join(corpus["folder"], "out_add_ruby_new.docx")
+    _stage(stages, "save", lambda: doc.save(out), n_chars, n_par)
+    return stages
+
+
+def bench_moodle(corpus):
+    import add_ruby_to_xml_moodle_format as engine
+
+    stages = {}
+    texts = read_moodle_texts(corpus["xml"])
+    n_par, n_chars = len(texts), sum(len(t) for t in texts)
+
+    dictionary = _stage(stages, "load", lambda: engine.load_dictionary(corpus["dictionary"]), 0, 0)
+    _stage(stages, "match", lambda: [engine.find_kanji_matches(t, dictionary) for t in texts], n_chars, n_par)
+    _stage(stages, "rewrite", lambda: [engine.add_ruby_to_text(t, dictionary) for t in texts], n_chars, n_par)
+
+    # engine Moodle không tách được bước save -> đo cả file (load + xử lý + ghi)
+    out = os.path.join(corpus["folder"], "out_moodle.xml")
+    _stage(stages, "end_to_end", lambda: engine.process_xml_file(corpus["xml"], out, corpus["dictionary"]),
+           n_chars, n_par)
+    _stage(stages, "end_to_end_stream",
+           lambda: engine.process_xml_file_streaming(corpus["xml"], out, corpus["dictionary"]), n_chars, n_par)
+    return stages
+
+
+BENCHES = {"add_ruby": bench_add_ruby, "add_ruby_new": bench_add_ruby_new, "moodle": bench_moodle}
+
+
+def _proc_status_kb(field):
+    """Giá trị (KB) trong /proc/self/status (Linux), None nếu không có"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    """
+    Peak RSS của process hiện tại.
+    Linux: VmHWM (riêng của process sau exec); ru_maxrss thì kế thừa mức cao nhất của process cha
+    qua cả fork lẫn exec nên chỉ dùng khi không có /proc.
+    """
+    hwm = _proc_status_kb("VmHWM")
+    if hwm is not None:
+        return round(hwm / 1024, 1)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: byte
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_engine(bench, corpus):
+    """
+    Chạy trong process con; ẩn output của engine.
+    peak_rss_mb = mức tăng của peak RSS so với lúc process con vừa khởi động (base_rss_mb),
+    tức bộ nhớ do chính engine (import + dữ liệu) dùng.
+    """
+    base = peak_rss_mb()
+    with contextlib.redirect_stdout(io.StringIO()):
+        stages = bench(corpus)
+    peak = peak_rss_mb()
+    return {
+        "stages": stages,
+        "peak_rss_mb": None if peak is None else round(peak - base, 1),
+        "base_rss_mb": base,
+    }
+
+
+def run_benchmarks(corpus, engines=ENGINES, benches=BENCHES):
+    """
+    Mỗi engine 1 process spawn mới: process fork dùng chung (và tính vào RSS) toàn bộ bộ nhớ của
+    process cha, nên peak RSS của engine sẽ cộng cả corpus / dictionary đang nằm trong process cha.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for name in engines:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+            results[name] = executor.submit(_run_engine, benches[name], corpus).result()
+    return results
+
+
+# =========================================
+# Báo cáo / so sánh baseline
+# =========================================
+def print_results(results):
+    print(f"{'engine':<14}{'stage':<15}{'giây':>10}{'ký tự/s':>14}{'paragraph/s':>14}")
+    for name, data in results.items():
+        for stage, values in data["stages"].items():
+            cps = values["chars_per_s"]
+            pps = values["paragraphs_per_s"]
+            print(f"{name:<14}{stage:<15}{values['seconds']:>10.3f}"
+                  f"{cps if cps is not None else '-':>14}{pps if pps is not None else '-':>14}")
+        peak = data["peak_rss_mb"]
+        print(f"{name:<14}{'peak RSS (+)':<15}{peak if peak is not None else '-':>10} MB")
+
+
+def compare_results(old, new, threshold=REGRESSION_THRESHOLD):
+    """In chênh lệch thời gian từng stage; trả danh sách (engine, stage, %) chậm hơn threshold"""
+    regressions = []
+    print(f"\n=== SO SÁNH VỚI BASELINE ({old['meta'].get('created')}) ===")
+    for name, data in new["results"].items():
+        old_stages = old["results"].get(name, {}).get("stages", {})
+        for stage, values in data["stages"].items():
+            if stage not in old_stages or not old_stages[stage]["seconds"]:
+                continue
+            before, after = old_stages[stage]["seconds"], values["seconds"]
+            delta = (after - before) / before * 100
+            flag = "  <-- CHẬM HƠN" if delta > threshold else ""
+            print(f"{name:<14}{stage:<15}{before:>10.3f} -> {after:<10.3f}{delta:+7.1f}%{flag}")
+            if delta > threshold:
+                regressions.append((name, stage, round(delta, 1)))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline thêm ruby")
+    parser.add_argument("--paragraphs", type=int, default=1000, help="Số paragraph tổng hợp")
+    parser.add_argument("--dict-size", type=int, default=20000, help="Số từ trong dictionary tổng hợp")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--dict", default=None, help="Dùng dictionary JSON thật")
+    parser.add_argument("--docx", default=None, help="Dùng file Word thật")
+    parser.add_argument("--xml", default=None, help="Dùng file Moodle XML thật")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="File JSON kết quả")
+    parser.add_argument("--compare", default=None, help="File JSON baseline để so sánh")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="%% chậm hơn baseline thì coi là regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder:
+        corpus = prepare_corpus(folder, args)
+        # không xóa .rubydict cạnh dictionary thật của người dùng
+        corpus["keep_compiled"] = bool(args.dict)
+        print(f"=== Benchmark: {', '.join(args.engines)} ===")
+        print(f"Dictionary: {args.dict or f'tổng hợp {args.dict_size} từ'} | "
+              f"Word: {args.docx or f'tổng hợp {args.paragraphs} paragraph'} | "
+              f"Moodle: {args.xml or 'tổng hợp'}")
+        results = run_benchmarks(corpus, args.engines)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "paragraphs": None if args.docx else args.paragraphs,
+            "dict_size": None if args.dict else args.dict_size,
+            "seed": args.seed,
+            "dict": args.dict,
+            "docx": args.docx,
+            "xml": args.xml,
+        },
+        "results": results,
+    }
+
+    print_results(results)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nĐã ghi kết quả: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare_results(json.load(f), report, args.threshold)
+        if regressions:
+            print(f"Có {len(regressions)} stage chậm hơn baseline > {args.threshold}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
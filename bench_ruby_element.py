@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark tạo element ruby: dựng từ đầu (OxmlElement) vs clone template.
+
+    python bench_ruby_element.py [số element]
+"""
+
+import sys
+import time
+
+from docx import Document
+
+from add_ruby_new import _build_ruby_element, create_ruby_element
+
+WORDS = [("日本", "にほん"), ("品質管理", "ひんしつかんり"), ("学校", "がっこう"), ("問題", "もんだい")]
+
+
+def make_source_runs():
+    doc = Document()
+    p = doc.add_paragraph()
+    plain = p.add_run("x")
+    styled = p.add_run("y")
+    styled.bold = True
+    styled.italic = True
+    styled.font.name = "MS Gothic"
+    return [None, plain, styled]
+
+
+def bench(func, count, runs):
+    start = time.perf_counter()
+    for n in range(count):
+        kanji, hiragana = WORDS[n % len(WORDS)]
+        func(kanji, hiragana, runs[n % len(runs)])
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    runs = make_source_runs()
+
+    build_time = bench(_build_ruby_element, count, runs)
+    clone_time = bench(create_ruby_element, count, runs)
+
+    print(f"=== Tạo {count} element ruby ===")
+    print(f"Dựng từ đầu   : {build_time:.3f}s ({count / build_time:,.0f} element/giây)")
+    print(f"Clone template: {clone_time:.3f}s ({count / clone_time:,.0f} element/giây)")
+    print(f"Nhanh hơn     : x{build_time / clone_time:.1f}")
+
+
+if __name__ == "__main__":
+    main()
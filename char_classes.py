@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lớp ký tự tiếng Nhật dùng chung (convert_dict_to_struct, add_ruby_new, add_ruby_to_xml_moodle_format).
+
+- *_RANGE: đoạn Unicode để ghép vào character class của regex
+- *_CHARS: frozenset dựng sẵn 1 lần -> kiểm tra 1 ký tự bằng `ch in ...`
+  (nhanh hơn ~5 lần so với gọi regex.fullmatch cho từng ký tự)
+- iter_runs / kana_runs: tách surface thành các đoạn kanji/kana bằng 1 lần re.finditer
+"""
+
+import re
+
+KANJI_RANGE = "\u4e00-\u9fff"          # CJK Unified Ideographs
+ITERATION_MARK = "々"
+HIRAGANA_RANGE = "\u3040-\u309f"
+KATAKANA_RANGE = "\u30a0-\u30ff"       # gồm cả ー
+FULLWIDTH_DIGIT_RANGE = "\uff10-\uff19"
+
+
+def _char_set(first, last):
+    return frozenset(map(chr, range(ord(first), ord(last) + 1)))
+
+
+# CJK_CHARS: chỉ kanji; KANJI_CHARS: kanji + 々 ("1 ký tự kanji" cần ruby)
+CJK_CHARS = _char_set("\u4e00", "\u9fff")
+KANJI_CHARS = CJK_CHARS | {ITERATION_MARK}
+HIRAGANA_CHARS = _char_set("\u3040", "\u309f")
+KATAKANA_CHARS = _char_set("\u30a0", "\u30ff")
+KANA_CHARS = HIRAGANA_CHARS | KATAKANA_CHARS
+FULLWIDTH_DIGITS = _char_set("\uff10", "\uff19")
+
+KANJI_PATTERN = re.compile(f"[{KANJI_RANGE}]")
+KANJI_CHAR_PATTERN = re.compile(f"[{KANJI_RANGE}{ITERATION_MARK}]")
+JAPANESE_PATTERN = re.compile(f"[{HIRAGANA_RANGE}{KATAKANA_RANGE}{KANJI_RANGE}]")
+
+# Tách run: mỗi match là 1 đoạn kanji (group "kanji") hoặc 1 đoạn kana (group "kana")
+KANA_RUN_PATTERN = re.compile(f"[{HIRAGANA_RANGE}{KATAKANA_RANGE}]+")
+RUN_PATTERN = re.compile(
+    f"(?P<kanji>[{KANJI_RANGE}{ITERATION_MARK}]+)|(?P<kana>[{HIRAGANA_RANGE}{KATAKANA_RANGE}]+)"
+)
+
+
+def is_kanji(ch):
+    """1 ký tự kanji (kể cả 々)"""
+    return ch in KANJI_CHARS
+
+
+def is_kana(ch):
+    """1 ký tự hiragana/katakana (kể cả ー)"""
+    return ch in KANA_CHARS
+
+
+def contains_kanji(text):
+    """text có ít nhất 1 ký tự kanji (kể cả 々) - duyệt trong C, không gọi hàm theo từng ký tự"""
+    return not KANJI_CHARS.isdisjoint(text or "")
+
+
+def kana_runs(surface):
+    """Các đoạn kana liên tiếp: [(start_idx, kana_str), ...]"""
+    return [(m.start(), m.group()) for m in KANA_RUN_PATTERN.finditer(surface or "")]
+
+
+def iter_runs(surface):
+    """Duyệt (loại "kanji"/"kana", start, đoạn) theo thứ tự; ký tự khác bị bỏ qua"""
+    for m in RUN_PATTERN.finditer(surface or ""):
+        yield m.lastgroup, m.start(), m.group()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Định dạng dictionary đã compile (binary) để load bằng mmap trong vài mili-giây.
+
+Layout file (little-endian):
+  header        : magic, version, count, độ dài 3 blob, fingerprint file JSON nguồn
+  key_offsets   : (count + 1) x uint32
+  rt_offsets    : (count + 1) x uint32
+  map_offsets   : (count + 1) x uint32
+  key_blob      : các key UTF-8, sắp xếp theo byte (= thứ tự code point)
+  rt_blob       : reading UTF-8
+  map_blob      : map dạng JSON compact (rỗng nếu entry không có map)
+
+Tra cứu key = binary search trên bảng key đã sắp xếp, không cần parse JSON.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+
+MAGIC = b"RUBYDICT"
+FORMAT_VERSION = 1
+COMPILED_SUFFIX = ".rubydict"
+
+# magic, version, count, key_blob_len, rt_blob_len, map_blob_len, src_size, src_mtime_ns, src_sha256
+HEADER = struct.Struct("<8sIIIIIQq32s")
+
+
+def compiled_path_for(source_path):
+    """dict_struct.json -> dict_struct.rubydict"""
+    base, _ = os.path.splitext(source_path)
+    return base + COMPILED_SUFFIX
+
+
+def file_sha256(path):
+    """SHA-256 của file (đọc theo chunk)"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+def source_fingerprint(source_path):
+    """(size, mtime_ns, sha256) của file JSON nguồn"""
+    st = os.stat(source_path)
+    return st.st_size, st.st_mtime_ns, file_sha256(source_path)
+
+
+def fingerprint_hex(src_sha):
+    """Phiên bản dictionary (dùng cho cache): sha256 file nguồn + version format"""
+    return f"{src_sha.hex()}:{FORMAT_VERSION}"
+
+
+class SourceDictionary(dict):
+    """dict thường (vừa parse từ JSON) mang cùng fingerprint với file compiled tương ứng"""
+
+    def __init__(self, entries, fingerprint):
+        super().__init__(entries)
+        self.fingerprint = fingerprint
+
+
+def _u32_array(values):
+    arr = array("I", values)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _u32_view(mm, start, size):
+    view = memoryview(mm)[start:start + size]
+    if sys.byteorder == "little":
+        return view.cast("I")
+    arr = array("I", view.tobytes())
+    view.release()
+    arr.byteswap()
+    return arr
+
+
+def read_offset_tables(mm, start, count, tables, blob_len):
+    """
+    `tables` bảng offset (count + 1) x uint32 liền nhau từ `start`, theo sau là blob dài blob_len.
+    Kiểm tra độ dài file TRƯỚC khi cast (file cắt cụt giữa bảng offset -> cast lỗi TypeError);
+    trả None nếu độ dài không khớp, caller tự đóng mmap/file và báo ValueError.
+    """
+    table_size = (count + 1) * 4
+    if start + tables * table_size + blob_len != len(mm):
+        return None
+    return [_u32_view(mm, start + i * table_size, table_size) for i in range(tables)]
+
+
+def release_offset_tables(tables):
+    """Release các memoryview offset (bắt buộc trước khi đóng mmap)"""
+    for offs in tables:
+        if isinstance(offs, memoryview):
+            offs.release()
+
+
+def write_compiled_dictionary(entries, out_path, fingerprint):
+    """
+    Ghi dictionary đã chuẩn hóa ra file binary.
+    entries: dict {key: {"rt": str, "map": list | None}}
+    fingerprint: (size, mtime_ns, sha256) của file nguồn
+    Ghi ra file tạm rồi os.replace để không bao giờ để lại file hỏng.
+    """
+    encoded = sorted((k.encode("utf-8"), v) for k, v in entries.items())
+
+    key_offsets, rt_offsets, map_offsets = [0], [0], [0]
+    key_parts, rt_parts, map_parts = [], [], []
+    for kb, val in encoded:
+        rb = (val.get("rt") or "").encode("utf-8")
+        mp = val.get("map")
+        mb = json.dumps(mp, ensure_ascii=False, separators=(",", ":")).encode("utf-8") if mp else b""
+
+        key_parts.append(kb)
+        rt_parts.append(rb)
+        map_parts.append(mb)
+        key_offsets.append(key_offsets[-1] + len(kb))
+        rt_offsets.append(rt_offsets[-1] + len(rb))
+        map_offsets.append(map_offsets[-1] + len(mb))
+
+    src_size, src_mtime_ns, src_sha = fingerprint
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(encoded),
+        key_offsets[-1], rt_offsets[-1], map_offsets[-1],
+        src_size, src_mtime_ns, src_sha,
+    )
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(_u32_array(key_offsets))
+        f.write(_u32_array(rt_offsets))
+        f.write(_u32_array(map_offsets))
+        f.write(b"".join(key_parts))
+        f.write(b"".join(rt_parts))
+        f.write(b"".join(map_parts))
+    os.replace(tmp_path, out_path)
+
+
+def read_header(path):
+    """Đọc header; trả None nếu file không tồn tại / sai magic / khác version"""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(raw) != HEADER.size:
+        return None
+    fields = HEADER.unpack(raw)
+    if fields[0] != MAGIC or fields[1] != FORMAT_VERSION:
+        return None
+    return fields
+
+
+def is_compiled_fresh(compiled_path, source_path):
+    """
+    Kiểm tra file compiled còn khớp với file JSON nguồn không.
+    - size + mtime khớp -> dùng luôn (không cần hash)
+    - mtime đổi nhưng sha256 vẫn khớp -> vẫn dùng được
+    """
+    header = read_header(compiled_path)
+    if header is None:
+        return False
+    src_size, src_mtime_ns, src_sha = header[6], header[7], header[8]
+
+    st = os.stat(source_path)
+    if st.st_size != src_size:
+        return False
+    if st.st_mtime_ns == src_mtime_ns:
+        return True
+    if file_sha256(source_path) != src_sha:
+        return False
+    # nội dung không đổi (touch / checkout): ghi mtime mới vào header để lần sau khỏi hash lại
+    try:
+        with open(compiled_path, "r+b") as f:
+            f.write(HEADER.pack(*header[:7], st.st_mtime_ns, src_sha))
+    except OSError:
+        pass
+    return True
+
+
+class CompiledDictionary(Mapping):
+    """Dictionary read-only được memory-map từ file compiled: key -> {"rt", "map"}"""
+
+    def __init__(self, path):
+        header = read_header(path)
+        if header is None:
+            raise ValueError(f"File dictionary compiled không hợp lệ: {path}")
+        _, _, count, key_len, rt_len, map_len = header[:6]
+
+        self.path = path
+        self.fingerprint = fingerprint_hex(header[8])
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._count = count
+        self._cache = {}
+
+        tables = read_offset_tables(self._mm, HEADER.size, count, 3, key_len + rt_len + map_len)
+        if tables is None:
+            self._mm.close()
+            self._file.close()
+            raise ValueError(f"File dictionary compiled bị cắt cụt: {path}")
+        self._key_offs, self._rt_offs, self._map_offs = tables
+
+        self._key_base = HEADER.size + 3 * (count + 1) * 4
+        self._rt_base = self._key_base + key_len
+        self._map_base = self._rt_base + rt_len
+
+    def _key_bytes(self, idx):
+        offs = self._key_offs
+        return self._mm[self._key_base + offs[idx]:self._key_base + offs[idx + 1]]
+
+    def _index_of(self, key):
+        if not isinstance(key, str):
+            return -1
+        kb = key.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            cur = self._key_bytes(mid)
+            if cur < kb:
+                lo = mid + 1
+            elif cur > kb:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def _entry_at(self, idx):
+        rt_offs, map_offs = self._rt_offs, self._map_offs
+        rt = self._mm[self._rt_base + rt_offs[idx]:self._rt_base + rt_offs[idx + 1]].decode("utf-8")
+        mb = self._mm[self._map_base + map_offs[idx]:self._map_base + map_offs[idx + 1]]
+        return {"rt": rt, "map": json.loads(mb) if mb else None}
+
+    def __getitem__(self, key):
+        entry = self._cache.get(key)
+        if entry is not None:
+            return entry
+        idx = self._index_of(key)
+        if idx < 0:
+            raise KeyError(key)
+        entry = self._entry_at(idx)
+        self._cache[key] = entry
+        return entry
+
+    def __contains__(self, key):
+        return key in self._cache or self._index_of(key) >= 0
+
+    def __iter__(self):
+        for idx in range(self._count):
+            yield self._key_bytes(idx).decode("utf-8")
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        """Giải phóng mmap (các view offset phải release trước)"""
+        release_offset_tables((self._key_offs, self._rt_offs, self._map_offs))
+        self._mm.close()
+        self._file.close()
@@ -1,25 +1,22 @@
-import json
-import re
-from pathlib import Path
+import argparse
+import os
+
+from json.encoder import encode_basestring
+
+from char_classes import KANJI_CHARS, contains_kanji, is_kana, is_kanji, kana_runs  # is_kana/is_kanji: giữ API cũ
+from compiled_dict import file_sha256
+from furigana_align import EMPTY_TABLE, KanjiReadingTable, collect_kanji_readings, segment_entry
+from json_stream import ObjectWriter, iter_object_items
+from kanji_reading_index import KanjiReadingIndex, write_kanji_reading_index
+from process_pool import map_ordered
 
 # =========================
-# Regex
+# Mora (lớp kanji/kana: xem char_classes)
 # =========================
-KANJI_RE = re.compile(r'[\u4e00-\u9fff々]')
-KANA_RE  = re.compile(r'[\u3040-\u309f\u30a0-\u30ffー]')
-
 SMALL_KANA = set("ゃゅょぁぃぅぇぉゎャュョァィゥェォヮ")
 PROLONG = "ー"
 
 
-def is_kanji(ch: str) -> bool:
-    return bool(KANJI_RE.fullmatch(ch or ""))
-
-
-def is_kana(ch: str) -> bool:
-    return bool(KANA_RE.fullmatch(ch or ""))
-
-
 def split_to_moras(s: str):
     """Tách kana thành mora (đủ tốt để chia đều)."""
     moras = []
@@ -36,20 +33,7 @@ def split_to_moras(s: str):
 
 def extract_kana_runs(surface: str):
     """Lấy các đoạn kana liên tiếp trong surface: [(start_idx, kana_str), ...]"""
-    runs = []
-    i = 0
-    n = len(surface)
-    while i < n:
-        ch = surface[i]
-        if is_kana(ch) and not is_kanji(ch):
-            j = i + 1
-            while j < n and is_kana(surface[j]) and not is_kanji(surface[j]):
-                j += 1
-            runs.append((i, surface[i:j]))
-            i = j
-        else:
-            i += 1
-    return runs
+    return kana_runs(surface)
 
 
 def find_best_anchor(kana_run: str, reading: str, rp: int):
@@ -80,7 +64,8 @@ def find_best_anchor(kana_run: str, reading: str, rp: int):
 
 def infer_segments(surface: str, reading: str):
     """
-    Suy luận segments dựa trên kana anchor trong surface.
+    Suy luận segments dựa trên kana anchor trong surface
+    (heuristic cũ, chỉ còn dùng cho entry quá lớn với furigana_align).
     - Không fallback ngay khi 1 kana-run không match -> skip kana-run đó.
     - segments tạo theo "vùng" để tránh duplicate rt cho nhiều kanji-run.
     Return:
@@ -110,7 +95,7 @@ def infer_segments(surface: str, reading: str):
         if s_from >= s_to or r_from > r_to:
             return
         region = surface[s_from:s_to]
-        if any(is_kanji(ch) for ch in region):
+        if contains_kanji(region):
             segments.append((s_from, s_to, reading[r_from:r_to]))
 
     for (si, sub, r0, r1) in anchors:
@@ -121,7 +106,7 @@ def infer_segments(surface: str, reading: str):
     add_region(prev_s, len(surface), prev_r, len(reading))
 
     # Nếu không tạo được segment nào nhưng surface có kanji -> fallback 1 segment
-    if not segments and any(is_kanji(ch) for ch in surface):
+    if not segments and contains_kanji(surface):
         segments = [(0, len(surface), reading)]
         skipped_any = True
 
@@ -145,7 +130,7 @@ def segments_to_map(surface: str, segments, full_reading: str):
             continue
         rt = str(rt)
 
-        kanjis = [(i, surface[i]) for i in range(s0, s1) if is_kanji(surface[i])]
+        kanjis = [(i, surface[i]) for i in range(s0, s1) if surface[i] in KANJI_CHARS]
         if not kanjis:
             continue
 
@@ -211,37 +196,199 @@ def segments_to_map(surface: str, segments, full_reading: str):
     return dedup, uncertain
 
 
-def convert(in_path: str, out_path: str):
-    src = json.loads(Path(in_path).read_text(encoding="utf-8"))
-    dst = {}
+# =========================
+# Convert (streaming + process pool)
+# =========================
+CHUNK_ENTRIES = 2000  # số entry mỗi lần gửi cho worker
 
-    total = 0
-    kept = 0
+# bảng reading từng kanji dùng khi align (process hiện tại / worker)
+_reading_table = EMPTY_TABLE
 
-    for surface, reading in src.items():
-        total += 1
-        if not isinstance(surface, str) or not isinstance(reading, str) or not reading:
-            continue
-        if not any(is_kanji(ch) for ch in surface):
-            continue
 
+def convert_entry(surface, reading, table=None):
+    """
+    1 cặp surface -> reading thành entry dict_struct (None nếu bỏ qua).
+    Align bằng furigana_align với bảng reading kanji `table` (mặc định: bảng của convert hiện tại);
+    entry quá lớn cho DP thì dùng heuristic anchor cũ (infer_segments + segments_to_map).
+    """
+    if not isinstance(surface, str) or not isinstance(reading, str) or not reading:
+        return None
+    if not contains_kanji(surface):
+        return None
+
+    result = segment_entry(surface, reading, _reading_table if table is None else table)
+    if result is None:
         segments, skipped_any = infer_segments(surface, reading)
         mapping, uncertain_map = segments_to_map(surface, segments, reading)
+        uncertain = skipped_any or uncertain_map
+    else:
+        segments, mapping, uncertain = result
 
-        dst[surface] = {
-            "rt": reading,
-            "map": mapping,
-            "segments": [{"s": [s0, s1], "rt": rt} for (s0, s1, rt) in segments],
-            "uncertain": bool(skipped_any or uncertain_map),
-        }
-        kept += 1
-
-    Path(out_path).write_text(
-        json.dumps(dst, ensure_ascii=False, indent=2),
-        encoding="utf-8"
+    return {
+        "rt": reading,
+        "map": mapping,
+        "segments": [{"s": [s0, s1], "rt": rt} for (s0, s1, rt) in segments],
+        "uncertain": bool(uncertain),
+    }
+
+
+def render_entry(surface, entry):
+    """
+    Render 1 entry dict_struct ở cấp 1 của object, giống hệt json_stream.render_item
+    (= json.dumps(..., ensure_ascii=False, indent=2)) nhưng ghép chuỗi trực tiếp theo schema
+    cố định -> không qua encoder indent viết bằng Python (phần chậm nhất khi ghi dict lớn).
+    """
+    q = encode_basestring
+    if entry["map"]:
+        map_json = "[\n" + ",\n".join(
+            f'      {{\n        "i": {m["i"]},\n        "ch": {q(m["ch"])},\n        "rt": {q(m["rt"])}\n      }}'
+            for m in entry["map"]
+        ) + "\n    ]"
+    else:
+        map_json = "[]"
+    if entry["segments"]:
+        seg_json = "[\n" + ",\n".join(
+            f'      {{\n        "s": [\n          {seg["s"][0]},\n          {seg["s"][1]}\n        ],\n'
+            f'        "rt": {q(seg["rt"])}\n      }}'
+            for seg in entry["segments"]
+        ) + "\n    ]"
+    else:
+        seg_json = "[]"
+    return (
+        f'  {q(surface)}: {{\n    "rt": {q(entry["rt"])},\n    "map": {map_json},\n'
+        f'    "segments": {seg_json},\n    "uncertain": {"true" if entry["uncertain"] else "false"}\n  }}'
     )
-    print(f"Converted: {kept}/{total} entries -> {out_path}")
+
+
+def _convert_chunk(items):
+    """Worker: [(surface, reading)] -> (các entry giữ lại đã render sẵn thành JSON, số entry uncertain)"""
+    rendered = []
+    uncertain = 0
+    for surface, reading in items:
+        entry = convert_entry(surface, reading)
+        if entry is not None:
+            rendered.append(render_entry(surface, entry))
+            uncertain += entry["uncertain"]
+    return rendered, uncertain
+
+
+def _collect_chunk(items):
+    """Worker: đếm reading từng kanji của chunk theo bảng hiện tại (vòng 1: bảng rỗng)"""
+    return collect_kanji_readings(items, _reading_table)
+
+
+def _init_convert_worker(table):
+    global _reading_table
+    _reading_table = table
+
+
+def _iter_chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _map_ordered(func, chunks, workers, table=EMPTY_TABLE):
+    """
+    func(chunk) trên worker pool, trả kết quả theo đúng thứ tự chunk; giới hạn số chunk đang chờ.
+    `table` là bảng reading kanji của worker (fork kế thừa, spawn nhận qua initializer).
+    """
+    global _reading_table
+    _reading_table = table
+    try:
+        yield from map_ordered(func, chunks, workers, _init_convert_worker, (table,))
+    finally:
+        _reading_table = EMPTY_TABLE
+
+
+def _iter_source_items(in_path):
+    with open(in_path, "r", encoding="utf-8") as src:
+        yield from iter_object_items(src)
+
+
+def build_reading_table(in_path: str, workers: int = 1, chunk_entries: int = CHUNK_ENTRIES, seed=None):
+    """
+    Dựng KanjiReadingTable từ chính dictionary nguồn (xem furigana_align.collect_kanji_readings):
+    2 lượt đọc streaming, lượt 1 với bảng `seed` (mặc định rỗng), lượt 2 với bảng của lượt 1.
+    Kết quả = seed + số đếm của lượt 2.
+    """
+    table = seed if seed is not None else EMPTY_TABLE
+    for _ in range(2):
+        counts = KanjiReadingTable()
+        if seed is not None:
+            counts.update(seed.counts)
+        chunks = _iter_chunks(_iter_source_items(in_path), chunk_entries)
+        for chunk_counts in _map_ordered(_collect_chunk, chunks, workers, table):
+            counts.update(chunk_counts)
+        table = counts
+    return table
+
+
+def convert(in_path: str, out_path: str, workers: int = 1, chunk_entries: int = CHUNK_ENTRIES, table=None):
+    """
+    Đọc dictionary nguồn {surface: reading} từng entry (json_stream), xử lý theo chunk trên
+    `workers` process và ghi dần ra out_path -> RAM không phụ thuộc kích thước dictionary.
+    Output giống hệt json.dumps(dst, ensure_ascii=False, indent=2), đúng thứ tự entry nguồn.
+    table: KanjiReadingTable dùng khi align (mặc định: build_reading_table từ chính input).
+    """
+    if table is None:
+        table = build_reading_table(in_path, workers, chunk_entries)
+        print(f"Kanji reading table: {len(table)} kanji")
+
+    total = 0
+    uncertain = 0
+    kept = 0
+    tmp_path = out_path + ".tmp"
+
+    with open(in_path, "r", encoding="utf-8") as src, open(tmp_path, "w", encoding="utf-8") as dst:
+        def counted_items():
+            nonlocal total
+            for item in iter_object_items(src):
+                total += 1
+                yield item
+
+        writer = ObjectWriter(dst)
+        chunks = _iter_chunks(counted_items(), chunk_entries)
+        for rendered, chunk_uncertain in _map_ordered(_convert_chunk, chunks, workers, table):
+            for item in rendered:
+                writer.write_rendered(item)
+            kept += len(rendered)
+            uncertain += chunk_uncertain
+        writer.close()
+    os.replace(tmp_path, out_path)
+
+    print(f"Converted: {kept}/{total} entries ({uncertain} uncertain) -> {out_path}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chuyển dictionary {surface: reading} sang dict_struct (rt + map)")
+    parser.add_argument("input", nargs="?", default="dictionary 20250816 2301.json", help="Dictionary nguồn")
+    parser.add_argument("output", nargs="?", default="dict_struct.json", help="File dict_struct đầu ra")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Số process xử lý song song (1 = tuần tự)")
+    parser.add_argument("--kanji-index", default=None,
+                        help="File .kanjiidx: có sẵn thì dùng làm bảng reading kanji, chưa có thì dựng từ input rồi lưu")
+    return parser.parse_args(argv)
+
+
+def load_or_build_kanji_index(index_path, in_path, workers=1):
+    """Bảng reading kanji từ file index (kanji_reading_index.py); chưa có file -> dựng từ input và ghi ra"""
+    if os.path.exists(index_path):
+        table = KanjiReadingIndex(index_path)
+        print(f"Kanji reading index: {len(table)} kanji <- {index_path}")
+        return table
+    table = build_reading_table(in_path, workers)
+    write_kanji_reading_index(table, index_path, file_sha256(in_path))
+    print(f"Kanji reading index: {len(table)} kanji -> {index_path}")
+    return table
 
 
 if __name__ == "__main__":
-    convert("dictionary 20250816 2301.json", "dict_struct.json")
+    args = parse_args()
+    table = load_or_build_kanji_index(args.kanji_index, args.input, args.workers) if args.kanji_index else None
+    convert(args.input, args.output, workers=args.workers, table=table)
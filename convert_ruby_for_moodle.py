@@ -4,117 +4,170 @@
 import re
 import os
 
+RUBY_PATTERN = re.compile(r'<ruby>([^<]*)<rt>([^<]*)</rt></ruby>')
+# <text> gồm 1 hay nhiều đoạn CDATA (chỉ cách nhau bởi khoảng trắng) -> gộp thành 1 đoạn
+TEXT_CDATA_PATTERN = re.compile(r'<text>(?:\s*<!\[CDATA\[(.*?)\]\]>\s*)+</text>', re.DOTALL)
+CDATA_PATTERN = re.compile(r'<!\[CDATA\[(.*?)\]\]>', re.DOTALL)
+
+# Loại segment khi tách XML:
+# TEXT/RUBY ghi ra mọi format; MERGED chỉ ghi khi format gộp CDATA;
+# RAW_TEXT/RAW_RUBY chỉ ghi khi format giữ nguyên CDATA (phần bị bỏ khi gộp)
+TEXT, RUBY, MERGED, RAW_TEXT, RAW_RUBY = range(5)
+
+# =========================================
+# Renderers: (kanji, hiragana) -> chuỗi thay cho <ruby>
+# =========================================
+def ruby_to_parentheses(kanji, hiragana):
+    return f"{kanji}({hiragana})"
+
+def ruby_to_brackets(kanji, hiragana):
+    return f"{kanji}[{hiragana}]"
+
+def ruby_to_span(kanji, hiragana):
+    return f'<span style="border-top: 1px solid #666; font-size: 0.8em; position: relative;" title="{hiragana}">{kanji}</span>'
+
+def ruby_to_plain(kanji, hiragana):
+    """Bỏ ruby, giữ kanji (như create_clean_copies.create_version_without_ruby)"""
+    return kanji
+
+# tên -> (renderer, có gộp CDATA trong <text> hay không)
+RENDERERS = {
+    "parentheses": (ruby_to_parentheses, True),
+    "brackets": (ruby_to_brackets, True),
+    "span": (ruby_to_span, True),
+    "plain": (ruby_to_plain, False),
+}
+
+def register_renderer(name, render, merge_cdata=True):
+    """Thêm format mới: render(kanji, hiragana) -> str"""
+    RENDERERS[name] = (render, merge_cdata)
+
+# =========================================
+# Tách XML thành segment (1 lần cho mọi format)
+# =========================================
+def _ruby_segments(text, text_kind=TEXT, ruby_kind=RUBY):
+    pos = 0
+    for match in RUBY_PATTERN.finditer(text):
+        if match.start() > pos:
+            yield (text_kind, text[pos:match.start()], None)
+        yield (ruby_kind, match.group(1), match.group(2))
+        pos = match.end()
+    if pos < len(text):
+        yield (text_kind, text[pos:], None)
+
+def _text_block_segments(block):
+    """
+    <text> khớp TEXT_CDATA_PATTERN. Khi gộp: <text><![CDATA[nội dung các CDATA nối lại]]></text>;
+    khi không gộp: giữ nguyên cả phần khoảng trắng/thẻ giữa các đoạn CDATA.
+    """
+    pos = 0
+    for piece in CDATA_PATTERN.finditer(block):
+        if pos == 0:
+            yield (MERGED, '<text><![CDATA[', None)
+        yield from _ruby_segments(block[pos:piece.start(1)], RAW_TEXT, RAW_RUBY)
+        yield from _ruby_segments(piece.group(1))
+        pos = piece.end(1)
+    yield (MERGED, ']]></text>', None)
+    yield from _ruby_segments(block[pos:], RAW_TEXT, RAW_RUBY)
+
+def tokenize_ruby_xml(content):
+    """Tách nội dung XML thành các segment (loại, a, b): chữ thường (a) hoặc ruby (a=kanji, b=hiragana)"""
+    pos = 0
+    for block in TEXT_CDATA_PATTERN.finditer(content):
+        yield from _ruby_segments(content[pos:block.start()])
+        yield from _text_block_segments(block.group(0))
+        pos = block.end()
+    yield from _ruby_segments(content[pos:])
+
+def emit_ruby_formats(segments, writers):
+    """
+    Ghi các segment ra nhiều đích trong 1 lượt.
+    writers: [(write, tên renderer)] với write(str) (file.write, list.append, ...).
+    Trả số ruby đã chuyển.
+    """
+    # loại segment -> các đích nhận segment đó
+    text_writers = {TEXT: [], MERGED: [], RAW_TEXT: []}
+    ruby_writers = {RUBY: [], RAW_RUBY: []}
+    for write, name in writers:
+        render, merge_cdata = RENDERERS[name]
+        text_writers[TEXT].append(write)
+        text_writers[MERGED if merge_cdata else RAW_TEXT].append(write)
+        ruby_writers[RUBY].append((write, render))
+        if not merge_cdata:
+            ruby_writers[RAW_RUBY].append((write, render))
+
+    ruby_count = 0
+    for kind, a, b in segments:
+        if kind in ruby_writers:
+            ruby_count += 1
+            for write, render in ruby_writers[kind]:
+                write(render(a, b))
+        else:
+            for write in text_writers[kind]:
+                write(a)
+    return ruby_count
+
+def render_ruby_text(text, name="parentheses"):
+    """Chuyển ruby trong 1 chuỗi XML sang format `name`"""
+    parts = []
+    emit_ruby_formats(tokenize_ruby_xml(text), [(parts.append, name)])
+    return ''.join(parts)
+
+def write_ruby_formats(input_file, outputs):
+    """
+    Đọc input 1 lần, ghi đồng thời nhiều format.
+    outputs: {file output: tên renderer trong RENDERERS}. Trả số ruby đã chuyển.
+    """
+    with open(input_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    files = [open(output_file, 'w', encoding='utf-8') for output_file in outputs]
+    try:
+        writers = [(f.write, name) for f, name in zip(files, outputs.values())]
+        return emit_ruby_formats(tokenize_ruby_xml(content), writers)
+    finally:
+        for f in files:
+            f.close()
+
 def convert_ruby_for_moodle(text):
     """Convert ruby tags to Moodle-friendly format"""
-    
-    # Chuyển <ruby>kanji<rt>hiragana</rt></ruby> thành kanji(hiragana)
-    def ruby_to_parentheses(match):
-        kanji = match.group(1)
-        hiragana = match.group(2)
-        return f"{kanji}({hiragana})"
-
-    ruby_pattern = r'<ruby>([^<]*)<rt>([^<]*)</rt></ruby>'
-    converted = re.sub(ruby_pattern, ruby_to_parentheses, text)
-
-    # Đảm bảo các trường <text> chỉ chứa chuỗi, không bị tách thành mảng
-    # Gộp các đoạn CDATA lại thành một đoạn duy nhất nếu cần
-    # Xử lý: Nếu có nhiều <![CDATA[...]]> trong một <text>, hãy nối lại thành một chuỗi
-    def merge_cdata(text):
-        # Tìm tất cả CDATA sections trong <text>
-        cdata_pattern = r'<text>(?:\s*<!\[CDATA\[(.*?)\]\]>\s*)+</text>'
-        def cdata_replacer(match):
-            all_cdata = re.findall(r'<!\[CDATA\[(.*?)\]\]>', match.group(0), re.DOTALL)
-            merged = ''.join(all_cdata)
-            return f'<text><![CDATA[{merged}]]></text>'
-        return re.sub(cdata_pattern, cdata_replacer, text, flags=re.DOTALL)
-
-    converted = merge_cdata(converted)
-    return converted
+    # <ruby>kanji<rt>hiragana</rt></ruby> -> kanji(hiragana),
+    # các đoạn CDATA trong cùng 1 <text> được gộp thành 1 chuỗi duy nhất
+    return render_ruby_text(text, "parentheses")
 
 def create_moodle_compatible_file(input_file, output_file):
     """Create a Moodle-compatible version of the XML file"""
-    
+
     print(f"Converting {input_file} to Moodle-compatible format...")
-    
+
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
         # Convert ruby tags
-        converted_content = convert_ruby_for_moodle(content)
-        
-        # Count conversions
-        ruby_count = len(re.findall(r'<ruby>[^<]*<rt>[^<]*</rt></ruby>', content))
-        
-        # Write converted content
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(converted_content)
-        
+        ruby_count = write_ruby_formats(input_file, {output_file: "parentheses"})
+
         print(f"✓ Converted {ruby_count} ruby tags")
         print(f"✓ Created Moodle-compatible file: {output_file}")
-        
+
         return True
-        
+
     except Exception as e:
         print(f"✗ Error: {e}")
         return False
 
-def create_multiple_formats():
-    """Create multiple format versions for testing"""
-    
-    input_file = "平成 25 年前期 - ĐỀ NĂM 25 KÌ TRƯỚC_ruby_fixed.xml"
-
-    # Format 1: Parentheses format, đảm bảo <text> là chuỗi duy nhất
-    print("Creating Format 1: Parentheses format kanji(hiragana)")
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    def ruby_to_parentheses(match):
-        kanji = match.group(1)
-        hiragana = match.group(2)
-        return f"{kanji}({hiragana})"
-
-    content1 = re.sub(r'<ruby>([^<]*)<rt>([^<]*)</rt></ruby>', ruby_to_parentheses, content)
-    # Gộp các đoạn CDATA lại thành một đoạn duy nhất nếu cần
-    def merge_cdata(text):
-        cdata_pattern = r'<text>(?:\s*<!\[CDATA\[(.*?)\]\]>\s*)+</text>'
-        def cdata_replacer(match):
-            all_cdata = re.findall(r'<!\[CDATA\[(.*?)\]\]>', match.group(0), re.DOTALL)
-            merged = ''.join(all_cdata)
-            return f'<text><![CDATA[{merged}]]></text>'
-        return re.sub(cdata_pattern, cdata_replacer, text, flags=re.DOTALL)
-    content1 = merge_cdata(content1)
-    with open("quiz_ruby_parentheses.xml", 'w', encoding='utf-8') as f:
-        f.write(content1)
-
-    # Format 2: HTML spans with styling
-    print("Creating Format 2: HTML spans with styling")
-    def ruby_to_html(match):
-        kanji = match.group(1)
-        hiragana = match.group(2)
-        return f'<span style="border-top: 1px solid #666; font-size: 0.8em; position: relative;" title="{hiragana}">{kanji}</span>'
-
-    content2 = re.sub(r'<ruby>([^<]*)<rt>([^<]*)</rt></ruby>', ruby_to_html, content)
-    content2 = merge_cdata(content2)
-    with open("quiz_ruby_html.xml", 'w', encoding='utf-8') as f:
-        f.write(content2)
-
-    # Format 3: Square brackets
-    print("Creating Format 3: Square brackets kanji[hiragana]")
-    def ruby_to_brackets(match):
-        kanji = match.group(1)
-        hiragana = match.group(2)
-        return f"{kanji}[{hiragana}]"
-
-    content3 = re.sub(r'<ruby>([^<]*)<rt>([^<]*)</rt></ruby>', ruby_to_brackets, content)
-    content3 = merge_cdata(content3)
-    with open("quiz_ruby_brackets.xml", 'w', encoding='utf-8') as f:
-        f.write(content3)
-
-    print("\nCreated 3 formats for testing:")
-    print("1. quiz_ruby_parentheses.xml - 問題(もんだい)")
-    print("2. quiz_ruby_html.xml - With HTML styling")
-    print("3. quiz_ruby_brackets.xml - 問題[もんだい]")
+def create_multiple_formats(input_file="平成 25 年前期 - ĐỀ NĂM 25 KÌ TRƯỚC_ruby_fixed.xml", outputs=None):
+    """Create multiple format versions for testing (đọc input 1 lần, ghi mọi format cùng lúc)"""
+    if outputs is None:
+        outputs = {
+            "quiz_ruby_parentheses.xml": "parentheses",
+            "quiz_ruby_html.xml": "span",
+            "quiz_ruby_brackets.xml": "brackets",
+        }
+
+    print(f"Creating {len(outputs)} formats: {', '.join(outputs.values())}")
+    ruby_count = write_ruby_formats(input_file, outputs)
+
+    print(f"\nConverted {ruby_count} ruby tags. Created {len(outputs)} formats for testing:")
+    for output_file, name in outputs.items():
+        print(f"- {output_file} - {name}: {RENDERERS[name][0]('問題', 'もんだい')}")
 
 def main():
     create_multiple_formats()
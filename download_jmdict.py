@@ -1,109 +1,320 @@
 import requests
 import gzip
+import hashlib
+import io
 import xml.etree.ElementTree as ET
+from lxml import etree
 import json
 import os
-from typing import Dict, Set
+from email.utils import formatdate
+from typing import Dict, List, Set, Tuple
+from urllib.parse import unquote, urlparse
 import re
 import time
 
-def download_jmdict():
-    """Tải JMdict từ server chính thức"""
+from reading_index import Reading, write_reading_index
+from compiled_dict import file_sha256
+from process_pool import map_ordered
+
+JMDICT_URL = "http://ftp.edrdg.org/pub/Nihongo/JMdict_e.gz"
+JMDICT_FILE = "JMdict_e.gz"
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+PROGRESS_STEP = 5 * 1024 * 1024  # in tiến độ mỗi 5MB
+
+# =========================================
+# Download: GET có điều kiện, resume bằng Range, kiểm tra SHA-256
+# =========================================
+def download_meta_path(dest: str) -> str:
+    """JMdict_e.gz -> JMdict_e.gz.meta.json (ETag, Last-Modified, sha256 của lần tải trước)"""
+    return dest + ".meta.json"
+
+def _load_download_meta(dest: str) -> dict:
+    try:
+        with open(download_meta_path(dest), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_download_meta(dest: str, meta: dict):
+    with open(download_meta_path(dest), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+class _FileResponse:
+    """
+    Response giả lập cho file local (file:// hoặc đường dẫn) để tải/test offline:
+    có ETag/Last-Modified, trả 304 theo If-None-Match/If-Modified-Since, 206 theo Range/If-Range.
+    """
+
+    def __init__(self, path, headers):
+        st = os.stat(path)
+        etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        last_modified = formatdate(st.st_mtime, usegmt=True)
+        self.headers = {"ETag": etag, "Last-Modified": last_modified}
+        self._file = None
+
+        if "If-None-Match" in headers:
+            not_modified = headers["If-None-Match"] == etag
+        else:
+            not_modified = headers.get("If-Modified-Since") == last_modified
+        if not_modified:
+            self.status_code = 304
+            return
+
+        offset = 0
+        if "Range" in headers and headers.get("If-Range", etag) in (etag, last_modified):
+            offset = int(headers["Range"][len("bytes="):].rstrip("-"))
+        if offset > st.st_size:
+            self.status_code = 416
+            return
+        self.status_code = 206 if offset else 200
+        self.headers["Content-Length"] = str(st.st_size - offset)
+        self._file = open(path, "rb")
+        self._file.seek(offset)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise OSError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        return iter(lambda: self._file.read(chunk_size), b"")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+def _open_download(url: str, headers: dict, timeout: float):
+    if url.startswith(("http://", "https://")):
+        return requests.get(url, headers=headers, stream=True, timeout=timeout)
+    path = unquote(urlparse(url).path) if url.startswith("file://") else url
+    return _FileResponse(path, headers)
+
+def download_jmdict(url: str = JMDICT_URL, dest: str = JMDICT_FILE,
+                    expected_sha256: str = None, timeout: float = 60) -> bool:
+    """
+    Tải JMdict từ server chính thức (hoặc file:// / đường dẫn local khi test offline).
+    - đã có bản tải trước (dest + .meta.json): GET có điều kiện (If-None-Match / If-Modified-Since),
+      server trả 304 -> kiểm tra sha256 file local rồi bỏ qua
+    - còn file tải dở (dest + .part): tải tiếp bằng Range (+ If-Range để không ghép 2 phiên bản khác nhau)
+    - SHA-256 tính trong lúc tải; expected_sha256 (nếu có) phải khớp thì mới thay file dest
+    Trả True nếu dest là bản mới nhất và hợp lệ.
+    """
     print("=== Bắt đầu download JMdict ===")
-    url = "http://ftp.edrdg.org/pub/Nihongo/JMdict_e.gz"
     print(f"URL: {url}")
-    
+    part_path = dest + ".part"
+    meta = _load_download_meta(dest)
+    headers = {}
+
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    partial = meta.get("partial") or {}
+    validator = partial.get("etag") or partial.get("last_modified")
+    if offset and partial.get("url") == url and validator:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+    else:
+        offset = 0
+        if os.path.exists(dest) and meta.get("url") == url and meta.get("sha256"):
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
     try:
         print("Bắt đầu request...")
-        response = requests.get(url, stream=True)
-        print(f"Response status: {response.status_code}")
-        response.raise_for_status()
-        
-        print("Bắt đầu ghi file...")
-        total_size = 0
-        with open("JMdict_e.gz", "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-                total_size += len(chunk)
-                if total_size % (5*1024*1024) == 0:  # Mỗi 5MB
-                    print(f"Đã tải {total_size // (1024*1024)} MB")
-        
-        print(f"Tổng kích thước file: {total_size // (1024*1024)} MB")
-        print("Đã tải xong JMdict_e.gz")
+        response = _open_download(url, headers, timeout)
+        try:
+            print(f"Response status: {response.status_code}")
+            if response.status_code == 304:
+                if file_sha256(dest).hex() == meta["sha256"]:
+                    print(f"{dest} không thay đổi trên server, bỏ qua tải lại")
+                    return True
+                print(f"{dest} bị hỏng (sha256 không khớp), tải lại toàn bộ")
+                os.remove(download_meta_path(dest))
+                return download_jmdict(url, dest, expected_sha256, timeout)
+            if response.status_code == 416 and offset:
+                # phần tải dở không còn hợp lệ với file trên server -> tải lại từ đầu
+                os.remove(part_path)
+                return download_jmdict(url, dest, expected_sha256, timeout)
+            response.raise_for_status()
+
+            hasher = hashlib.sha256()
+            if response.status_code == 206:
+                print(f"Tải tiếp từ byte {offset:,}")
+                with open(part_path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        hasher.update(chunk)
+                mode = "ab"
+            else:
+                offset = 0
+                mode = "wb"
+
+            length = response.headers.get("Content-Length")
+            total_size = offset + int(length) if length else None
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            # ghi lại validator trước khi tải để lần sau resume được nếu bị ngắt
+            meta["partial"] = {"url": url, "etag": etag, "last_modified": last_modified}
+            _save_download_meta(dest, meta)
+
+            print("Bắt đầu ghi file...")
+            downloaded = offset
+            reported = downloaded // PROGRESS_STEP
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    downloaded += len(chunk)
+                    if downloaded // PROGRESS_STEP > reported:
+                        reported = downloaded // PROGRESS_STEP
+                        total_text = f" / {total_size // (1024*1024)} MB" if total_size else ""
+                        print(f"Đã tải {downloaded // (1024*1024)} MB{total_text}")
+        finally:
+            response.close()
+
+        if total_size is not None and downloaded != total_size:
+            print(f"Tải chưa đủ ({downloaded:,}/{total_size:,} bytes), chạy lại để tải tiếp")
+            return False
+
+        digest = hasher.hexdigest()
+        if expected_sha256 and digest != expected_sha256.lower():
+            print(f"SHA-256 không khớp: {digest} != {expected_sha256}")
+            os.remove(part_path)
+            meta.pop("partial", None)
+            _save_download_meta(dest, meta)
+            return False
+
+        os.replace(part_path, dest)
+        _save_download_meta(dest, {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha256": digest,
+            "size": downloaded,
+        })
+        print(f"Tổng kích thước file: {downloaded // (1024*1024)} MB")
+        print(f"SHA-256: {digest}")
+        print(f"Đã tải xong {dest}")
         return True
     except Exception as e:
-        print(f"Lỗi khi tải JMdict: {e}")
+        print(f"Lỗi khi tải JMdict (phần đã tải được giữ lại để tải tiếp): {e}")
         return False
 
-def parse_jmdict_to_dict_full():
-    """Parse toàn bộ JMdict XML và tạo dictionary kanji-hiragana"""
+
+SHARD_SIZE = 4 * 1024 * 1024  # byte XML (đã giải nén) mỗi shard
+
+def iter_jmdict_shards(jmdict_path: str = JMDICT_FILE, shard_size: int = SHARD_SIZE):
+    """
+    Cắt luồng JMdict đã giải nén thành các shard XML hoàn chỉnh, cắt đúng ranh giới </entry>:
+    mỗi shard = phần đầu file (DTD khai báo entity + <JMdict>) + một nhóm entry nguyên vẹn + </JMdict>.
+    Shard được sinh theo đúng thứ tự entry trong file.
+    """
+    with gzip.open(jmdict_path, "rb") as f:
+        header = None
+        buffer = b""
+        while True:
+            chunk = f.read(shard_size)
+            buffer += chunk
+            if header is None:
+                root = buffer.find(b"<JMdict>")
+                start = buffer.find(b"<entry>", root) if root >= 0 else -1
+                if start < 0:
+                    if not chunk:
+                        return
+                    continue
+                header = buffer[:start]
+                buffer = buffer[start:]
+            cut = buffer.rfind(b"</entry>")
+            if cut >= 0:
+                cut += len(b"</entry>")
+                yield header + buffer[:cut] + b"\n</JMdict>\n"
+                buffer = buffer[cut:]
+            if not chunk:
+                return
+
+def iter_shard_entries(shard: bytes):
+    """
+    Duyệt các <entry> của 1 shard bằng lxml iterparse: entity trong DTD (&n; &v5k; ...) được lxml resolve;
+    entry được xóa khỏi cây sau khi caller xử lý xong nên bộ nhớ không tăng theo shard.
+    """
+    context = etree.iterparse(io.BytesIO(shard), events=("end",), tag="entry",
+                              load_dtd=True, resolve_entities=True, huge_tree=True)
+    for _, entry in context:
+        yield entry
+        # Giải phóng entry đã xử lý (và các entry trước còn treo trên root)
+        entry.clear()
+        while entry.getprevious() is not None:
+            del entry.getparent()[0]
+    del context
+
+def map_jmdict_shards(jmdict_path: str, func, workers: int = 1, shard_size: int = SHARD_SIZE):
+    """
+    Gọi func(shard) cho từng shard trên worker pool, trả kết quả theo đúng thứ tự shard
+    (nên gộp kết quả theo thứ tự này sẽ giống hệt xử lý tuần tự). workers=1: chạy tại chỗ.
+    Số shard đang chờ được giới hạn để không giữ cả file đã giải nén trong RAM.
+    """
+    yield from map_ordered(func, iter_jmdict_shards(jmdict_path, shard_size), workers)
+
+def _parse_shard_dict(shard: bytes):
+    """Worker: (số entry, số entry có cặp kanji-hiragana, dict của shard theo thứ tự update)"""
+    kanji_dict = {}
+    entry_count = 0
+    successful_entries = 0
+    for entry in iter_shard_entries(shard):
+        entry_count += 1
+        entry_dict = extract_entry_readings(
+            [keb.text for keb in entry.iter("keb")],
+            [reb.text for reb in entry.iter("reb")],
+        )
+        if entry_dict:
+            kanji_dict.update(entry_dict)
+            successful_entries += 1
+    return entry_count, successful_entries, kanji_dict
+
+def _parse_shard_readings(shard: bytes):
+    """Worker: (số entry, [(surface, Reading)] theo thứ tự entry)"""
+    entry_count = 0
+    records = []
+    for entry in iter_shard_entries(shard):
+        entry_count += 1
+        records.extend(extract_entry_reading_records(entry))
+    return entry_count, records
+
+def parse_jmdict_to_dict_full(jmdict_path: str = JMDICT_FILE, workers: int = 1,
+                              shard_size: int = SHARD_SIZE) -> Dict[str, str]:
+    """
+    Parse toàn bộ JMdict XML và tạo dictionary kanji-hiragana (1 reading / từ).
+    File được cắt thành shard theo ranh giới entry, parse song song trên `workers` process,
+    kết quả gộp theo thứ tự shard (entry sau ghi đè entry trước như khi chạy tuần tự).
+    """
     print("=== Bắt đầu parse toàn bộ JMdict ===")
     
     # Kiểm tra file tồn tại
-    if not os.path.exists("JMdict_e.gz"):
-        print("File JMdict_e.gz không tồn tại!")
+    if not os.path.exists(jmdict_path):
+        print(f"File {jmdict_path} không tồn tại!")
         return {}
     
-    file_size = os.path.getsize("JMdict_e.gz")
-    print(f"Kích thước file JMdict_e.gz: {file_size // (1024*1024)} MB")
+    file_size = os.path.getsize(jmdict_path)
+    print(f"Kích thước file {jmdict_path}: {file_size // (1024*1024)} MB")
     
     kanji_dict = {}
     entry_count = 0
-    line_count = 0
-    error_count = 0
     successful_entries = 0
     start_time = time.time()
     
     try:
-        print("Mở file gzip...")
-        with gzip.open("JMdict_e.gz", "rt", encoding="utf-8") as f:
-            print("File đã mở thành công")
+        print(f"Bắt đầu đọc và parse toàn bộ file (iterparse, {workers} process)...")
+        reported = 0
+        for shard_entries, shard_successful, shard_dict in map_jmdict_shards(
+                jmdict_path, _parse_shard_dict, workers, shard_size):
+            kanji_dict.update(shard_dict)
+            entry_count += shard_entries
+            successful_entries += shard_successful
             
-            # Đọc từng dòng để xử lý file lớn
-            current_entry = ""
-            in_entry = False
-            
-            print("Bắt đầu đọc và parse toàn bộ file...")
-            print("(Quá trình này có thể mất 10-30 phút tùy vào tốc độ máy)")
-            
-            for line in f:
-                line_count += 1
-                
-                # Progress update mỗi 100,000 dòng
-                if line_count % 100000 == 0:
-                    elapsed = time.time() - start_time
-                    print(f"Đã đọc {line_count:,} dòng | Entries thành công: {successful_entries:,} | Tổng từ: {len(kanji_dict):,} | Thời gian: {elapsed:.1f}s")
-                
-                if "<entry>" in line:
-                    in_entry = True
-                    current_entry = line
-                    
-                elif "</entry>" in line:
-                    current_entry += line
-                    in_entry = False
-                    entry_count += 1
-                    
-                    # Parse entry này với fix entity
-                    try:
-                        entry_dict = parse_single_entry_fixed(current_entry)
-                        if entry_dict:
-                            kanji_dict.update(entry_dict)
-                            successful_entries += 1
-                            
-                            # Progress update cho entries thành công
-                            if successful_entries % 5000 == 0:
-                                elapsed = time.time() - start_time
-                                rate = successful_entries / elapsed if elapsed > 0 else 0
-                                print(f"✓ {successful_entries:,} entries thành công | {len(kanji_dict):,} từ | {rate:.1f} entries/sec")
-                            
-                    except Exception as e:
-                        error_count += 1
-                        if error_count <= 5:  # Chỉ in 5 lỗi đầu
-                            print(f"Lỗi parse entry {entry_count}: {e}")
-                    
-                    current_entry = ""
-                elif in_entry:
-                    current_entry += line
+            # Progress update mỗi 50,000 entries
+            if entry_count // 50000 > reported:
+                reported = entry_count // 50000
+                elapsed = time.time() - start_time
+                rate = entry_count / elapsed if elapsed > 0 else 0
+                print(f"Đã đọc {entry_count:,} entries | Có kanji-hiragana: {successful_entries:,} | Tổng từ: {len(kanji_dict):,} | {rate:,.0f} entries/sec")
     
     except Exception as e:
         print(f"Lỗi khi parse JMdict: {e}")
@@ -112,52 +323,134 @@ def parse_jmdict_to_dict_full():
     elapsed_time = time.time() - start_time
     print(f"\n=== Kết thúc parse toàn bộ JMdict ===")
     print(f"Tổng thời gian: {elapsed_time:.1f} giây ({elapsed_time/60:.1f} phút)")
-    print(f"Tổng dòng đọc: {line_count:,}")
     print(f"Tổng entries trong file: {entry_count:,}")
-    print(f"Entries parse thành công: {successful_entries:,}")
-    print(f"Entries lỗi: {error_count:,}")
+    print(f"Entries có cặp kanji-hiragana: {successful_entries:,}")
     print(f"Tổng từ kanji-hiragana tạo được: {len(kanji_dict):,}")
-    print(f"Tỷ lệ thành công: {successful_entries/entry_count*100:.1f}%" if entry_count > 0 else "0%")
     
     return kanji_dict
 
+def extract_entry_readings(kebs, rebs) -> Dict[str, str]:
+    """Các keb có kanji -> reb hiragana đầu tiên của entry (rỗng nếu thiếu 1 trong 2)"""
+    kanjis = [keb for keb in kebs if keb and has_kanji(keb)]
+    readings = [reb for reb in rebs if reb and is_hiragana(reb)]
+    if not kanjis or not readings:
+        return {}
+    return {kanji: readings[0] for kanji in kanjis}
+
+# =========================================
+# Reading model đầy đủ (mọi cặp kanji-reading) -> reading index
+# =========================================
+READING_INDEX_FILE = "jmdict_readings.readidx"
+
+# Tag ưu tiên JMdict được coi là "common" (giống jisho/JMdict)
+COMMON_PRI = {"news1", "ichi1", "spec1", "spec2", "gai1"}
+NO_PRIORITY_SCORE = 99
+# ke_inf/re_inf (đã resolve entity) đánh dấu dạng viết hiếm/sai/cũ/chỉ để tìm kiếm -> xếp sau
+IRREGULAR_INF_MARKERS = ("irregular", "out-dated", "rarely used", "search-only")
+IRREGULAR_PENALTY = 100
+
+def priority_score(pri_tags, inf_texts=()) -> int:
+    """Điểm ưu tiên của 1 keb/reb (nhỏ = phổ biến hơn): nf01..nf48, rồi tag *1, rồi tag *2, rồi không tag"""
+    score = NO_PRIORITY_SCORE
+    for tag in pri_tags:
+        if tag.startswith("nf") and tag[2:].isdigit():
+            score = min(score, int(tag[2:]))
+        elif tag in COMMON_PRI:
+            score = min(score, 24)
+        else:
+            score = min(score, 48)
+    for text in inf_texts:
+        if text and any(marker in text for marker in IRREGULAR_INF_MARKERS):
+            score += IRREGULAR_PENALTY
+            break
+    return score
+
+def extract_entry_reading_records(entry) -> List[Tuple[str, Reading]]:
+    """
+    Mọi cặp (keb, Reading) của 1 <entry> lxml, theo thứ tự k_ele x r_ele:
+    - bỏ reading có <re_nokanji/> (không phải cách đọc của kanji)
+    - reading có <re_restr> chỉ áp cho các keb được liệt kê
+    - giữ cả reading katakana; điểm = điểm keb + điểm reb
+    """
+    kanjis = []
+    for k_ele in entry.iterfind("k_ele"):
+        keb = k_ele.findtext("keb")
+        if keb and has_kanji(keb):
+            pri = [e.text for e in k_ele.iterfind("ke_pri")]
+            score = priority_score(pri, [e.text for e in k_ele.iterfind("ke_inf")])
+            kanjis.append((keb, score, COMMON_PRI.intersection(pri)))
+    if not kanjis:
+        return []
+
+    readings = []
+    for r_ele in entry.iterfind("r_ele"):
+        if r_ele.find("re_nokanji") is not None:
+            continue
+        reb = r_ele.findtext("reb")
+        if not reb or not is_kana(reb):
+            continue
+        pri = [e.text for e in r_ele.iterfind("re_pri")]
+        score = priority_score(pri, [e.text for e in r_ele.iterfind("re_inf")])
+        restr = {e.text for e in r_ele.iterfind("re_restr")}
+        readings.append((reb, score, COMMON_PRI.intersection(pri), restr))
+
+    records = []
+    for keb, ke_score, ke_common in kanjis:
+        for reb, re_score, re_common, restr in readings:
+            if restr and keb not in restr:
+                continue
+            records.append((keb, Reading(reb, ke_score + re_score, bool(ke_common or re_common),
+                                         bool(restr), not is_hiragana(reb))))
+    return records
+
+def build_jmdict_reading_index(jmdict_path: str = JMDICT_FILE, out_path: str = READING_INDEX_FILE,
+                               workers: int = 1, shard_size: int = SHARD_SIZE):
+    """
+    Parse JMdict (song song theo shard như parse_jmdict_to_dict_full), giữ mọi reading của mỗi từ
+    (re_restr, ke_pri/re_pri, katakana), ghi ra reading index (mmap, xem reading_index.py).
+    Trả số từ trong index (0 nếu lỗi).
+    """
+    print("=== Tạo reading index từ JMdict ===")
+    if not os.path.exists(jmdict_path):
+        print(f"File {jmdict_path} không tồn tại!")
+        return 0
+
+    start_time = time.time()
+    index = {}
+    entry_count = 0
+    record_count = 0
+    try:
+        reported = 0
+        for shard_entries, records in map_jmdict_shards(jmdict_path, _parse_shard_readings, workers, shard_size):
+            entry_count += shard_entries
+            for surface, reading in records:
+                index.setdefault(surface, []).append(reading)
+            record_count += len(records)
+            if entry_count // 50000 > reported:
+                reported = entry_count // 50000
+                print(f"Đã đọc {entry_count:,} entries | {len(index):,} từ | {record_count:,} cặp kanji-reading")
+        write_reading_index(index, out_path, file_sha256(jmdict_path))
+    except Exception as e:
+        print(f"Lỗi khi tạo reading index: {e}")
+        return 0
+
+    elapsed_time = time.time() - start_time
+    print(f"Tổng entries: {entry_count:,} | Từ: {len(index):,} | Cặp kanji-reading: {record_count:,}")
+    print(f"Đã lưu reading index: {out_path} ({os.path.getsize(out_path) // 1024} KB) trong {elapsed_time:.1f} giây")
+    return len(index)
+
 def parse_single_entry_fixed(entry_xml: str) -> Dict[str, str]:
-    """Parse một entry XML thành dictionary - fix entity problems"""
+    """Parse một entry XML (chuỗi) thành dictionary - fix entity problems (cách cũ, từng entry)"""
     try:
         # Remove XML entities that cause problems
         cleaned_xml = clean_xml_entities(entry_xml)
         
         root = ET.fromstring(cleaned_xml)
         
-        # Lấy các kanji và reading
-        kanjis = []
-        readings = []
-        
-        # Lấy kanji (keb = kanji element)
-        for keb in root.findall(".//keb"):
-            if keb.text and has_kanji(keb.text):
-                kanjis.append(keb.text)
-        
-        # Lấy reading (reb = reading element)
-        for reb in root.findall(".//reb"):
-            if reb.text and is_hiragana(reb.text):
-                readings.append(reb.text)
-        
-        # Tạo dictionary từ kanji-reading pairs
-        result = {}
-        if kanjis and readings:
-            # Ghép kanji đầu tiên với reading đầu tiên
-            primary_kanji = kanjis[0]
-            primary_reading = readings[0]
-            
-            result[primary_kanji] = primary_reading
-            
-            # Thêm các variant khác nếu có
-            for kanji in kanjis[1:]:
-                if has_kanji(kanji):
-                    result[kanji] = primary_reading
-        
-        return result
+        return extract_entry_readings(
+            [keb.text for keb in root.findall(".//keb")],
+            [reb.text for reb in root.findall(".//reb")],
+        )
         
     except Exception as e:
         return {}
@@ -198,6 +491,18 @@ def is_hiragana(text: str) -> bool:
     
     return True
 
+def is_kana(text: str) -> bool:
+    """Kiểm tra xem text có phải toàn kana (hiragana/katakana, kể cả ー) không"""
+    if not text:
+        return False
+    
+    for char in text:
+        code = ord(char)
+        if not (0x3041 <= code <= 0x309F or 0x30A1 <= code <= 0x30FF):
+            return False
+    
+    return True
+
 def has_kanji(text: str) -> bool:
     """Kiểm tra xem text có chứa kanji không"""
     if not text:
@@ -292,8 +597,9 @@ def main():
     print("3. Xem thống kê JMdict")
     print("4. Tải + Parse toàn bộ (All-in-one)")
     print("5. Tạo dictionary mẫu")
+    print("6. Tạo reading index đầy đủ (mọi reading / từ, cho add_ruby_new.py --readings)")
     
-    choice = input("Chọn option (1/2/3/4/5): ").strip()
+    choice = input("Chọn option (1/2/3/4/5/6): ").strip()
     
     if choice == "1":
         # Chỉ tải JMdict
@@ -306,11 +612,11 @@ def main():
         # Parse toàn bộ JMdict
         if os.path.exists("JMdict_e.gz"):
             print("⚠️  Cảnh báo: Quá trình này sẽ parse TẤT CẢ JMdict (~200,000+ entries)")
-            print("   Có thể mất 10-30 phút và tạo ra dictionary với 50,000+ từ")
+            print("   Có thể mất vài phút và tạo ra dictionary với 50,000+ từ")
             confirm = input("Bạn có chắc muốn tiếp tục? (y/N): ").strip().lower()
             
             if confirm == 'y':
-                new_dict = parse_jmdict_to_dict_full()
+                new_dict = parse_jmdict_to_dict_full(workers=os.cpu_count() or 1)
                 
                 if new_dict:
                     merged_dict = merge_with_existing_dict(new_dict)
@@ -337,12 +643,12 @@ def main():
     elif choice == "4":
         # All-in-one
         print("⚠️  Cảnh báo: Sẽ tải và parse toàn bộ JMdict")
-        print("   Quá trình có thể mất 30-60 phút")
+        print("   Quá trình có thể mất vài phút tùy tốc độ mạng")
         confirm = input("Bạn có chắc muốn tiếp tục? (y/N): ").strip().lower()
         
         if confirm == 'y':
             if download_jmdict():
-                new_dict = parse_jmdict_to_dict_full()
+                new_dict = parse_jmdict_to_dict_full(workers=os.cpu_count() or 1)
                 
                 if new_dict:
                     merged_dict = merge_with_existing_dict(new_dict)
@@ -367,6 +673,13 @@ def main():
         save_dictionary(merged_dict, "dictionary.json")
         print(f"Đã tạo dictionary mẫu với {len(merged_dict):,} từ!")
     
+    elif choice == "6":
+        # Reading index đầy đủ
+        if os.path.exists("JMdict_e.gz"):
+            build_jmdict_reading_index(workers=os.cpu_count() or 1)
+        else:
+            print("File JMdict_e.gz không tồn tại. Chọn option 1 để tải trước.")
+    
     else:
         print("Option không hợp lệ")
 
@@ -1,5 +1,7 @@
 import json
 
+from json_stream import iter_object_items
+
 INP = "dict_struct.json"
 OUT = "dict_struct.view.json"
 
@@ -21,58 +23,71 @@ def slim_value(v: dict) -> dict:
         "map": v.get("map"),
     }
 
-def write_custom(d: dict, path: str):
-    items = list(d.items())
+def render_entry(k, v) -> str:
+    """1 entry đã format (chưa có dấu phẩy cuối / xuống dòng)"""
+    # ✅ nếu muốn chỉ rt+map để nhìn cho gọn
+    if isinstance(v, dict):
+        v = slim_value(v)
+
+    key = j(k)
+
+    # Rule inline: dict chỉ có rt+map và map <= 1 phần tử
+    inline = (
+        isinstance(v, dict)
+        and set(v.keys()) <= {"rt", "map"}
+        and isinstance(v.get("map"), list)
+        and len(v["map"]) <= 1
+    )
+
+    if inline:
+        return f"  {key}: {j_compact(v)}"
+
+    # Multi-line format (giống ảnh)
+    if isinstance(v, dict) and "rt" in v and "map" in v and isinstance(v["map"], list):
+        mp = v.get("map") or []
+        lines = [
+            f"  {key}: {{",
+            f"    \"rt\": {j(v.get('rt'))},",
+            f"    \"map\": [",
+        ]
+        for mi, m in enumerate(mp):
+            m_comma = "," if mi < len(mp) - 1 else ""
+            lines.append(f"      {j_compact(m)}{m_comma}")
+        lines.append("    ]")
+        lines.append("  }")
+        return "\n".join(lines)
+
+    # Fallback: các kiểu khác (in compact 1 dòng)
+    return f"  {key}: {j_compact(v)}"
+
+def write_custom(items, path: str):
+    """
+    items: dict hoặc iterable (key, value) - vd iter_object_items, không cần load cả file.
+    Ghi từng entry ngay khi đọc, chỉ giữ lại entry trước đó để biết có cần dấu phẩy không (look-ahead 1 entry).
+    """
+    if isinstance(items, dict):
+        items = items.items()
 
     with open(path, "w", encoding="utf-8", newline="\n") as f:
         f.write("{\n")
 
-        for idx, (k, v) in enumerate(items):
-            comma = "," if idx < len(items) - 1 else ""
-
-            # ✅ nếu muốn chỉ rt+map để nhìn cho gọn
-            if isinstance(v, dict):
-                v = slim_value(v)
-
-            key = j(k)
-
-            # Rule inline: dict chỉ có rt+map và map <= 1 phần tử
-            inline = (
-                isinstance(v, dict)
-                and set(v.keys()) <= {"rt", "map"}
-                and isinstance(v.get("map"), list)
-                and len(v["map"]) <= 1
-            )
-
-            if inline:
-                f.write(f"  {key}: {j_compact(v)}{comma}\n")
-                continue
-
-            # Multi-line format (giống ảnh)
-            if isinstance(v, dict) and "rt" in v and "map" in v and isinstance(v["map"], list):
-                f.write(f"  {key}: {{\n")
-                f.write(f"    \"rt\": {j(v.get('rt'))},\n")
-                f.write(f"    \"map\": [\n")
-
-                mp = v.get("map") or []
-                for mi, m in enumerate(mp):
-                    m_comma = "," if mi < len(mp) - 1 else ""
-                    f.write(f"      {j_compact(m)}{m_comma}\n")
-
-                f.write("    ]\n")
-                f.write(f"  }}{comma}\n")
-                continue
-
-            # Fallback: các kiểu khác (in compact 1 dòng)
-            f.write(f"  {key}: {j_compact(v)}{comma}\n")
+        pending = None
+        for k, v in items:
+            if pending is not None:
+                f.write(f"{pending},\n")
+            pending = render_entry(k, v)
+        if pending is not None:
+            f.write(f"{pending}\n")
 
         f.write("}\n")
 
-def main():
-    with open(INP, "r", encoding="utf-8") as f:
-        d = json.load(f)
+def format_file(inp: str, out: str):
+    """Đọc dict_struct.json kiểu streaming (json_stream) và ghi bản view -> RAM không phụ thuộc kích thước file"""
+    with open(inp, "r", encoding="utf-8") as f:
+        write_custom(iter_object_items(f), out)
 
-    write_custom(d, OUT)
+def main():
+    format_file(INP, OUT)
     print("Wrote:", OUT)
 
 if __name__ == "__main__":
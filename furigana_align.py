@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Gióng (align) surface với reading bằng quy hoạch động để suy ra furigana cho từng kanji.
+
+dp[i][j] = chi phí nhỏ nhất để khớp surface[:i] với reading[:j]:
+  - kana trong surface phải khớp đúng ký tự reading (katakana so như hiragana)
+  - mỗi kanji nhận 1 đoạn reading 1..MAX_KANJI_READING ký tự, bắt đầu/kết thúc ở ranh giới mora;
+    chi phí thấp nếu đoạn đó là reading đã biết của kanji (KanjiReadingTable, kể cả biến âm
+    rendaku/sokuon), vừa nếu có dạng on'yomi (1 mora, hoặc 2 mora kết thúc bằng ん/う/い/つ/く/き/ち/っ),
+    cao nếu không (càng nhiều mora càng đắt)
+  - 々 lặp lại reading của kanji ngay trước (kể cả rendaku)
+  - bỏ qua 1 ký tự kana / reading, hoặc kanji không nhận reading: phạt nặng, đánh dấu uncertain
+Thời gian mỗi entry bị chặn bởi MAX_DP_CELLS (quá thì trả None để gọi fallback).
+
+Cụm >= 2 kanji chỉ được coi là chắc chắn khi reading của cụm có ĐÚNG 1 cách chia mà mọi đoạn
+đều hợp lý (reading đã biết hoặc dạng on'yomi) và DP chọn đúng cách chia đó.
+
+KanjiReadingTable được dựng từ chính dictionary (collect_kanji_readings, 2 vòng): vòng 1 với
+bảng rỗng, vòng 2 với bảng vòng 1; mỗi vòng đếm reading của các cụm kanji chắc chắn.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+from char_classes import KANA_CHARS, KANJI_CHARS, ITERATION_MARK
+
+MAX_KANJI_READING = 8      # số ký tự reading tối đa cho 1 kanji (うけたまわ = 5)
+MAX_DP_CELLS = 4096        # (len(surface) + 1) * (len(reading) + 1)
+
+# chi phí
+KNOWN_COST = 1.0           # reading đã biết (trừ tối đa FREQ_BONUS theo tần suất)
+FREQ_BONUS = 0.5
+VARIANT_COST = 1.3         # reading đã biết sau biến âm (rendaku / sokuon)
+REPEAT_COST = 0.5          # 々 lặp reading kanji trước
+ON_SHAPE_COST = 2.0        # reading chưa biết nhưng có dạng on'yomi
+UNKNOWN_COST = 3.0         # reading chưa biết khác (+ SPREAD_COST * (số mora - 1)^2)
+SPREAD_COST = 0.5
+EMPTY_COST = 6.0           # kanji không nhận reading nào
+SKIP_COST = 5.0            # bỏ qua 1 ký tự kana trong surface hoặc 1 ký tự reading
+PROLONG_COST = 0.5         # ー trong surface khớp nguyên âm trong reading
+OTHER_COST = 2.0           # ký tự khác (số, chữ Latin...) nhận 0..n ký tự reading
+
+SMALL_KANA = frozenset("ぁぃぅぇぉっゃゅょゎァィゥェォッャュョヮ")
+PROLONG = "ー"
+NO_START = SMALL_KANA | {PROLONG, "ん"}       # reading của 1 kanji không bắt đầu bằng các ký tự này
+NO_END_BEFORE = (SMALL_KANA - {"っ", "ッ"}) | {PROLONG}  # ... và không kết thúc ngay trước các ký tự này
+ON_FINALS = frozenset("んういつくきちっ")      # mora thứ 2 của on'yomi 2 mora
+VOWELS = frozenset("あいうえおぁぃぅぇぉー")
+
+# katakana -> hiragana để so sánh (ァ..ヶ -> ぁ..ゖ)
+_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30a1, 0x30f7)}
+# ヶ/ヵ (một ヶ月, 三ヵ所) đọc là か/が/こ
+_KANA_EQUIV = {"ゖ": frozenset("かがこ"), "ゕ": frozenset("かが")}
+
+_VOICED = {
+    "か": "が", "き": "ぎ", "く": "ぐ", "け": "げ", "こ": "ご",
+    "さ": "ざ", "し": "じ", "す": "ず", "せ": "ぜ", "そ": "ぞ",
+    "た": "だ", "ち": "ぢ", "つ": "づ", "て": "で", "と": "ど",
+    "は": "ばぱ", "ひ": "びぴ", "ふ": "ぶぷ", "へ": "べぺ", "ほ": "ぼぽ",
+}
+_SOKUON_FINAL = frozenset("つくちき")
+
+Alignment = namedtuple("Alignment", "slices skipped cost")
+
+
+def to_hiragana(text):
+    return text.translate(_TO_HIRAGANA)
+
+
+def reading_variants(reading):
+    """Biến âm khi ghép từ: rendaku (かわ -> がわ), sokuon (がく -> がっ), cả hai"""
+    heads = [reading]
+    for voiced in _VOICED.get(reading[:1], ""):
+        heads.append(voiced + reading[1:])
+    variants = set(heads[1:])
+    if len(reading) > 1 and reading[-1] in _SOKUON_FINAL:
+        variants.update(head[:-1] + "っ" for head in heads)
+    variants.discard(reading)
+    return variants
+
+
+class KanjiReadingTable:
+    """Tần suất reading của từng kanji: {kanji: {reading: số lần}}"""
+
+    def __init__(self, counts=None):
+        self.counts = counts if counts is not None else {}
+        self._costs = {}
+        self._best = {}
+
+    def add(self, kanji, reading, count=1):
+        readings = self.counts.setdefault(kanji, {})
+        readings[reading] = readings.get(reading, 0) + count
+        self._costs.pop(kanji, None)
+        self._best.pop(kanji, None)
+
+    def update(self, counts):
+        """Gộp {kanji: {reading: số lần}} (kết quả collect từ worker)"""
+        for kanji, readings in counts.items():
+            for reading, count in readings.items():
+                self.add(kanji, reading, count)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, kanji):
+        return kanji in self.counts
+
+    def readings(self, kanji):
+        """Các reading của kanji, phổ biến trước (cùng tần suất: theo thứ tự chữ)"""
+        readings = self.counts.get(kanji, {})
+        return sorted(readings, key=lambda r: (-readings[r], r))
+
+    def best_reading(self, kanji):
+        """Reading phổ biến nhất của kanji (None nếu chưa biết) - tính 1 lần rồi tra dict O(1)"""
+        best = self._best.get(kanji)
+        if best is None and kanji in self.counts:
+            best = self._best[kanji] = self.readings(kanji)[0]
+        return best
+
+    def known_costs(self, kanji):
+        """{reading hoặc biến âm: chi phí} của kanji (tính 1 lần, cache lại)"""
+        costs = self._costs.get(kanji)
+        if costs is None:
+            costs = {}
+            readings = self.counts.get(kanji)
+            if readings:
+                total = sum(readings.values())
+                for reading, count in readings.items():
+                    bonus = FREQ_BONUS * count / total
+                    for variant in reading_variants(reading):
+                        costs[variant] = min(costs.get(variant, VARIANT_COST), VARIANT_COST - bonus)
+                for reading, count in readings.items():
+                    costs[reading] = KNOWN_COST - FREQ_BONUS * count / total
+            self._costs[kanji] = costs
+        return costs
+
+
+EMPTY_TABLE = KanjiReadingTable()
+
+
+def _moras(piece):
+    """Tách kana thành mora (ゃ/ゅ/ょ..., ー ghép vào mora trước)"""
+    moras = []
+    for ch in piece:
+        if moras and ch in NO_END_BEFORE:
+            moras[-1] += ch
+        else:
+            moras.append(ch)
+    return moras
+
+
+@lru_cache(maxsize=1 << 16)
+def is_on_shaped(piece):
+    """Dạng on'yomi: 1 mora (か, しょ), hoặc 2 mora với mora sau là ん/う/い/つ/く/き/ち/っ (かん, きょう, がっ)"""
+    moras = _moras(piece)
+    if not moras or moras[0][0] in NO_START:
+        return False
+    return len(moras) == 1 or (len(moras) == 2 and moras[1] in ON_FINALS)
+
+
+@lru_cache(maxsize=1 << 16)
+def unknown_cost(piece):
+    if is_on_shaped(piece):
+        return ON_SHAPE_COST
+    return UNKNOWN_COST + SPREAD_COST * (len(_moras(piece)) - 1) ** 2
+
+
+def _kana_matches(ch, target):
+    if ch == target:
+        return 0.0
+    if ch == PROLONG and target in VOWELS:
+        return PROLONG_COST
+    equiv = _KANA_EQUIV.get(ch)
+    if equiv is not None and target in equiv:
+        return 0.0
+    return None
+
+
+def _fill_dp(surf, read, table, allow_skip):
+    """Bảng (cost, back) của DP; allow_skip=False: không cho bước bỏ qua (ít ô đến được hơn nhiều)"""
+    n, m = len(surf), len(read)
+    # starts[j]: đoạn reading của kanji được bắt đầu tại j; ends[j]: được kết thúc tại j
+    starts = [j < m and read[j] not in NO_START for j in range(m + 1)]
+    ends = [j == m or read[j] not in NO_END_BEFORE for j in range(m + 1)]
+    inf = float("inf")
+
+    width = m + 1
+    cost = [inf] * ((n + 1) * width)
+    back = [None] * ((n + 1) * width)   # (ô trước, kiểu bước)
+    cost[0] = 0.0
+
+    # không bỏ qua: surf[i:] cần ít nhất min_rest[i] và nhiều nhất max_rest[i] ký tự reading
+    min_rest = [0] * (n + 1)
+    max_rest = [0] * (n + 1)
+    if not allow_skip:
+        for i in range(n - 1, -1, -1):
+            kana = surf[i] in KANA_CHARS
+            min_rest[i] = min_rest[i + 1] + (kana or surf[i] in KANJI_CHARS)
+            max_rest[i] = max_rest[i + 1] + (1 if kana else MAX_KANJI_READING)
+
+    for i in range(n + 1):
+        ch = surf[i] if i < n else None
+        kanji_costs = table.known_costs(ch) if ch in KANJI_CHARS and ch != ITERATION_MARK else None
+        base = i * width
+        j_from, j_to = 0, m
+        if not allow_skip:
+            j_from, j_to = max(0, m - max_rest[i]), m - min_rest[i]
+        for j in range(j_from, j_to + 1):
+            c = cost[base + j]
+            if c == inf:
+                continue
+            # bỏ qua 1 ký tự reading
+            if allow_skip and j < m and c + SKIP_COST < cost[base + j + 1]:
+                cost[base + j + 1] = c + SKIP_COST
+                back[base + j + 1] = (base + j, "skip")
+            if ch is None:
+                continue
+            nxt = base + width + j
+
+            if ch in KANA_CHARS:
+                if j < m:
+                    step = _kana_matches(ch, read[j])
+                    if step is not None and c + step < cost[nxt + 1]:
+                        cost[nxt + 1] = c + step
+                        back[nxt + 1] = (base + j, "kana")
+                if allow_skip and c + SKIP_COST < cost[nxt]:
+                    cost[nxt] = c + SKIP_COST
+                    back[nxt] = (base + j, "skip")
+                continue
+
+            if ch in KANJI_CHARS:
+                if allow_skip and c + EMPTY_COST < cost[nxt]:
+                    cost[nxt] = c + EMPTY_COST
+                    back[nxt] = (base + j, "skip")
+                if not starts[j]:
+                    continue
+                repeat = None
+                if ch == ITERATION_MARK and i > 0:
+                    prev = back[base + j]
+                    if prev is not None and prev[1] == "kanji" and surf[i - 1] != ITERATION_MARK:
+                        prev_reading = read[prev[0] % width:j]
+                        repeat = reading_variants(prev_reading) | {prev_reading}
+                for length in range(1, min(MAX_KANJI_READING, m - j - min_rest[i + 1]) + 1):
+                    if not ends[j + length]:
+                        continue
+                    piece = read[j:j + length]
+                    if repeat is not None and piece in repeat:
+                        step = REPEAT_COST
+                    elif kanji_costs and piece in kanji_costs:
+                        step = kanji_costs[piece]
+                    else:
+                        step = unknown_cost(piece)
+                    if c + step < cost[nxt + length]:
+                        cost[nxt + length] = c + step
+                        back[nxt + length] = (base + j, "kanji")
+                continue
+
+            # ký tự khác: nhận 0..MAX_KANJI_READING ký tự reading
+            for length in range(0, min(MAX_KANJI_READING, m - j) + 1):
+                step = OTHER_COST + SPREAD_COST * length
+                if c + step < cost[nxt + length]:
+                    cost[nxt + length] = c + step
+                    back[nxt + length] = (base + j, "other")
+
+    return cost, back
+
+
+def align_reading(surface, reading, table=EMPTY_TABLE):
+    """
+    Alignment(slices, skipped, cost) với slices[i] = (r0, r1) là đoạn reading của surface[i]
+    (kana/ký tự khác cũng có đoạn của nó), skipped=True nếu phải bỏ qua ký tự / kanji không có reading.
+    Thử align không bỏ qua gì trước, chỉ khi không được mới cho phép bước bỏ qua.
+    None nếu entry quá lớn (> MAX_DP_CELLS).
+    """
+    n, m = len(surface), len(reading)
+    if (n + 1) * (m + 1) > MAX_DP_CELLS:
+        return None
+    surf = to_hiragana(surface)
+    read = to_hiragana(reading)
+    width = m + 1
+    end = n * width + m
+
+    cost, back = _fill_dp(surf, read, table, allow_skip=False)
+    if back[end] is None and end:
+        cost, back = _fill_dp(surf, read, table, allow_skip=True)
+
+    slices = [(0, 0)] * n
+    skipped = False
+    cell = end
+    while cell:
+        prev, kind = back[cell]
+        i, j = divmod(cell, width)
+        pi, pj = divmod(prev, width)
+        if kind == "skip":
+            skipped = True
+            if pi < i:
+                slices[pi] = (pj, pj)
+        else:
+            slices[pi] = (pj, j)
+        cell = prev
+    return Alignment(slices, skipped, cost[end])
+
+
+def kanji_runs(surface):
+    """Các cụm kanji liên tiếp (kể cả 々): [(s0, s1), ...]"""
+    runs = []
+    start = None
+    for i, ch in enumerate(surface):
+        if ch in KANJI_CHARS:
+            if start is None:
+                start = i
+        elif start is not None:
+            runs.append((start, i))
+            start = None
+    if start is not None:
+        runs.append((start, len(surface)))
+    return runs
+
+
+def is_plausible_reading(table, ch, piece, prev_piece=None):
+    """
+    `piece` có hợp lý cho kanji ch không: reading đã biết (kể cả biến âm) hoặc dạng on'yomi;
+    々 thì phải lặp lại reading kanji trước (prev_piece).
+    """
+    if ch == ITERATION_MARK:
+        return prev_piece is not None and (piece == prev_piece or piece in reading_variants(prev_piece))
+    return piece in table.known_costs(ch) or is_on_shaped(piece)
+
+
+def count_plausible_splits(table, run, read, limit=2):
+    """Số cách chia `read` cho các kanji của `run` mà mọi đoạn đều hợp lý (đếm tối đa `limit`)"""
+    n, m = len(run), len(read)
+    starts = [j < m and read[j] not in NO_START for j in range(m + 1)]
+    ends = [j == m or read[j] not in NO_END_BEFORE for j in range(m + 1)]
+    # ways[(i, j, độ dài đoạn trước)]: số cách chia read[j:] cho run[i:]
+    memo = {}
+
+    def ways(i, j, prev_len):
+        if i == n:
+            return 1 if j == m else 0
+        key = (i, j, prev_len)
+        if key in memo:
+            return memo[key]
+        total = 0
+        if starts[j]:
+            prev_piece = read[j - prev_len:j] if prev_len else None
+            for length in range(1, min(MAX_KANJI_READING, m - j) + 1):
+                if ends[j + length] and is_plausible_reading(table, run[i], read[j:j + length], prev_piece):
+                    total += ways(i + 1, j + length, length)
+                    if total >= limit:
+                        break
+        memo[key] = total = min(total, limit)
+        return total
+
+    return ways(0, 0, 0)
+
+
+def _run_certain(table, run, read, pieces):
+    """Cụm kanji chắc chắn: 1 kanji, hoặc reading có đúng 1 cách chia hợp lý và DP chọn cách đó"""
+    if len(run) == 1:
+        return True
+    prev_piece = None
+    for ch, piece in zip(run, pieces):
+        if not is_plausible_reading(table, ch, piece, prev_piece):
+            return False
+        prev_piece = piece
+    return count_plausible_splits(table, run, read) == 1
+
+
+def segment_entry(surface, reading, table=EMPTY_TABLE):
+    """
+    Align rồi gom theo cụm kanji.
+    Return (segments, mapping, uncertain) hoặc None nếu entry quá lớn:
+      segments: [(s0, s1, reading của cả cụm)]
+      mapping : [{"i", "ch", "rt"}] cho mỗi kanji nhận được reading
+      uncertain: có bước bỏ qua, hoặc có cụm kanji không chắc chắn (_run_certain)
+    """
+    alignment = align_reading(surface, reading, table)
+    if alignment is None:
+        return None
+    slices = alignment.slices
+    uncertain = alignment.skipped
+    segments = []
+    mapping = []
+    read = to_hiragana(reading)
+    for s0, s1 in kanji_runs(surface):
+        r0, r1 = slices[s0][0], slices[s1 - 1][1]
+        segments.append((s0, s1, reading[r0:r1]))
+        for i in range(s0, s1):
+            if slices[i][0] != slices[i][1]:
+                mapping.append({"i": i, "ch": surface[i], "rt": reading[slices[i][0]:slices[i][1]]})
+        if not uncertain:
+            pieces = [read[slice(*slices[i])] for i in range(s0, s1)]
+            uncertain = not _run_certain(table, surface[s0:s1], read[r0:r1], pieces)
+    return segments, mapping, uncertain
+
+
+def collect_kanji_readings(items, table=EMPTY_TABLE):
+    """
+    Đếm reading từng kanji từ các cặp (surface, reading) -> {kanji: {reading: số lần}}.
+    Chỉ lấy các cụm kanji chắc chắn (_run_certain theo `table`) của entry align không phải bỏ ký tự.
+    """
+    counts = {}
+    for surface, reading in items:
+        if not isinstance(surface, str) or not isinstance(reading, str) or not reading:
+            continue
+        runs = kanji_runs(surface)
+        if not runs:
+            continue
+        alignment = align_reading(surface, reading, table)
+        if alignment is None or alignment.skipped:
+            continue
+        read = to_hiragana(reading)
+        for s0, s1 in runs:
+            pieces = [read[slice(*alignment.slices[i])] for i in range(s0, s1)]
+            run = surface[s0:s1]
+            if not _run_certain(table, run, "".join(pieces), pieces):
+                continue
+            for ch, piece in zip(run, pieces):
+                if ch != ITERATION_MARK:
+                    readings = counts.setdefault(ch, {})
+                    readings[piece] = readings.get(piece, 0) + 1
+    return counts
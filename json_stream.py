@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Đọc/ghi JSON object lớn kiểu streaming (không load cả file vào RAM).
+
+- iter_object_items(f): duyệt (key, value) của object cấp cao nhất trong file text,
+  đọc từng chunk và parse từng key/value bằng json.JSONDecoder.raw_decode (giống ijson.kvitems).
+- ObjectWriter: ghi từng cặp key/value; kết quả giống hệt json.dumps(obj, ensure_ascii=False, indent=2).
+"""
+
+import json
+import re
+
+READ_CHUNK = 1 << 20
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+_decoder = json.JSONDecoder()
+
+
+class _StreamBuffer:
+    """Buffer đọc dần từ file; chỉ giữ phần chưa parse"""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Ký tự khác khoảng trắng tiếp theo (không tiêu thụ)"""
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("JSON kết thúc bất ngờ")
+
+    def expect(self, ch):
+        found = self.peek()
+        if found != ch:
+            raise ValueError(f"JSON không hợp lệ: cần '{ch}', gặp '{found}'")
+        self.pos += 1
+
+    def value(self):
+        """Parse 1 giá trị JSON hoàn chỉnh (đọc thêm chunk nếu giá trị bị cắt ở cuối buffer)"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # số ở sát cuối buffer ("-1" của "-1.5e10") có thể còn tiếp ở chunk sau:
+                # chỉ nhận khi thấy dấu phân cách ngay sau giá trị
+                after = WHITESPACE.match(self.buf, end).end()
+                if (after < len(self.buf) and self.buf[after] in ",:]}") or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def iter_object_items(f, chunk_size=READ_CHUNK):
+    """Duyệt (key, value) của JSON object cấp cao nhất, theo đúng thứ tự trong file"""
+    reader = _StreamBuffer(f, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        yield key, reader.value()
+        sep = reader.peek()
+        reader.pos += 1
+        if sep == "}":
+            return
+        if sep != ",":
+            raise ValueError(f"JSON không hợp lệ: cần ',' hoặc '}}', gặp '{sep}'")
+
+
+def render_item(key, value, indent=2):
+    """1 cặp key/value ở cấp 1 của object, đúng như json.dumps(..., indent=indent) in ra"""
+    pad = " " * indent
+    rendered = json.dumps(value, ensure_ascii=False, indent=indent).replace("\n", "\n" + pad)
+    return f"{pad}{json.dumps(key, ensure_ascii=False)}: {rendered}"
+
+
+class ObjectWriter:
+    """Ghi JSON object từng cặp (write / write_rendered), gọi close() để đóng object"""
+
+    def __init__(self, f, indent=2):
+        self.f = f
+        self.indent = indent
+        self.count = 0
+
+    def write_rendered(self, rendered):
+        """Ghi 1 cặp đã render sẵn bằng render_item (vd. render trong worker process)"""
+        self.f.write(",\n" if self.count else "{\n")
+        self.f.write(rendered)
+        self.count += 1
+
+    def write(self, key, value):
+        self.write_rendered(render_item(key, value, self.indent))
+
+    def close(self):
+        self.f.write("\n}" if self.count else "{}")
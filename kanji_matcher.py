@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Aho-Corasick automaton để tìm từ Kanji trong text.
+
+Automaton được build MỘT lần từ dictionary đã load, sau đó mỗi run text chỉ cần
+quét tuyến tính 1 lần thay vì thử mọi cửa sổ 12 -> 1 ký tự tại mọi vị trí.
+
+Ngữ nghĩa chọn match giữ nguyên như find_kanji_matches_optimized cũ:
+  - từ dài được ưu tiên trước (12 -> 3 rồi 2 -> 1, tức là dài -> ngắn)
+  - cùng độ dài thì vị trí bên trái được ưu tiên
+  - vị trí nào đã được phủ bởi match trước thì không match lại
+"""
+
+from collections import deque
+
+MAX_WORD_LEN = 12
+
+
+class KanjiMatcher:
+    """Automaton (goto/fail/output) build từ tập key của dictionary."""
+
+    __slots__ = ("goto", "fail", "out", "max_len", "key_count")
+
+    def __init__(self, keys, max_len=MAX_WORD_LEN):
+        goto = [{}]
+        out = [()]
+        key_count = 0
+
+        for key in keys:
+            if not key or len(key) > max_len:
+                continue
+            state = 0
+            for ch in key:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            if not out[state]:
+                out[state] = (len(key),)
+                key_count += 1
+
+        # BFS để tạo fail link; output của state gộp luôn output của fail state
+        # (độ dài giảm dần vì fail state luôn nông hơn)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self.goto = goto
+        self.fail = fail
+        self.out = out
+        self.max_len = max_len
+        self.key_count = key_count
+
+    def find_spans(self, text):
+        """
+        Quét text 1 lần, trả về (spans, covered):
+          spans: list (start, end) không chồng lấn, sắp theo start
+          covered: bytearray, covered[i] = 1 nếu vị trí i nằm trong 1 match
+        """
+        goto, fail, out = self.goto, self.fail, self.out
+        n = len(text)
+
+        # buckets[L] = các vị trí bắt đầu của key dài L (tự động tăng dần theo start)
+        buckets = [[] for _ in range(self.max_len + 1)]
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length in out[state]:
+                buckets[length].append(end - length)
+
+        covered = bytearray(n)
+        spans = []
+        for length in range(self.max_len, 0, -1):
+            fill = b"\x01" * length
+            for start in buckets[length]:
+                end = start + length
+                if covered.find(1, start, end) != -1:
+                    continue
+                covered[start:end] = fill
+                spans.append((start, end))
+
+        spans.sort()
+        return spans, covered
+
+
+# Cache automaton theo dictionary đang dùng (dictionary chỉ load 1 lần mỗi lần chạy)
+_matcher_cache = {}
+
+
+def get_matcher(dictionary, key_filter=None, max_len=MAX_WORD_LEN):
+    """
+    Lấy automaton cho dictionary, build nếu chưa có hoặc dictionary đã đổi kích thước.
+    key_filter(key) -> bool: chỉ nạp key thỏa điều kiện (vd. key đã "sạch").
+    """
+    cache_key = (id(dictionary), key_filter, max_len)
+    cached = _matcher_cache.get(cache_key)
+    if cached is not None and cached[0] is dictionary and cached[1] == len(dictionary):
+        return cached[2]
+
+    keys = dictionary if key_filter is None else (k for k in dictionary if key_filter(k))
+    matcher = KanjiMatcher(keys, max_len=max_len)
+
+    _matcher_cache.clear()
+    _matcher_cache[cache_key] = (dictionary, len(dictionary), matcher)
+    return matcher
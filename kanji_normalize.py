@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Chuẩn hóa text trước khi tìm từ Kanji.
+
+Trước đây clean_kanji_word dựng lại bảng radical -> kanji ở mỗi lần gọi và
+được gọi cho từng cửa sổ con. Giờ bảng được build 1 lần thành translate table,
+và cả run text được chuẩn hóa 1 lần, kèm bảng offset để map vị trí match
+về lại ký tự gốc.
+"""
+
+import re
+
+# Kangxi radical -> Kanji chuẩn
+RADICAL_TO_KANJI = {
+    "⼀": "一", "⼁": "｜", "⼂": "丶", "⼃": "丿", "⼄": "乙", "⼅": "亅", "⼆": "二", "⼇": "亠", "⼈": "人", "⼉": "儿",
+    "⼊": "入", "⼋": "八", "⼌": "冂", "⼍": "冖", "⼎": "冫", "⼏": "几", "⼐": "凵", "⼑": "刀", "⼒": "力", "⼓": "勹",
+    "⼔": "匕", "⼕": "匚", "⼖": "匸", "⼗": "十", "⼘": "卜", "⼙": "卩", "⼚": "厂", "⼛": "厶", "⼜": "又", "⼝": "口",
+    "⼞": "囗", "⼟": "土", "⼠": "士", "⼡": "夂", "⼢": "夊", "⼣": "夕", "⼤": "大", "⼥": "女", "⼦": "子", "⼧": "宀",
+    "⼨": "寸", "⼩": "小", "⼪": "尢", "⼫": "尸", "⼬": "屮", "⼭": "山", "⼮": "巛", "⼯": "工", "⼰": "己", "⼱": "巾",
+    "⼲": "干", "⼳": "幺", "⼴": "广", "⼵": "廴", "⼶": "廾", "⼷": "弋", "⼸": "弓", "⼹": "彐", "⼺": "彡", "⼻": "彳",
+    "⼼": "心", "⼽": "戈", "⼾": "戸", "⼿": "手", "⽀": "支", "⽁": "攴", "⽂": "文", "⽃": "斗", "⽄": "斤", "⽅": "方",
+    "⽆": "无", "⽇": "日", "⽈": "曰", "⽉": "月", "⽊": "木", "⽋": "欠", "⽌": "止", "⽍": "歹", "⽎": "殳", "⽏": "毋",
+    "⽐": "比", "⽑": "毛", "⽒": "氏", "⽓": "气", "⽔": "水", "⽕": "火", "⽖": "爪", "⽗": "父", "⽘": "爻", "⽙": "爿",
+    "⽚": "片", "⽛": "牙", "⽜": "牛", "⽝": "犬", "⽞": "玄", "⽟": "玉", "⽠": "瓜", "⽡": "瓦", "⽢": "甘", "⽣": "生",
+    "⽤": "用", "⽥": "田", "⽦": "疋", "⽧": "疒", "⽨": "癶", "⽩": "白", "⽪": "皮", "⽫": "皿", "⽬": "目", "⽭": "矛",
+    "⽮": "矢", "⽯": "石", "⽰": "示", "⽱": "禸", "⽲": "禾", "⽳": "穴", "⽴": "立", "⽵": "竹", "⽶": "米", "⽷": "糸",
+    "⽸": "缶", "⽹": "网", "⽺": "羊", "⽻": "羽", "⽼": "老", "⽽": "而", "⽾": "耒", "⽿": "耳", "⾀": "聿", "⾁": "肉",
+    "⾂": "臣", "⾃": "自", "⾄": "至", "⾅": "臼", "⾆": "舌", "⾇": "舛", "⾈": "舟", "⾉": "艮", "⾊": "色", "⾋": "艸",
+    "⾌": "虍", "⾍": "虫", "⾎": "血", "⾏": "行", "⾐": "衣", "⾑": "襾", "⾒": "見", "⾓": "角", "⾔": "言", "⾕": "谷",
+    "⾖": "豆", "⾗": "豕", "⾘": "豸", "⾙": "貝", "⾚": "赤", "⾛": "走", "⾜": "足", "⾝": "身", "⾞": "車", "⾟": "辛",
+    "⾠": "辰", "⾡": "辵", "⾢": "邑", "⾣": "酉", "⾤": "釆", "⾥": "里", "⾦": "金", "⾧": "長", "⾨": "門", "⾩": "阜",
+    "⾪": "隶", "⾫": "隹", "⾬": "雨", "⾭": "青", "⾮": "非", "⾯": "面", "⾰": "革", "⾱": "韋", "⾲": "韭", "⾳": "音",
+    "⾴": "頁", "⾵": "風", "⾶": "飛", "⾷": "食", "⾸": "首", "⾹": "香", "⾺": "馬", "⾻": "骨", "⾼": "高", "⾽": "髟",
+    "⾾": "鬥", "⾿": "鬯", "⿀": "鬲", "⿁": "鬼", "⿂": "魚", "⿃": "鳥", "⿄": "鹵", "⿅": "鹿", "⿆": "麦", "⿇": "麻",
+    "⿈": "黄", "⿉": "黍", "⿊": "黒", "⿋": "黹", "⿌": "黽", "⿍": "鼎", "⿎": "鼓", "⿏": "鼠", "⿐": "鼻", "⿑": "齊",
+    "⿒": "歯", "⿓": "竜", "⿔": "亀", "⿕": "龠"
+}
+RADICAL_TABLE = str.maketrans(RADICAL_TO_KANJI)
+
+# Ký tự giữ lại: kana, kanji, số và dấu câu tiếng Nhật phổ biến
+_KEEP_CLASS = r'\u3040-\u309f\u30a0-\u30ff\u4e00-\u9fff0-9０-９、。！？「」『』（）［］【】〈〉《》〔〕…‥ー～—・：；'
+NOISE_PATTERN = re.compile(f'[^{_KEEP_CLASS}]')
+KEEP_RUN_PATTERN = re.compile(f'[{_KEEP_CLASS}]+')
+
+
+def clean_kanji_word(word: str) -> str:
+    """Làm sạch từ Kanji: thay radical, loại bỏ ký tự không phải tiếng Nhật (giữ dấu câu JP)"""
+    return NOISE_PATTERN.sub('', (word or '').translate(RADICAL_TABLE))
+
+
+def is_clean_key(key: str) -> bool:
+    """Key không bị clean_kanji_word thay đổi (chỉ những key này mới match được)"""
+    return not NOISE_PATTERN.search(key)
+
+
+def normalize_for_matching(text: str):
+    """
+    Chuẩn hóa cả text 1 lần: thay radical + bỏ ký tự nhiễu.
+    Trả (normalized, offsets):
+      offsets[j] = vị trí trong text gốc của ký tự normalized[j]
+      offsets = None nếu không bỏ ký tự nào (vị trí giữ nguyên)
+    """
+    translated = (text or '').translate(RADICAL_TABLE)
+    if not NOISE_PATTERN.search(translated):
+        return translated, None
+
+    parts = []
+    offsets = []
+    for m in KEEP_RUN_PATTERN.finditer(translated):
+        parts.append(m.group())
+        offsets.extend(range(m.start(), m.end()))
+    return ''.join(parts), offsets
+
+
+def to_original_span(start, end, offsets):
+    """Đổi span (start, end) trên text normalized -> span trên text gốc"""
+    if offsets is None:
+        return start, end
+    return offsets[start], offsets[end - 1] + 1
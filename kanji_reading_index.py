@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Index reading theo TỪNG kanji (kiểu kanjidic) dựng từ dictionary của project.
+
+Nguồn:
+  - dict_struct.json: đếm thẳng map {ch, rt} của các entry không `uncertain`
+  - dictionary.json {surface: reading}: tách furigana bằng DP align (convert_dict_to_struct.build_reading_table)
+Kết quả là bảng tần suất {kanji: {reading: số lần}} nhỏ gọn (vài nghìn kanji), load toàn bộ vào RAM
+thành KanjiReadingTable: dùng làm prior cho bước tách furigana và làm fallback O(1) cho kanji đơn
+không match được trong add_ruby_new.find_kanji_matches_optimized.
+
+Layout file (little-endian):
+  header : magic, version, count, độ dài blob, sha256 file nguồn
+  blob   : mỗi kanji 1 record "kanji\\x1freading\\x1fcount\\x1freading\\x1fcount...", nối bằng \\x1e,
+           kanji sắp theo thứ tự chữ, reading phổ biến trước
+
+    python kanji_reading_index.py dict_struct.json [-o dict_struct.kanjiidx] [--workers N]
+"""
+
+import argparse
+import hashlib
+import os
+import struct
+
+from char_classes import ITERATION_MARK, KANJI_CHARS
+from compiled_dict import file_sha256
+from furigana_align import KanjiReadingTable, to_hiragana
+from json_stream import iter_object_items
+
+MAGIC = b"RUBYKIDX"
+FORMAT_VERSION = 1
+KANJI_INDEX_SUFFIX = ".kanjiidx"
+
+# magic, version, count, blob_len, src_sha256
+HEADER = struct.Struct("<8sIII32s")
+
+RECORD_SEP = "\x1e"
+FIELD_SEP = "\x1f"
+
+# Chỉ giữ các reading phổ biến nhất của mỗi kanji (phần đuôi chủ yếu là nhiễu của bước align)
+MAX_READINGS_PER_KANJI = 16
+
+
+def kanji_index_path_for(source_path):
+    """dict_struct.json -> dict_struct.kanjiidx"""
+    return os.path.splitext(source_path)[0] + KANJI_INDEX_SUFFIX
+
+
+class KanjiReadingIndex(KanjiReadingTable):
+    """KanjiReadingTable load từ file .kanjiidx; fingerprint = digest nội dung file (dùng cho cache match)"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            raw = f.read()
+        if len(raw) < HEADER.size:
+            raise ValueError(f"File kanji reading index không hợp lệ: {path}")
+        magic, version, count, blob_len, src_sha = HEADER.unpack_from(raw)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"File kanji reading index không hợp lệ: {path}")
+        if HEADER.size + blob_len != len(raw):
+            raise ValueError(f"File kanji reading index bị cắt cụt: {path}")
+
+        counts = {}
+        blob = raw[HEADER.size:].decode("utf-8")
+        for record in blob.split(RECORD_SEP) if blob else ():
+            fields = record.split(FIELD_SEP)
+            counts[fields[0]] = {fields[i]: int(fields[i + 1]) for i in range(1, len(fields), 2)}
+        if len(counts) != count:
+            raise ValueError(f"File kanji reading index không hợp lệ: {path}")
+
+        super().__init__(counts)
+        self.path = path
+        self.source_sha256 = src_sha
+        self.fingerprint = hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+def write_kanji_reading_index(table, out_path, src_sha=b"\0" * 32):
+    """Ghi KanjiReadingTable ra file tạm rồi os.replace như write_reading_index; trả số kanji"""
+    records = []
+    for kanji in sorted(table.counts):
+        readings = table.readings(kanji)[:MAX_READINGS_PER_KANJI]
+        if readings:
+            fields = [kanji]
+            for reading in readings:
+                fields += [reading, str(table.counts[kanji][reading])]
+            records.append(FIELD_SEP.join(fields))
+    blob = RECORD_SEP.join(records).encode("utf-8")
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(records), len(blob), src_sha))
+        f.write(blob)
+    os.replace(tmp_path, out_path)
+    return len(records)
+
+
+def collect_map_readings(items):
+    """
+    Đếm reading từ map của các entry dict_struct không uncertain (bỏ qua 々).
+    Trả (KanjiReadingTable, số entry dạng chuỗi {surface: reading} chưa có map).
+    """
+    table = KanjiReadingTable()
+    plain = 0
+    for _, value in items:
+        if isinstance(value, str):
+            plain += 1
+            continue
+        if not isinstance(value, dict) or value.get("uncertain"):
+            continue
+        for item in value.get("map") or ():
+            ch, rt = item.get("ch"), item.get("rt")
+            if ch in KANJI_CHARS and ch != ITERATION_MARK and isinstance(rt, str) and rt:
+                table.add(ch, to_hiragana(rt))
+    return table, plain
+
+
+def build_kanji_reading_index(source_path, out_path=None, workers=1):
+    """
+    Dựng index từ dict_struct.json và/hoặc dictionary.json (đọc streaming).
+    Entry dạng chuỗi được tách bằng DP align, dùng bảng đếm từ map làm seed.
+    Trả (KanjiReadingTable, đường dẫn file index).
+    """
+    # import trong hàm: convert_dict_to_struct import module này cho --kanji-index
+    from convert_dict_to_struct import build_reading_table
+
+    if out_path is None:
+        out_path = kanji_index_path_for(source_path)
+    with open(source_path, "r", encoding="utf-8") as f:
+        table, plain = collect_map_readings(iter_object_items(f))
+    if plain:
+        table = build_reading_table(source_path, workers=workers, seed=table)
+    write_kanji_reading_index(table, out_path, file_sha256(source_path))
+    return table, out_path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Dựng index reading theo từng kanji từ dictionary")
+    parser.add_argument("source", help="dict_struct.json hoặc dictionary.json {surface: reading}")
+    parser.add_argument("-o", "--output", default=None, help="File index (mặc định: <source>.kanjiidx)")
+    parser.add_argument("--workers", type=int, default=1, help="Số process tách furigana cho entry dạng chuỗi")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    table, out_path = build_kanji_reading_index(args.source, args.output, max(1, args.workers))
+    print(f"Kanji reading index: {len(table)} kanji -> {out_path} ({os.path.getsize(out_path):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
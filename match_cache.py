@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache kết quả find_kanji_matches_optimized theo (run text, phiên bản dictionary).
+
+- Tầng 1: LRU trong RAM (luôn bật), gắn với đúng object dictionary đang dùng.
+- Tầng 2 (tùy chọn): SQLite trên đĩa, key = (fingerprint dictionary, sha1 text),
+  dùng lại được giữa các lần chạy / giữa các file.
+Giá trị cache: (matches, danh sách kanji không tìm thấy trong text).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+
+# Tăng khi thuật toán match / chuẩn hóa đổi để bỏ cache cũ trên đĩa
+MATCH_CACHE_VERSION = 1
+DEFAULT_MAXSIZE = 50000
+COMMIT_EVERY = 500
+
+
+def dictionary_fingerprint(dictionary):
+    """
+    Fingerprint của dictionary: dùng sha của file nguồn nếu có (CompiledDictionary / SourceDictionary),
+    ngược lại hash toàn bộ nội dung.
+    """
+    fingerprint = getattr(dictionary, "fingerprint", None)
+    if fingerprint is None:
+        h = hashlib.blake2b(digest_size=16)
+        for key in sorted(dictionary):
+            h.update(key.encode("utf-8"))
+            h.update(json.dumps(dictionary[key], ensure_ascii=False, sort_keys=True).encode("utf-8"))
+        fingerprint = h.hexdigest()
+    return f"v{MATCH_CACHE_VERSION}:{fingerprint}"
+
+
+class MatchCache:
+    """LRU trong RAM + SQLite tùy chọn, có bộ đếm hit/miss"""
+
+    def __init__(self, dictionary, db_path=None, maxsize=DEFAULT_MAXSIZE, variant=""):
+        """variant: phần cấu hình khác ngoài dictionary làm đổi kết quả match (vd kanji index fallback)"""
+        self.dictionary = dictionary
+        self.db_path = db_path
+        self.variant = variant
+        self.maxsize = maxsize
+        self._lru = OrderedDict()
+        self._fingerprint = None
+        self._conn = None
+        self._pid = None
+        self._pending = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def hits(self):
+        return self.memory_hits + self.disk_hits
+
+    def _db(self):
+        """Mở kết nối SQLite (mỗi process 1 kết nối; không dùng lại kết nối kế thừa qua fork)"""
+        if self.db_path is None:
+            return None
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.db_path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS matches ("
+                " fingerprint TEXT NOT NULL,"
+                " text_hash TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " PRIMARY KEY (fingerprint, text_hash))"
+            )
+            self._pid = os.getpid()
+            self._pending = 0
+            if self._fingerprint is None:
+                self._fingerprint = dictionary_fingerprint(self.dictionary)
+                if self.variant:
+                    self._fingerprint += f"+{self.variant}"
+        return self._conn
+
+    def _remember(self, text, value):
+        self._lru[text] = value
+        self._lru.move_to_end(text)
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def get(self, text):
+        """Trả (matches, missing) hoặc None"""
+        value = self._lru.get(text)
+        if value is not None:
+            self._lru.move_to_end(text)
+            self.memory_hits += 1
+            return value
+
+        conn = self._db()
+        if conn is not None:
+            row = conn.execute(
+                "SELECT payload FROM matches WHERE fingerprint = ? AND text_hash = ?",
+                (self._fingerprint, _text_hash(text)),
+            ).fetchone()
+            if row is not None:
+                payload = json.loads(row[0])
+                value = ([tuple(m) for m in payload["matches"]], payload["missing"])
+                self._remember(text, value)
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def put(self, text, value):
+        self._remember(text, value)
+        conn = self._db()
+        if conn is not None:
+            matches, missing = value
+            payload = json.dumps({"matches": matches, "missing": list(missing)},
+                                 ensure_ascii=False, separators=(",", ":"))
+            conn.execute(
+                "INSERT OR REPLACE INTO matches (fingerprint, text_hash, payload) VALUES (?, ?, ?)",
+                (self._fingerprint, _text_hash(text), payload),
+            )
+            self._pending += 1
+            if self._pending >= COMMIT_EVERY:
+                self.flush()
+
+    def flush(self):
+        if self._conn is not None and self._pid == os.getpid() and self._pending:
+            self._conn.commit()
+            self._pending = 0
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        text = f"{self.hits} hit / {self.misses} miss ({rate:.1f}%)"
+        if self.db_path is not None:
+            text += f" - RAM {self.memory_hits}, SQLite {self.disk_hits}"
+        return text
+
+
+def _text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
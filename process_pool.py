@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Process pool dùng chung cho các script (download_jmdict, convert_dict_to_struct, add_ruby_new,
+add_ruby_to_xml_moodle_format).
+
+- pool_context(): ưu tiên fork (worker kế thừa dữ liệu đã load ở process cha), không có thì spawn.
+- map_ordered(): func(chunk) trên pool, trả kết quả đúng thứ tự chunk, giới hạn số chunk đang chờ
+  để không phải giữ cả input trong RAM.
+"""
+
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+def pool_context():
+    """Ưu tiên fork, không có thì spawn"""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+def map_ordered(func, chunks, workers, initializer=None, initargs=()):
+    """
+    Gọi func(chunk) cho từng chunk, yield kết quả theo đúng thứ tự chunk.
+    workers <= 1: chạy tại chỗ (initializer không được gọi - caller tự chuẩn bị state).
+    Tối đa workers * 2 chunk đang chờ cùng lúc.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield func(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(),
+                             initializer=initializer, initargs=initargs) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Index nhiều reading cho mỗi từ (surface kanji) tạo từ JMdict, load bằng mmap như compiled_dict.
+
+Mỗi surface giữ mọi reading hợp lệ (kể cả katakana, đã áp re_restr / re_nokanji),
+xếp hạng theo điểm ưu tiên (nhỏ = phổ biến hơn) từ ke_pri/re_pri.
+
+Layout file (little-endian):
+  header       : magic, version, count, độ dài 2 blob, sha256 file JMdict nguồn
+  key_offsets  : (count + 1) x uint32
+  val_offsets  : (count + 1) x uint32
+  key_blob     : surface UTF-8, sắp xếp theo byte
+  val_blob     : các reading của surface, mỗi reading "reading\\x1fscore\\x1fflags", nối bằng \\x1e
+"""
+
+import mmap
+import os
+import struct
+from collections import namedtuple
+from collections.abc import Mapping
+
+from compiled_dict import _u32_array, read_offset_tables, release_offset_tables
+
+MAGIC = b"RUBYRIDX"
+FORMAT_VERSION = 1
+INDEX_SUFFIX = ".readidx"
+
+# magic, version, count, key_blob_len, val_blob_len, src_sha256
+HEADER = struct.Struct("<8sIIII32s")
+
+RECORD_SEP = "\x1e"
+FIELD_SEP = "\x1f"
+
+# common: có tag news1/ichi1/spec1/spec2/gai1; restricted: reading có re_restr;
+# katakana: reading có chữ katakana
+Reading = namedtuple("Reading", "reading score common restricted katakana")
+
+_FLAGS = (("c", "common"), ("r", "restricted"), ("k", "katakana"))
+
+
+def rank_readings(readings):
+    """Xếp reading theo điểm (ổn định theo thứ tự xuất hiện), bỏ reading trùng giữ bản tốt nhất"""
+    ranked = []
+    seen = set()
+    for item in sorted(readings, key=lambda r: r.score):
+        if item.reading not in seen:
+            seen.add(item.reading)
+            ranked.append(item)
+    return ranked
+
+
+def _encode_readings(readings):
+    return RECORD_SEP.join(
+        FIELD_SEP.join((r.reading, str(r.score), "".join(c for c, name in _FLAGS if getattr(r, name))))
+        for r in readings
+    )
+
+
+def _decode_readings(raw):
+    result = []
+    for record in raw.split(RECORD_SEP):
+        reading, score, flags = record.split(FIELD_SEP)
+        result.append(Reading(reading, int(score), "c" in flags, "r" in flags, "k" in flags))
+    return tuple(result)
+
+
+def write_reading_index(index, out_path, src_sha=b"\0" * 32):
+    """
+    index: {surface: [Reading, ...]} (chưa cần xếp hạng - rank_readings được áp ở đây)
+    Ghi ra file tạm rồi os.replace như write_compiled_dictionary.
+    """
+    encoded = sorted(
+        (surface.encode("utf-8"), _encode_readings(rank_readings(readings)).encode("utf-8"))
+        for surface, readings in index.items() if readings
+    )
+    key_offsets, val_offsets = [0], [0]
+    for kb, vb in encoded:
+        key_offsets.append(key_offsets[-1] + len(kb))
+        val_offsets.append(val_offsets[-1] + len(vb))
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(encoded), key_offsets[-1], val_offsets[-1], src_sha)
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(_u32_array(key_offsets))
+        f.write(_u32_array(val_offsets))
+        f.write(b"".join(kb for kb, _ in encoded))
+        f.write(b"".join(vb for _, vb in encoded))
+    os.replace(tmp_path, out_path)
+
+
+class ReadingIndex(Mapping):
+    """Index read-only memory-map: surface -> tuple[Reading] (đã xếp hạng)"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            raw = f.read(HEADER.size)
+        if len(raw) != HEADER.size:
+            raise ValueError(f"File reading index không hợp lệ: {path}")
+        magic, version, count, key_len, val_len, src_sha = HEADER.unpack(raw)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"File reading index không hợp lệ: {path}")
+
+        self.path = path
+        self.source_sha256 = src_sha
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._count = count
+        self._cache = {}
+
+        tables = read_offset_tables(self._mm, HEADER.size, count, 2, key_len + val_len)
+        if tables is None:
+            self._mm.close()
+            self._file.close()
+            raise ValueError(f"File reading index bị cắt cụt: {path}")
+        self._key_offs, self._val_offs = tables
+        self._key_base = HEADER.size + 2 * (count + 1) * 4
+        self._val_base = self._key_base + key_len
+
+    def _key_bytes(self, idx):
+        offs = self._key_offs
+        return self._mm[self._key_base + offs[idx]:self._key_base + offs[idx + 1]]
+
+    def _index_of(self, surface):
+        if not isinstance(surface, str):
+            return -1
+        kb = surface.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            cur = self._key_bytes(mid)
+            if cur < kb:
+                lo = mid + 1
+            elif cur > kb:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def __getitem__(self, surface):
+        readings = self._cache.get(surface)
+        if readings is not None:
+            return readings
+        idx = self._index_of(surface)
+        if idx < 0:
+            raise KeyError(surface)
+        offs = self._val_offs
+        raw = self._mm[self._val_base + offs[idx]:self._val_base + offs[idx + 1]].decode("utf-8")
+        readings = _decode_readings(raw)
+        self._cache[surface] = readings
+        return readings
+
+    def __contains__(self, surface):
+        return surface in self._cache or self._index_of(surface) >= 0
+
+    def __iter__(self):
+        for idx in range(self._count):
+            yield self._key_bytes(idx).decode("utf-8")
+
+    def __len__(self):
+        return self._count
+
+    def readings(self, surface):
+        """Mọi reading của surface (đã xếp hạng), () nếu không có"""
+        try:
+            return self[surface]
+        except KeyError:
+            return ()
+
+    def best_reading(self, surface, allow_katakana=True):
+        """Reading xếp hạng cao nhất (None nếu không có)"""
+        for item in self.readings(surface):
+            if allow_katakana or not item.katakana:
+                return item.reading
+        return None
+
+    def close(self):
+        release_offset_tables((self._key_offs, self._val_offs))
+        self._mm.close()
+        self._file.close()
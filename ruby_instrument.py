@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Đo thời gian theo giai đoạn cho add_ruby_new.py.
+
+- instrument.stage(name): giai đoạn lớn (load dictionary, paragraphs, tables, save...),
+  mỗi lần kết thúc ghi 1 dòng JSON vào sink.
+- @instrument.timed(name): hàm gọi nhiều lần (match, tạo ruby, copy run...), chỉ cộng dồn
+  thời gian + số lần gọi; tổng hợp ở dòng JSON "summary" cuối cùng.
+- instrument.count(name, n): bộ đếm tùy ý.
+Thời gian là inclusive (hàm lồng nhau được tính ở cả 2 tên).
+Khi chưa start() mọi hook gần như không tốn gì.
+"""
+
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+
+class Instrumentation:
+    def __init__(self):
+        self.enabled = False
+        self.sink = None
+        self._reset()
+
+    def _reset(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self._started = None
+
+    def start(self, sink=None):
+        """Bật đo; sink: file object text nhận các dòng JSON (None = chỉ tổng hợp)"""
+        self._reset()
+        self.enabled = True
+        self.sink = sink
+        self._started = time.perf_counter()
+
+    def disable(self):
+        """Tắt (vd. trong worker process kế thừa trạng thái qua fork)"""
+        self.enabled = False
+        self.sink = None
+
+    def stop(self, **fields):
+        """Ghi dòng summary, tắt đo, trả dict tổng hợp"""
+        if not self.enabled:
+            return None
+        summary = self.summary()
+        summary.update(fields)
+        self.emit("summary", **summary)
+        self.disable()
+        return summary
+
+    def summary(self):
+        return {
+            "wall_seconds": round(time.perf_counter() - self._started, 4),
+            "stages": {
+                name: {"seconds": round(self.seconds[name], 4), "calls": self.calls[name]}
+                for name in sorted(self.seconds)
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def emit(self, event, **fields):
+        if self.enabled and self.sink is not None:
+            record = {"event": event, "t": round(time.perf_counter() - self._started, 4)}
+            record.update(fields)
+            self.sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.sink.flush()
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] += n
+
+    @contextmanager
+    def stage(self, name, **fields):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.seconds[name] += seconds
+            self.calls[name] += 1
+            self.emit("stage", stage=name, seconds=round(seconds, 4), **fields)
+
+    def timed(self, name):
+        """Decorator cộng dồn thời gian + số lần gọi của hàm"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.seconds[name] += time.perf_counter() - start
+                    self.calls[name] += 1
+            return wrapper
+        return decorator
+
+
+# Instance dùng chung cho cả pipeline
+instrument = Instrumentation()
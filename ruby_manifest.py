@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Manifest cho chế độ incremental của add_ruby_new.py.
+
+File manifest nằm cạnh file output, lưu kết quả match của lần chạy trước:
+  texts        : sha1(run text) -> {"matches": [...], "missing": [...]}
+  key_digests  : digest entry dictionary (rt + map) của mọi key đã được match
+  char_digests : với mỗi kanji có trong tài liệu, digest của TẬP key trong dictionary chứa kanji đó
+
+Run text được dùng lại khi:
+  - mọi key nó đã match vẫn còn trong dictionary với cùng rt/map (bắt được sửa/xóa từ), và
+  - tập key chứa từng kanji của nó không đổi (bắt được từ mới thêm có thể match trong text).
+Ngược lại text đó được tính lại.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+from kanji_normalize import normalize_for_matching
+
+MANIFEST_VERSION = 1
+
+KANJI_PATTERN = re.compile(r'[\u4e00-\u9fff]')
+
+
+def manifest_path_for(output_path):
+    """out.docx -> out_manifest.json"""
+    return os.path.splitext(output_path)[0] + "_manifest.json"
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def entry_digest(entry):
+    """Digest ngắn của 1 entry dictionary (rt + map)"""
+    raw = json.dumps(entry, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def text_kanji(text):
+    """Các kanji (sau chuẩn hóa radical) xuất hiện trong text"""
+    return set(KANJI_PATTERN.findall(normalize_for_matching(text)[0]))
+
+
+def compute_char_digests(dictionary, chars):
+    """
+    Với mỗi kanji trong chars: XOR digest của mọi key chứa kanji đó.
+    Không phụ thuộc thứ tự key; thêm/xóa 1 key làm đổi digest của mọi kanji trong key.
+    """
+    acc = dict.fromkeys(chars, 0)
+    if not acc:
+        return {}
+    for key in dictionary:
+        hit = acc.keys() & set(key)
+        if not hit:
+            continue
+        h = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+        for ch in hit:
+            acc[ch] ^= h
+    return {ch: format(value, "016x") for ch, value in acc.items()}
+
+
+class RubyManifest:
+    """Đọc manifest cũ, xác định run text nào dùng lại được, và ghi manifest mới"""
+
+    def __init__(self, path, dictionary, texts, variant=""):
+        """variant: cấu hình khác ngoài dictionary làm đổi kết quả match; khác lần trước -> tính lại hết"""
+        self.path = path
+        self.dictionary = dictionary
+        self.variant = variant
+        self._key_digest_cache = {}
+
+        chars = set()
+        for text in texts:
+            chars |= text_kanji(text)
+        self.char_digests = compute_char_digests(dictionary, chars)
+
+        self.old = self._read(path)
+        if self.old is not None and self.old.get("variant", "") != variant:
+            self.old = None
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return None
+        return data
+
+    def _key_digest(self, key):
+        digest = self._key_digest_cache.get(key)
+        if digest is None:
+            entry = self.dictionary.get(key)
+            digest = entry_digest(entry) if entry is not None else ""
+            self._key_digest_cache[key] = digest
+        return digest
+
+    def reusable(self, texts):
+        """{text: (matches, missing)} cho các text có thể dùng lại kết quả cũ"""
+        if self.old is None:
+            return {}
+        old_texts = self.old.get("texts", {})
+        old_keys = self.old.get("key_digests", {})
+        old_chars = self.old.get("char_digests", {})
+
+        result = {}
+        for text in texts:
+            cached = old_texts.get(text_hash(text))
+            if cached is None:
+                continue
+            if any(old_chars.get(ch) != self.char_digests.get(ch) for ch in text_kanji(text)):
+                continue
+            matches = [tuple(m) for m in cached["matches"]]
+            if any(old_keys.get(m[2]) != self._key_digest(m[2]) for m in matches):
+                continue
+            result[text] = (matches, cached["missing"])
+        return result
+
+    def save(self, results):
+        """results: {text: (matches, missing)} của lần chạy này"""
+        texts = {}
+        key_digests = {}
+        for text, (matches, missing) in results.items():
+            texts[text_hash(text)] = {"matches": [list(m) for m in matches], "missing": sorted(missing)}
+            for m in matches:
+                key_digests[m[2]] = self._key_digest(m[2])
+
+        data = {
+            "version": MANIFEST_VERSION,
+            "variant": self.variant,
+            "key_digests": key_digests,
+            "char_digests": self.char_digests,
+            "texts": texts,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
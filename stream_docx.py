@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Engine streaming cho add_ruby_new.py: sửa word/document.xml mà không load object model python-docx.
+
+- Mở .docx (zip), iterparse word/document.xml; mỗi <w:p> (trong body / ô table) được
+  parse lại thành paragraph python-docx riêng lẻ và chạy đúng add_ruby_to_paragraph_preserve_runs.
+- Kết quả được ghi tăng dần (lxml xmlfile) thẳng vào zip đầu ra; phần tử đã ghi bị xóa khỏi cây,
+  nên bộ nhớ chỉ giữ khoảng 1 paragraph tại 1 thời điểm.
+- Các part khác (styles, media, ...) được copy nguyên byte.
+"""
+
+import shutil
+import time
+import zipfile
+
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.oxml.parser import parse_xml
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+import add_ruby_new
+from add_ruby_new import (
+    add_ruby_to_paragraph_preserve_runs,
+    has_japanese,
+    has_section_break,
+    load_dictionary,
+    save_missing_kanji_report,
+)
+
+DOCUMENT_PART = "word/document.xml"
+
+# Các phần tử được "mở" khi stream; paragraph nằm trực tiếp trong body / ô table
+CONTAINER_TAGS = {qn("w:document"), qn("w:body"), qn("w:tbl"), qn("w:tr"), qn("w:tc")}
+TABLE_CELL_TAG = qn("w:tc")
+PARAGRAPH_TAG = qn("w:p")
+
+ZIP64_GUARD = 256 * 1024 * 1024
+
+
+def _rewrite_document_xml(src, dst, dictionary, stats):
+    """Đọc document.xml từ src, ghi bản đã thêm ruby ra dst (cả 2 là file object binary)"""
+    containers = []   # stack (element, context của xf.element) đang mở
+
+    with etree.xmlfile(dst, encoding="UTF-8") as xf:
+        xf.write_declaration(standalone=True)
+
+        for event, elem in etree.iterparse(src, events=("start", "end")):
+            if event == "start":
+                if elem.tag in CONTAINER_TAGS:
+                    ctx = xf.element(elem.tag, attrib=dict(elem.attrib), nsmap=elem.nsmap)
+                    ctx.__enter__()
+                    containers.append((elem, ctx))
+                continue
+
+            parent = elem.getparent()
+
+            if containers and elem is containers[-1][0]:
+                # đóng container
+                containers.pop()[1].__exit__(None, None, None)
+            elif containers and parent is containers[-1][0]:
+                if elem.tag == PARAGRAPH_TAG:
+                    _write_paragraph(xf, elem, parent.tag == TABLE_CELL_TAG, dictionary, stats)
+                else:
+                    xf.write(elem)
+            else:
+                # phần tử con bên trong 1 phần tử khác -> được ghi cùng phần tử cha
+                continue
+
+            # giải phóng phần tử đã ghi
+            elem.clear()
+            if parent is not None:
+                while elem.getprevious() is not None:
+                    del parent[0]
+
+
+def _write_paragraph(xf, elem, in_table, dictionary, stats):
+    """Chạy logic thêm ruby của add_ruby_new trên 1 paragraph rồi ghi ra"""
+    p = parse_xml(etree.tostring(elem))
+    paragraph = Paragraph(p, None)
+
+    stats["total_paragraphs"] += 1
+    section_break = not in_table and has_section_break(paragraph)
+    if section_break:
+        stats["section_breaks_removed"] += 1
+
+    if paragraph.text.strip() and has_japanese(paragraph.text):
+        stats["japanese_paragraphs"] += 1
+        if add_ruby_to_paragraph_preserve_runs(paragraph, dictionary):
+            stats["processed_paragraphs"] += 1
+    elif not in_table:
+        add_ruby_to_paragraph_preserve_runs(paragraph, dictionary)
+
+    xf.write(p)
+
+    # Thêm 2 dòng trống sau paragraph có section break
+    if section_break:
+        xf.write(OxmlElement("w:p"))
+        xf.write(OxmlElement("w:p"))
+
+
+def process_word_document_streaming(input_path, output_path, dictionary_path, dictionary=None):
+    """
+    Xử lý file Word theo kiểu streaming (bộ nhớ ~ 1 paragraph).
+    Trả dict thống kê giống process_word_document, hoặc None nếu lỗi.
+    """
+    add_ruby_new.missing_kanji.clear()
+
+    print("=== Xử lý file Word (streaming engine) ===")
+    start_time = time.time()
+
+    if dictionary is None:
+        dictionary = load_dictionary(dictionary_path)
+    if not dictionary:
+        print("Dictionary trống hoặc không đọc được.")
+        return None
+
+    match_cache = add_ruby_new.get_match_cache(dictionary)
+    match_cache.reset_stats()
+
+    print(f"Đang xử lý file: {input_path}")
+    stats = {
+        "total_paragraphs": 0,
+        "japanese_paragraphs": 0,
+        "processed_paragraphs": 0,
+        "section_breaks_removed": 0,
+    }
+
+    try:
+        with zipfile.ZipFile(input_path) as zin, \
+                zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                # document.xml sẽ lớn hơn sau khi thêm ruby -> bật zip64 sớm nếu part gốc đã lớn
+                force_zip64 = info.filename == DOCUMENT_PART and info.file_size > ZIP64_GUARD
+                with zin.open(info) as src, zout.open(info, "w", force_zip64=force_zip64) as dst:
+                    if info.filename == DOCUMENT_PART:
+                        _rewrite_document_xml(src, dst, dictionary, stats)
+                    else:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+        save_missing_kanji_report(add_ruby_new.missing_kanji, output_path)
+        match_cache.flush()
+        total_time = time.time() - start_time
+
+        print("\n=== KẾT QUẢ XỬ LÝ ===")
+        print(f"File output: {output_path}")
+        print(f"Tổng số paragraph: {stats['total_paragraphs']}")
+        print(f"Paragraph có tiếng Nhật: {stats['japanese_paragraphs']}")
+        print(f"Paragraph đã thêm ruby: {stats['processed_paragraphs']}")
+        print(f"Section breaks đã xóa: {stats['section_breaks_removed']}")
+        print(f"Từ Kanji không tìm thấy: {len(add_ruby_new.missing_kanji)}")
+        print(f"Cache match: {match_cache.summary()}")
+        print(f"Thời gian xử lý: {total_time:.2f} giây")
+
+        stats.update({
+            "input": input_path,
+            "output": output_path,
+            "missing_kanji": sorted(add_ruby_new.missing_kanji),
+            "match_cache_hits": match_cache.hits,
+            "match_cache_misses": match_cache.misses,
+            "time": round(total_time, 3),
+            "save_time": 0.0,
+        })
+        return stats
+
+    except Exception as e:
+        print(f"Lỗi khi xử lý file Word (streaming): {e}")
+        import traceback
+        traceback.print_exc()
+        return None
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+
+import bench_pipeline
+
+
+def test_bench_pipeline_writes_baseline():
+    """Benchmark nhỏ: ghi JSON đủ stage cho mọi engine, so sánh với chính nó không báo regression"""
+    print("=== TEST BENCHMARK PIPELINE ===")
+    with tempfile.TemporaryDirectory() as folder:
+        output = os.path.join(folder, "bench.json")
+        args = ["--paragraphs", "20", "--dict-size", "300", "--output", output]
+        assert bench_pipeline.main(args) == 0
+
+        with open(output, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        assert set(report["results"]) == set(bench_pipeline.ENGINES)
+        for name, data in report["results"].items():
+            assert "load" in data["stages"] and "match" in data["stages"], name
+            assert all(stage["seconds"] >= 0 for stage in data["stages"].values())
+
+        assert bench_pipeline.compare_results(report, report) == []
+        print("✓ Baseline JSON hợp lệ")
+
+
+def bench_noop(corpus):
+    """Engine giả không cấp phát gì"""
+    return {}
+
+
+def test_peak_rss_excludes_parent_memory():
+    """Process cha đang giữ ~200 MB: engine không cấp phát gì vẫn phải báo peak RSS ~0"""
+    ballast = bytearray(200 * 1024 * 1024)
+    try:
+        results = bench_pipeline.run_benchmarks({}, ["noop"], {"noop": bench_noop})
+    finally:
+        del ballast
+    peak = results["noop"]["peak_rss_mb"]
+    if peak is not None:
+        assert 0 <= peak < 20, peak
+        assert results["noop"]["base_rss_mb"] < 150 or bench_pipeline._proc_status_kb("VmHWM") is None
+    print(f"✓ peak RSS engine rỗng: {peak} MB")
+
+
+if __name__ == "__main__":
+    test_bench_pipeline_writes_baseline()
+    test_peak_rss_excludes_parent_memory()
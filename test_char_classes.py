@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+import re
+
+import char_classes
+import convert_dict_to_struct as converter
+
+# cách cũ: 1 lần regex.fullmatch cho mỗi ký tự
+LEGACY_KANJI_RE = re.compile(r'[\u4e00-\u9fff々]')
+LEGACY_KANA_RE = re.compile(r'[\u3040-\u309f\u30a0-\u30ffー]')
+
+
+def legacy_is_kanji(ch):
+    return bool(LEGACY_KANJI_RE.fullmatch(ch or ""))
+
+
+def legacy_is_kana(ch):
+    return bool(LEGACY_KANA_RE.fullmatch(ch or ""))
+
+
+def legacy_extract_kana_runs(surface):
+    runs = []
+    i = 0
+    n = len(surface)
+    while i < n:
+        ch = surface[i]
+        if legacy_is_kana(ch) and not legacy_is_kanji(ch):
+            j = i + 1
+            while j < n and legacy_is_kana(surface[j]) and not legacy_is_kanji(surface[j]):
+                j += 1
+            runs.append((i, surface[i:j]))
+            i = j
+        else:
+            i += 1
+    return runs
+
+
+def legacy_contains_kanji(text):
+    return any(legacy_is_kanji(ch) for ch in text)
+
+
+def synthetic_dictionary(entries, seed=0):
+    """surface: 1-4 kanji xen okurigana/katakana (có 々), reading: hiragana"""
+    rng = random.Random(seed)
+    hira = [chr(c) for c in range(0x3041, 0x3094)]
+    kata = [chr(c) for c in range(0x30a1, 0x30f4)]
+    result = {}
+    while len(result) < entries:
+        parts = []
+        for _ in range(rng.randint(1, 4)):
+            parts.append(chr(0x4e00 + rng.randrange(3000)))
+            roll = rng.random()
+            if roll < 0.1:
+                parts.append("々")
+            elif roll < 0.5:
+                parts.append("".join(rng.choice(hira) for _ in range(rng.randint(1, 3))))
+            elif roll < 0.6:
+                parts.append(rng.choice(kata) + "ー")
+        surface = "".join(parts)
+        result[surface] = "".join(rng.choice(hira) for _ in range(rng.randint(2, 2 * len(surface))))
+    return result
+
+
+def test_char_sets_match_regex_over_bmp():
+    """frozenset trong char_classes phải khớp đúng regex cũ trên toàn bộ BMP"""
+    print("=== TEST CHAR CLASSES ===")
+    fullwidth_re = re.compile(r'[\uff10-\uff19]')
+    for code in range(0x10000):
+        ch = chr(code)
+        assert char_classes.is_kanji(ch) == legacy_is_kanji(ch), hex(code)
+        assert char_classes.is_kana(ch) == legacy_is_kana(ch), hex(code)
+        assert (ch in char_classes.FULLWIDTH_DIGITS) == bool(fullwidth_re.fullmatch(ch)), hex(code)
+    assert not char_classes.is_kanji("") and not char_classes.is_kanji("問題")
+
+    assert char_classes.kana_runs("取り扱い説明書") == [(1, "り"), (3, "い")]
+    assert list(char_classes.iter_runs("お茶々とコーヒーA")) == [
+        ("kana", 0, "お"), ("kanji", 1, "茶々"), ("kana", 3, "とコーヒー"),
+    ]
+    print("✓ is_kanji / is_kana / kana_runs khớp regex cũ")
+
+
+def test_converter_classes_match_legacy():
+    """
+    Heuristic anchor (infer_segments + segments_to_map) chỉ phân loại ký tự qua extract_kana_runs,
+    contains_kanji và `ch in KANJI_CHARS`: cả 3 phải cho kết quả giống bản fullmatch từng ký tự
+    """
+    surfaces = list(synthetic_dictionary(2000)) + ["取り扱い説明書", "お茶々とコーヒーA", ""]
+    for surface in surfaces:
+        assert converter.extract_kana_runs(surface) == legacy_extract_kana_runs(surface), surface
+        for i in range(len(surface)):
+            assert (surface[i] in converter.KANJI_CHARS) == legacy_is_kanji(surface[i]), surface
+            for j in range(i + 1, len(surface) + 1):
+                region = surface[i:j]
+                assert converter.contains_kanji(region) == legacy_contains_kanji(region), region
+    print(f"✓ {len(surfaces)} surface giống hệt cách cũ")
+
+
+if __name__ == "__main__":
+    test_char_sets_match_regex_over_bmp()
+    test_converter_classes_match_legacy()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+
+from compiled_dict import HEADER, CompiledDictionary, compiled_path_for, is_compiled_fresh, read_header
+import add_ruby_new
+
+SAMPLE = {
+    "品質管理": {"rt": "ひんしつかんり", "map": [{"i": 0, "ch": "品", "rt": "ひん"}]},
+    "日本": "にほん",
+    "取り組み": {"rt": "とりくみ", "segments": [{"s": [0, 1], "rt": "と"}, {"s": [2, 3], "rt": "く"}]},
+    "abc漢字": "かんじ",   # bị lọc vì có chữ Latin
+    "ひらがな": "ひらがな",  # bị lọc vì không có kanji
+}
+
+
+def write_sample(folder):
+    path = os.path.join(folder, "dict_struct.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(SAMPLE, f, ensure_ascii=False)
+    return path
+
+
+def test_compiled_matches_json():
+    """Bản compiled phải trả về đúng các entry như khi parse JSON"""
+    print("=== TEST COMPILED DICTIONARY ===")
+    with tempfile.TemporaryDirectory() as folder:
+        path = write_sample(folder)
+        expected = add_ruby_new._load_dictionary_json(path)
+
+        first = add_ruby_new.load_dictionary(path)      # build + ghi .rubydict
+        assert dict(first) == expected
+        assert os.path.exists(compiled_path_for(path))
+
+        compiled = add_ruby_new.load_dictionary(path)   # lần 2: mmap
+        assert isinstance(compiled, CompiledDictionary)
+        assert len(compiled) == len(expected)
+        for key, val in expected.items():
+            assert key in compiled
+            assert compiled[key] == val
+        assert "abc漢字" not in compiled
+        assert "存在しない" not in compiled
+        assert sorted(compiled) == sorted(expected)
+        compiled.close()
+        print("✓ entries khớp với JSON")
+
+
+def test_rebuild_when_source_changes():
+    """Sửa file JSON -> file compiled bị coi là cũ và được build lại"""
+    with tempfile.TemporaryDirectory() as folder:
+        path = write_sample(folder)
+        add_ruby_new.load_dictionary(path)
+        compiled_path = compiled_path_for(path)
+        assert is_compiled_fresh(compiled_path, path)
+
+        # chỉ đổi mtime, nội dung giữ nguyên -> hash vẫn khớp, mtime mới được ghi lại vào header
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        assert is_compiled_fresh(compiled_path, path)
+        assert read_header(compiled_path)[7] == st.st_mtime_ns + 10 ** 9
+
+        data = dict(SAMPLE, 学校="がっこう")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        assert not is_compiled_fresh(compiled_path, path)
+
+        add_ruby_new.load_dictionary(path)
+        compiled = CompiledDictionary(compiled_path)
+        assert compiled["学校"] == {"rt": "がっこう", "map": None}
+        compiled.close()
+
+
+def test_rebuild_when_compiled_truncated():
+    """File .rubydict bị cắt cụt (cuối blob hoặc giữa bảng offset) -> ValueError, load_dictionary compile lại"""
+    with tempfile.TemporaryDirectory() as folder:
+        path = write_sample(folder)
+        expected = add_ruby_new._load_dictionary_json(path)
+        add_ruby_new.load_dictionary(path)
+        compiled_path = compiled_path_for(path)
+        full_size = os.path.getsize(compiled_path)
+
+        # HEADER.size + 6: giữa bảng key_offsets
+        for size in (full_size - 1, HEADER.size + 6):
+            with open(compiled_path, "r+b") as f:
+                f.truncate(size)
+            try:
+                CompiledDictionary(compiled_path)
+                assert False, "file cắt cụt phải bị từ chối"
+            except ValueError:
+                pass
+            assert dict(add_ruby_new.load_dictionary(path)) == expected
+            assert os.path.getsize(compiled_path) == full_size
+    print("✓ file compiled hỏng được compile lại")
+
+
+if __name__ == "__main__":
+    test_compiled_matches_json()
+    test_rebuild_when_source_changes()
+    test_rebuild_when_compiled_truncated()
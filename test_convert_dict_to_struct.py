@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import os
+import tempfile
+
+import convert_dict_to_struct as converter
+from json_stream import iter_object_items
+
+SOURCE = {
+    "問題": "もんだい",
+    "食べ物": "たべもの",
+    "お茶": "おちゃ",
+    "取り扱い説明書": "とりあつかいせつめいしょ",
+    "ひらがな": "ひらがな",
+    "空": "",
+    "東京都": "とうきょうと",
+    "見る": "みる",
+    "\"引用\"": "いんよう",
+    "一日": "いちにち",
+}
+
+
+def test_streaming_convert_matches_full_dump():
+    """convert streaming + 2 worker phải ghi đúng như dựng cả dict rồi json.dumps(indent=2)"""
+    print("=== TEST CONVERT DICT TO STRUCT ===")
+    source = dict(SOURCE)
+    for n in range(200):
+        source[f"第{n}問"] = f"だい{n}もん"
+    with tempfile.TemporaryDirectory() as folder:
+        in_path = os.path.join(folder, "dictionary.json")
+        with open(in_path, "w", encoding="utf-8") as f:
+            json.dump(source, f, ensure_ascii=False, indent=2)
+
+        table = converter.build_reading_table(in_path, chunk_entries=7)
+        assert table.counts == converter.build_reading_table(in_path, workers=2, chunk_entries=7).counts
+        expected = {}
+        for surface, reading in source.items():
+            entry = converter.convert_entry(surface, reading, table)
+            if entry is not None:
+                expected[surface] = entry
+        expected_text = json.dumps(expected, ensure_ascii=False, indent=2)
+
+        for workers in (1, 2):
+            out_path = os.path.join(folder, f"dict_struct_{workers}.json")
+            converter.convert(in_path, out_path, workers=workers, chunk_entries=7)
+            with open(out_path, "r", encoding="utf-8") as f:
+                assert f.read() == expected_text
+
+    assert "ひらがな" not in expected and "空" not in expected
+    assert expected["問題"]["map"] == [{"i": 0, "ch": "問", "rt": "もん"}, {"i": 1, "ch": "題", "rt": "だい"}]
+    # reader streaming đọc lại đúng, kể cả khi chunk cắt ngang giá trị
+    assert list(iter_object_items(io.StringIO(expected_text), chunk_size=5)) == list(expected.items())
+    print(f"✓ {len(expected)} entry, giống json.dumps toàn bộ")
+
+
+if __name__ == "__main__":
+    test_streaming_convert_matches_full_dump()
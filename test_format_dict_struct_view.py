@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+
+import format_dict_struct_view as view
+
+SOURCE = {
+    "本": {"rt": "ほん", "map": [{"i": 0, "ch": "本", "rt": "ほん"}], "uncertain": False},
+    "問題": {"rt": "もんだい", "segments": [{"s": [0, 2], "rt": "もんだい"}],
+           "map": [{"i": 0, "ch": "問", "rt": "もん"}, {"i": 1, "ch": "題", "rt": "だい"}]},
+    "ひらがな": "ひらがな",
+    "\"引用\"": {"rt": "いんよう"},
+}
+
+EXPECTED = """{
+  "本": {"rt":"ほん","map":[{"i":0,"ch":"本","rt":"ほん"}]},
+  "問題": {
+    "rt": "もんだい",
+    "map": [
+      {"i":0,"ch":"問","rt":"もん"},
+      {"i":1,"ch":"題","rt":"だい"}
+    ]
+  },
+  "ひらがな": "ひらがな",
+  "\\"引用\\"": {"rt":"いんよう","map":null}
+}
+"""
+
+
+def test_streaming_view_matches_layout():
+    """format_file đọc streaming phải ra đúng layout (inline / nhiều dòng, dấu phẩy cuối) như write_custom(dict)"""
+    print("=== TEST FORMAT DICT STRUCT VIEW ===")
+    with tempfile.TemporaryDirectory() as folder:
+        in_path = os.path.join(folder, "dict_struct.json")
+        out_path = os.path.join(folder, "dict_struct.view.json")
+        with open(in_path, "w", encoding="utf-8") as f:
+            json.dump(SOURCE, f, ensure_ascii=False, indent=2)
+
+        view.format_file(in_path, out_path)
+        with open(out_path, "r", encoding="utf-8") as f:
+            assert f.read() == EXPECTED
+
+        view.write_custom(SOURCE, out_path)
+        with open(out_path, "r", encoding="utf-8") as f:
+            assert f.read() == EXPECTED
+
+        view.write_custom(iter(()), out_path)
+        with open(out_path, "r", encoding="utf-8") as f:
+            assert f.read() == "{\n}\n"
+    print("✓ output streaming giống hệt bản load cả dict")
+
+
+if __name__ == "__main__":
+    test_streaming_view_matches_layout()
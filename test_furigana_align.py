@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import convert_dict_to_struct as converter
+from furigana_align import KanjiReadingTable, align_reading, collect_kanji_readings, segment_entry
+
+LEXICON = {
+    "問題": "もんだい", "問": "とい", "題": "だい", "食べ物": "たべもの", "物": "もの",
+    "取り扱い説明書": "とりあつかいせつめいしょ", "説明": "せつめい", "説く": "とく",
+    "明るい": "あかるい", "書く": "かく", "辞書": "じしょ", "図書館": "としょかん",
+    "学校": "がっこう", "学ぶ": "まなぶ", "学生": "がくせい", "生きる": "いきる",
+    "人々": "ひとびと", "人": "ひと", "時々": "ときどき", "一ヶ月": "いっかげつ",
+    "本棚": "ほんだな", "本": "ほん", "棚": "たな", "日本語": "にほんご", "お茶": "おちゃ",
+    "国語": "こくご", "国": "くに", "持って": "もって", "盛ん": "さかん",
+    "コーヒー店": "コーヒーてん", "承る": "うけたまわる", "東京都": "とうきょうと",
+    "大人": "おとな", "明日": "あした",
+}
+
+
+def build_table(items):
+    table = KanjiReadingTable(collect_kanji_readings(items))
+    return KanjiReadingTable(collect_kanji_readings(items, table))
+
+
+def readings_of(entry):
+    return [(m["ch"], m["rt"]) for m in entry["map"]]
+
+
+def test_alignment_maps_and_uncertainty():
+    """DP align: map đúng từng kanji (biến âm, 々, okurigana), ít uncertain hơn heuristic anchor cũ"""
+    print("=== TEST FURIGANA ALIGN ===")
+    items = list(LEXICON.items())
+    table = build_table(items)
+    entries = {surface: converter.convert_entry(surface, reading, table) for surface, reading in items}
+
+    assert readings_of(entries["学生"]) == [("学", "がく"), ("生", "せい")]
+    assert readings_of(entries["学校"]) == [("学", "がっ"), ("校", "こう")]
+    assert readings_of(entries["本棚"]) == [("本", "ほん"), ("棚", "だな")]
+    assert readings_of(entries["人々"]) == [("人", "ひと"), ("々", "びと")]
+    assert readings_of(entries["図書館"]) == [("図", "と"), ("書", "しょ"), ("館", "かん")]
+    assert readings_of(entries["取り扱い説明書"]) == [
+        ("取", "と"), ("扱", "あつか"), ("説", "せつ"), ("明", "めい"), ("書", "しょ"),
+    ]
+    assert readings_of(entries["持って"]) == [("持", "も")]
+    assert readings_of(entries["コーヒー店"]) == [("店", "てん")]
+    assert entries["図書館"]["segments"] == [{"s": [0, 3], "rt": "としょかん"}]
+    # jukujikun không chia được theo kanji -> uncertain
+    assert entries["大人"]["uncertain"] and entries["明日"]["uncertain"]
+
+    new_uncertain = sum(entry["uncertain"] for entry in entries.values())
+    old_uncertain = 0
+    for surface, reading in items:
+        segments, skipped_any = converter.infer_segments(surface, reading)
+        _, uncertain = converter.segments_to_map(surface, segments, reading)
+        old_uncertain += bool(skipped_any or uncertain)
+    assert new_uncertain < old_uncertain
+    print(f"✓ uncertain: {old_uncertain} -> {new_uncertain} / {len(items)} entry")
+
+
+def test_alignment_skips_and_bounds():
+    """Reading không khớp kana -> bỏ qua có đánh dấu; entry quá lớn -> None (convert dùng fallback)"""
+    alignment = align_reading("食べ物", "たくもの")
+    assert alignment.skipped
+    segments, mapping, uncertain = segment_entry("食べ物", "たくもの")
+    assert uncertain and [m["ch"] for m in mapping] == ["食", "物"]
+
+    assert segment_entry("漢" * 70, "かん" * 70) is None
+    entry = converter.convert_entry("漢" * 70, "かん" * 70)
+    assert entry["rt"] == "かん" * 70 and entry["uncertain"]
+    print("✓ bỏ qua / fallback")
+
+
+if __name__ == "__main__":
+    test_alignment_maps_and_uncertainty()
+    test_alignment_skips_and_bounds()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+
+import add_ruby_new
+from ruby_manifest import manifest_path_for
+from test_parallel_annotation import DICTIONARY, build_sample, read_document_xml
+
+
+def write_dictionary(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def test_incremental_reuses_unchanged_texts():
+    """Lần 2 dùng lại toàn bộ; thêm/sửa từ chỉ tính lại text bị ảnh hưởng, output vẫn như chạy đầy đủ"""
+    print("=== TEST INCREMENTAL ===")
+    with tempfile.TemporaryDirectory() as folder:
+        input_path, dictionary_path = build_sample(folder)
+        out = os.path.join(folder, "out.docx")
+        full_out = os.path.join(folder, "full.docx")
+
+        first = add_ruby_new.process_word_document(input_path, out, dictionary_path, incremental=True)
+        assert first["reused_run_texts"] == 0
+        assert os.path.exists(manifest_path_for(out))
+
+        second = add_ruby_new.process_word_document(input_path, out, dictionary_path, incremental=True)
+        assert second["reused_run_texts"] > 0
+        total_texts = second["reused_run_texts"]
+
+        # thêm từ mới "説明" + sửa reading của "生活"
+        write_dictionary(dictionary_path, dict(DICTIONARY, 説明="せつめい", 生活="せいかつ!"))
+        third = add_ruby_new.process_word_document(input_path, out, dictionary_path, incremental=True)
+        assert 0 < third["reused_run_texts"] < total_texts
+
+        add_ruby_new.process_word_document(input_path, full_out, dictionary_path)
+        assert read_document_xml(out) == read_document_xml(full_out)
+        assert "せつめい".encode() in read_document_xml(out)
+        print("✓ Incremental khớp với chạy đầy đủ")
+
+
+if __name__ == "__main__":
+    test_incremental_reuses_unchanged_texts()
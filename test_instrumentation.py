@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import os
+import tempfile
+
+import add_ruby_new
+from ruby_instrument import instrument
+from test_parallel_annotation import build_sample
+
+
+def test_stage_timings_json_lines():
+    """Bật instrument: mỗi stage lớn 1 dòng JSON, summary có hàm cộng dồn + bộ đếm"""
+    print("=== TEST INSTRUMENTATION ===")
+    with tempfile.TemporaryDirectory() as folder:
+        input_path, dictionary_path = build_sample(folder)
+        sink = io.StringIO()
+
+        instrument.start(sink)
+        try:
+            stats = add_ruby_new.process_word_document(input_path, os.path.join(folder, "out.docx"),
+                                                       dictionary_path)
+        finally:
+            summary = instrument.stop()
+
+        records = [json.loads(line) for line in sink.getvalue().splitlines()]
+        stages = [r["stage"] for r in records if r["event"] == "stage"]
+        assert stages == ["dictionary_load", "document_open", "body_paragraphs", "tables", "save", "reports"]
+        assert records[-1]["event"] == "summary"
+
+        assert summary["stages"]["ruby_element"]["calls"] > 0
+        assert summary["stages"]["run_copy"]["calls"] > 0
+        assert summary["counters"]["japanese_paragraphs"] == stats["japanese_paragraphs"]
+        assert not instrument.enabled
+        print("✓ Timing JSON lines đúng")
+
+
+if __name__ == "__main__":
+    test_stage_timings_json_lines()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import download_jmdict
+
+PAYLOAD = os.urandom(300 * 1024)
+PAYLOAD_SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+ETAG = '"jmdict-v1"'
+
+
+class MockJMdictHandler(BaseHTTPRequestHandler):
+    """Server giả lập: ETag/If-None-Match, Range/If-Range; cut_after > 0 thì ngắt kết nối giữa chừng"""
+    requests_seen = []
+    cut_after = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        type(self).requests_seen.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        offset = 0
+        if self.headers.get("Range") and self.headers.get("If-Range") == ETAG:
+            offset = int(self.headers["Range"][len("bytes="):].rstrip("-"))
+        body = PAYLOAD[offset:]
+        self.send_response(206 if offset else 200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if type(self).cut_after:
+            self.wfile.write(body[:type(self).cut_after])
+            type(self).cut_after = 0
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+def test_resume_and_conditional_get_with_mock_server():
+    """Tải bị ngắt -> tải tiếp bằng Range; lần sau server trả 304 -> không tải lại"""
+    print("=== TEST JMDICT DOWNLOAD (mock server) ===")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockJMdictHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/JMdict_e.gz"
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            dest = os.path.join(folder, "JMdict_e.gz")
+            MockJMdictHandler.requests_seen = []
+
+            MockJMdictHandler.cut_after = 100 * 1024
+            assert not download_jmdict.download_jmdict(url, dest, timeout=10)
+            assert not os.path.exists(dest)
+            partial_size = os.path.getsize(dest + ".part")
+            assert 0 < partial_size <= 100 * 1024
+
+            assert download_jmdict.download_jmdict(url, dest, expected_sha256=PAYLOAD_SHA256, timeout=10)
+            with open(dest, "rb") as f:
+                assert f.read() == PAYLOAD
+            assert not os.path.exists(dest + ".part")
+            assert MockJMdictHandler.requests_seen[1]["Range"] == f"bytes={partial_size}-"
+
+            assert download_jmdict.download_jmdict(url, dest, timeout=10)
+            assert MockJMdictHandler.requests_seen[2]["If-None-Match"] == ETAG
+            assert len(MockJMdictHandler.requests_seen) == 3
+    finally:
+        server.shutdown()
+        server.server_close()
+    print("✓ Resume + 304 đúng")
+
+
+def test_local_file_download_and_checksum():
+    """Nguồn là file local (offline): tải, bỏ qua khi không đổi, từ chối khi SHA-256 sai"""
+    print("=== TEST JMDICT DOWNLOAD (local file) ===")
+    with tempfile.TemporaryDirectory() as folder:
+        source = os.path.join(folder, "mirror.gz")
+        with open(source, "wb") as f:
+            f.write(PAYLOAD)
+        dest = os.path.join(folder, "JMdict_e.gz")
+
+        assert download_jmdict.download_jmdict("file://" + source, dest)
+        mtime = os.stat(dest).st_mtime_ns
+        assert download_jmdict.download_jmdict("file://" + source, dest)
+        assert os.stat(dest).st_mtime_ns == mtime  # 304: không ghi lại
+
+        # file local bị hỏng -> 304 nhưng sha256 lệch -> tải lại
+        with open(dest, "r+b") as f:
+            f.write(b"broken")
+        assert download_jmdict.download_jmdict("file://" + source, dest)
+        with open(dest, "rb") as f:
+            assert f.read() == PAYLOAD
+
+        other = os.path.join(folder, "other.gz")
+        assert not download_jmdict.download_jmdict(source, other, expected_sha256="0" * 64)
+        assert not os.path.exists(other) and not os.path.exists(other + ".part")
+    print("✓ Local file + kiểm tra SHA-256 đúng")
+
+
+if __name__ == "__main__":
+    test_resume_and_conditional_get_with_mock_server()
+    test_local_file_download_and_checksum()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import gzip
+import os
+import tempfile
+
+import add_ruby_new
+import download_jmdict
+from reading_index import HEADER, ReadingIndex
+
+# Phần đầu giống JMdict_e thật: DTD nội bộ khai báo entity cho pos/misc/...
+JMDICT_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE JMdict [
+<!ELEMENT JMdict (entry*)>
+<!ELEMENT entry (ent_seq, k_ele*, r_ele+, sense+)>
+<!ENTITY n "noun (common) (futsuumeishi)">
+<!ENTITY vs "noun or participle which takes the aux. verb suru">
+<!ENTITY uk "word usually written using kana alone">
+<!ENTITY news1 "appears in the news">
+<!ENTITY oK "word containing out-dated kanji or kanji usage">
+]>
+<!-- JMdict created: 2025-01-01 -->
+<JMdict>
+"""
+
+# (kebs, rebs): có entry không kanji, reading katakana, nhiều keb, keb trùng ở entry sau
+SAMPLE_ENTRIES = [
+    (["問題"], ["もんだい"]),
+    (["生産", "生產"], ["せいさん"]),
+    ([], ["ああ"]),
+    (["管理"], ["カンリ", "かんり"]),
+    (["コーヒー豆"], ["コーヒーまめ"]),
+    (["問題"], ["もんだいテン"]),
+    (["計画", "計劃"], ["けいかく", "けいくわく"]),
+    (["生産"], ["しょうさん"]),
+]
+
+
+# Entry đầy đủ: re_restr, re_nokanji, ke_pri/re_pri, ke_inf, reading katakana, 2 entry cùng keb
+FULL_ENTRIES_XML = """<entry><ent_seq>2000001</ent_seq>
+<k_ele><keb>市場</keb><ke_pri>news1</ke_pri><ke_pri>nf02</ke_pri></k_ele>
+<r_ele><reb>しじょう</reb><re_pri>news1</re_pri><re_pri>nf02</re_pri></r_ele>
+<r_ele><reb>いちば</reb><re_pri>ichi1</re_pri></r_ele>
+<sense><pos>&n;</pos></sense></entry>
+<entry><ent_seq>2000002</ent_seq>
+<k_ele><keb>日本</keb><ke_pri>spec1</ke_pri></k_ele>
+<k_ele><keb>日夲</keb><ke_inf>&oK;</ke_inf></k_ele>
+<r_ele><reb>にほん</reb><re_pri>spec1</re_pri></r_ele>
+<r_ele><reb>にっぽん</reb><re_restr>日本</re_restr></r_ele>
+<r_ele><reb>ジャパン</reb><re_nokanji/></r_ele>
+<sense><pos>&n;</pos></sense></entry>
+<entry><ent_seq>2000003</ent_seq>
+<k_ele><keb>頁</keb></k_ele>
+<r_ele><reb>ページ</reb><re_pri>gai1</re_pri></r_ele>
+<r_ele><reb>けつ</reb></r_ele>
+<sense><pos>&n;</pos></sense></entry>
+<entry><ent_seq>2000004</ent_seq>
+<k_ele><keb>市場</keb></k_ele>
+<r_ele><reb>いちば</reb></r_ele>
+<r_ele><reb>いちじょう</reb></r_ele>
+<sense><pos>&n;</pos></sense></entry>
+"""
+
+
+def write_sample_jmdict(path, entries=SAMPLE_ENTRIES, repeat=1, extra_xml=""):
+    """Ghi file JMdict_e.gz giả lập (repeat: nhân số entry để đo tốc độ; extra_xml: entry viết tay)"""
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(JMDICT_HEADER)
+        seq = 1000000
+        for _ in range(repeat):
+            for kebs, rebs in entries:
+                seq += 1
+                f.write(f"<entry>\n<ent_seq>{seq}</ent_seq>\n")
+                for keb in kebs:
+                    f.write(f"<k_ele>\n<keb>{keb}</keb>\n<ke_pri>news1</ke_pri>\n</k_ele>\n")
+                for reb in rebs:
+                    f.write(f"<r_ele>\n<reb>{reb}</reb>\n</r_ele>\n")
+                f.write("<sense>\n<pos>&n;</pos>\n<pos>&vs;</pos>\n<misc>&uk;</misc>\n"
+                        "<gloss>sample &amp; gloss</gloss>\n</sense>\n</entry>\n")
+        f.write(extra_xml)
+        f.write("</JMdict>\n")
+
+
+def legacy_parse(path):
+    """Cách cũ: ghép dòng thành chuỗi từng entry rồi parse_single_entry_fixed"""
+    kanji_dict = {}
+    current_entry = ""
+    in_entry = False
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if "<entry>" in line:
+                in_entry = True
+                current_entry = line
+            elif "</entry>" in line:
+                current_entry += line
+                in_entry = False
+                kanji_dict.update(download_jmdict.parse_single_entry_fixed(current_entry))
+            elif in_entry:
+                current_entry += line
+    return kanji_dict
+
+
+def test_iterparse_matches_legacy_parser():
+    """iterparse (entity được resolve) phải cho đúng dictionary như cách parse từng entry cũ"""
+    print("=== TEST JMDICT ITERPARSE ===")
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "JMdict_e.gz")
+        write_sample_jmdict(path)
+        result = download_jmdict.parse_jmdict_to_dict_full(path)
+        assert result == legacy_parse(path)
+        assert list(result) == list(legacy_parse(path))
+        assert result["生産"] == "しょうさん"
+        assert result["生產"] == "せいさん"
+        assert result["管理"] == "かんり"
+        assert "問題" in result and result["問題"] == "もんだい"
+        assert "コーヒー豆" not in result
+        assert download_jmdict.parse_jmdict_to_dict_full(os.path.join(folder, "missing.gz")) == {}
+    print(f"✓ {len(result)} từ, giống cách parse cũ")
+
+
+def test_reading_index_keeps_all_readings():
+    """Reading index: giữ mọi reading, áp re_restr/re_nokanji, xếp theo ke_pri/re_pri"""
+    print("=== TEST JMDICT READING INDEX ===")
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "JMdict_e.gz")
+        index_path = os.path.join(folder, "jmdict.readidx")
+        write_sample_jmdict(path, extra_xml=FULL_ENTRIES_XML)
+        assert download_jmdict.build_jmdict_reading_index(path, index_path) > 0
+
+        index = ReadingIndex(index_path)
+        try:
+            # 2 entry cùng keb được gộp, reading trùng chỉ giữ bản điểm tốt nhất
+            assert [r.reading for r in index["市場"]] == ["しじょう", "いちば", "いちじょう"]
+            assert index["市場"][0].common and not index["市場"][2].common
+            # re_restr: にっぽん chỉ cho 日本; re_nokanji: không có ジャパン; keb oK xếp sau
+            assert [r.reading for r in index["日本"]] == ["にほん", "にっぽん"]
+            assert index["日本"][1].restricted
+            assert [r.reading for r in index["日夲"]] == ["にほん"]
+            assert index["日夲"][0].score > index["日本"][0].score
+            # reading katakana được giữ (cách cũ bỏ mất)
+            assert index.best_reading("頁") == "ページ"
+            assert index.best_reading("頁", allow_katakana=False) == "けつ"
+            assert index["頁"][0].katakana
+            assert "コーヒー豆" in index and index.best_reading("ない") is None
+            assert [r.reading for r in index["管理"]] == ["カンリ", "かんり"]
+            assert index.best_reading("管理", allow_katakana=False) == "かんり"
+            assert index.source_sha256 == download_jmdict.file_sha256(path)
+        finally:
+            index.close()
+
+        # add_ruby_new --readings: báo cáo từ thiếu có gợi ý reading
+        report_docx = os.path.join(folder, "out.docx")
+        add_ruby_new.configure_reading_index(index_path)
+        try:
+            add_ruby_new.save_missing_kanji_report({"市場", "未知"}, report_docx)
+        finally:
+            add_ruby_new.configure_reading_index(None)
+        with open(report_docx.replace(".docx", "_missing_kanji.txt"), "r", encoding="utf-8") as f:
+            report = f.read()
+        assert "市場: しじょう (common), いちば (common), いちじょう" in report
+        assert "未知:" not in report
+
+        # file cắt cụt (giữa bảng offset / cuối blob) -> ValueError, --readings chỉ báo lỗi rồi tắt index
+        for size in (os.path.getsize(index_path) - 1, HEADER.size + 6):
+            with open(index_path, "r+b") as f:
+                f.truncate(size)
+            try:
+                ReadingIndex(index_path)
+                assert False, "file cắt cụt phải bị từ chối"
+            except ValueError:
+                pass
+            add_ruby_new.configure_reading_index(index_path)
+            assert add_ruby_new.lookup_readings("市場") == ()
+    print("✓ Reading index đúng re_restr / ưu tiên / katakana")
+
+
+def test_sharded_parallel_matches_sequential():
+    """Cắt nhiều shard nhỏ + 2 worker: dictionary (cả thứ tự key) và reading index giống hệt chạy 1 shard"""
+    print("=== TEST JMDICT SHARDS ===")
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "JMdict_e.gz")
+        write_sample_jmdict(path, repeat=20, extra_xml=FULL_ENTRIES_XML)
+        shards = list(download_jmdict.iter_jmdict_shards(path, shard_size=512))
+        assert len(shards) > 10
+        assert all(shard.count(b"<!ENTITY n ") == 1 and shard.endswith(b"</JMdict>\n") for shard in shards)
+
+        sequential = download_jmdict.parse_jmdict_to_dict_full(path)
+        parallel = download_jmdict.parse_jmdict_to_dict_full(path, workers=2, shard_size=512)
+        assert list(parallel.items()) == list(sequential.items())
+        assert parallel == legacy_parse(path)
+
+        index_one = os.path.join(folder, "one.readidx")
+        index_many = os.path.join(folder, "many.readidx")
+        download_jmdict.build_jmdict_reading_index(path, index_one)
+        download_jmdict.build_jmdict_reading_index(path, index_many, workers=2, shard_size=512)
+        with open(index_one, "rb") as a, open(index_many, "rb") as b:
+            assert a.read() == b.read()
+    print(f"✓ {len(shards)} shard, kết quả giống chạy tuần tự")
+
+
+if __name__ == "__main__":
+    test_iterparse_matches_legacy_parser()
+    test_reading_index_keeps_all_readings()
+    test_sharded_parallel_matches_sequential()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+
+from kanji_matcher import KanjiMatcher
+from kanji_normalize import clean_kanji_word, normalize_for_matching
+import add_ruby_new
+
+
+def reference_spans(text, keys, max_len=12):
+    """Thuật toán cửa sổ cũ (12 -> 3 rồi 2 -> 1) để so sánh"""
+    covered = [False] * len(text)
+    spans = []
+    for length in range(min(max_len, len(text)), 0, -1):
+        for i in range(len(text) - length + 1):
+            if any(covered[i:i + length]):
+                continue
+            if text[i:i + length] in keys:
+                spans.append((i, i + length))
+                for j in range(i, i + length):
+                    covered[j] = True
+    spans.sort()
+    return spans
+
+
+def test_same_spans_as_window_scan():
+    """Automaton phải chọn đúng các match như thuật toán cửa sổ cũ"""
+    print("=== TEST AUTOMATON == WINDOW SCAN ===")
+    rng = random.Random(0)
+    alphabet = "品質管理日本学校生活のはをに"
+    keys = {"".join(rng.choice(alphabet) for _ in range(rng.randint(1, 5))) for _ in range(150)}
+    matcher = KanjiMatcher(keys)
+
+    for _ in range(300):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        spans, covered = matcher.find_spans(text)
+        assert spans == reference_spans(text, keys), text
+        for start, end in spans:
+            assert all(covered[start:end])
+    print("✓ 300 đoạn text ngẫu nhiên khớp")
+
+
+def test_longest_first_not_leftmost():
+    """Từ dài hơn thắng dù nằm bên phải (ngữ nghĩa 12 -> 1 cũ)"""
+    matcher = KanjiMatcher({"品質", "質管理"})
+    spans, _ = matcher.find_spans("品質管理")
+    assert spans == [(1, 4)]
+
+
+def test_find_kanji_matches_optimized():
+    """find_kanji_matches_optimized trả đúng tuple và ghi nhận kanji thiếu"""
+    dictionary = {
+        "品質管理": {"rt": "ひんしつかんり", "map": None},
+        "日本": {"rt": "にほん", "map": None},
+    }
+    add_ruby_new.missing_kanji.clear()
+    matches = add_ruby_new.find_kanji_matches_optimized("⽇本の品質管理と鉄", dictionary)
+    assert matches == [
+        (0, 2, "日本", "にほん", None),
+        (3, 7, "品質管理", "ひんしつかんり", None),
+    ]
+    assert add_ruby_new.missing_kanji == {"鉄"}
+
+
+def test_normalize_offsets():
+    """Bảng offset trỏ đúng về ký tự gốc sau khi bỏ ký tự nhiễu"""
+    text = "ab⽇ 本x"
+    normalized, offsets = normalize_for_matching(text)
+    assert normalized == "日本"
+    assert offsets == [2, 4]
+    assert clean_kanji_word(text) == normalized
+    assert normalize_for_matching("日本の") == ("日本の", None)
+
+
+def test_matches_land_on_original_chars():
+    """Match trên text đã chuẩn hóa nhưng (start, end) là vị trí trong text gốc"""
+    dictionary = {"日本": {"rt": "にほん", "map": None}}
+    text = "abc日 本xyz"
+    matches = add_ruby_new.find_kanji_matches_optimized(text, dictionary)
+    assert matches == [(3, 6, "日本", "にほん", None)]
+    start, end = matches[0][:2]
+    assert text[:start] == "abc" and text[end:] == "xyz"
+
+
+if __name__ == "__main__":
+    test_same_spans_as_window_scan()
+    test_longest_first_not_leftmost()
+    test_find_kanji_matches_optimized()
+    test_normalize_offsets()
+    test_matches_land_on_original_chars()
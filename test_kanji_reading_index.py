@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+
+import add_ruby_new
+import convert_dict_to_struct as converter
+import kanji_reading_index
+from kanji_reading_index import KanjiReadingIndex
+from match_cache import MatchCache
+from test_furigana_align import LEXICON
+
+
+def test_index_from_dictionary_and_dict_struct():
+    """Index dựng từ dictionary {surface: reading} và từ dict_struct đã convert phải giống nhau, ghi/đọc lại không đổi"""
+    print("=== TEST KANJI READING INDEX ===")
+    with tempfile.TemporaryDirectory() as folder:
+        source = os.path.join(folder, "dictionary.json")
+        struct_path = os.path.join(folder, "dict_struct.json")
+        with open(source, "w", encoding="utf-8") as f:
+            json.dump(LEXICON, f, ensure_ascii=False, indent=2)
+
+        table, index_path = kanji_reading_index.build_kanji_reading_index(source)
+        assert index_path == os.path.join(folder, "dictionary.kanjiidx")
+        converter.convert(source, struct_path, table=table)
+        struct_table, struct_index = kanji_reading_index.build_kanji_reading_index(struct_path)
+        assert struct_table.counts == table.counts
+
+        index = KanjiReadingIndex(struct_index)
+        assert index.counts == table.counts
+        assert index.source_sha256 == converter.file_sha256(struct_path)
+        assert index.best_reading("書") == "しょ" and index.readings("書") == ["しょ", "か"]
+        assert index.best_reading("本") == "ほん" and index.best_reading("々") is None
+        assert index.best_reading("猫") is None
+
+        with open(struct_index, "r+b") as f:
+            f.truncate(os.path.getsize(struct_index) - 1)
+        try:
+            KanjiReadingIndex(struct_index)
+            assert False, "file cắt cụt phải bị từ chối"
+        except ValueError:
+            pass
+    print(f"✓ {len(table)} kanji, dictionary và dict_struct cho cùng index")
+
+
+def test_single_kanji_fallback_match():
+    """
+    Kanji đơn không có trong dictionary: gắn reading từ index, vẫn ghi vào missing; cụm kanji lạ (明日)
+    không được gắn từng kanji; cache tách theo index
+    """
+    dictionary = {"問題": {"rt": "もんだい", "map": [{"i": 0, "ch": "問", "rt": "もん"},
+                                                    {"i": 1, "ch": "題", "rt": "だい"}]}}
+    text = "本の問題書と明日"
+    with tempfile.TemporaryDirectory() as folder:
+        source = os.path.join(folder, "dictionary.json")
+        with open(source, "w", encoding="utf-8") as f:
+            json.dump(LEXICON, f, ensure_ascii=False)
+        _, index_path = kanji_reading_index.build_kanji_reading_index(source)
+
+        missing = set()
+        plain = add_ruby_new.find_kanji_matches_optimized(text, dictionary, missing)
+        assert [m[2] for m in plain] == ["問題"] and missing == {"本", "書", "明", "日"}
+
+        add_ruby_new.configure_kanji_index(index_path)
+        try:
+            missing = set()
+            matches = add_ruby_new.find_kanji_matches_optimized(text, dictionary, missing)
+            # 書 sát 問題 (đã match) vẫn là kanji đứng riêng; 明日 là cụm chưa match -> không gắn
+            assert [m[:4] for m in matches] == [(0, 1, "本", "ほん"), (2, 4, "問題", "もんだい"), (4, 5, "書", "しょ")]
+            assert matches[0][4] == [{"i": 0, "ch": "本", "rt": "ほん"}]
+            assert missing == {"本", "書", "明", "日"}
+            assert add_ruby_new.get_match_cache(dictionary).variant.startswith("kanji-index:")
+        finally:
+            add_ruby_new.configure_kanji_index(None)
+        assert add_ruby_new.find_kanji_matches_optimized(text, dictionary) == plain
+
+        # cache SQLite: cùng dictionary, khác index -> fingerprint khác
+        db_path = os.path.join(folder, "cache.sqlite")
+        assert MatchCache(dictionary, db_path)._db() is not None
+        with_index = MatchCache(dictionary, db_path, variant="kanji-index:x")
+        with_index._db()
+        assert with_index._fingerprint.endswith("+kanji-index:x")
+    print("✓ fallback reading cho kanji đơn")
+
+
+if __name__ == "__main__":
+    test_index_from_dictionary_and_dict_struct()
+    test_single_kanji_fallback_match()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+
+import add_ruby_new
+from test_parallel_annotation import build_sample, read_document_xml
+
+
+def test_sqlite_cache_reused_between_runs():
+    """Lần chạy 2 (cache RAM đã bị bỏ) phải lấy kết quả từ SQLite, output giống hệt"""
+    print("=== TEST MATCH CACHE ===")
+    with tempfile.TemporaryDirectory() as folder:
+        input_path, dictionary_path = build_sample(folder)
+        cache_path = os.path.join(folder, "matches.sqlite")
+        first_out = os.path.join(folder, "first.docx")
+        second_out = os.path.join(folder, "second.docx")
+
+        try:
+            add_ruby_new.configure_match_cache(cache_path)
+            first = add_ruby_new.process_word_document(input_path, first_out, dictionary_path)
+            assert first["match_cache_misses"] > 0
+
+            # giả lập lần chạy mới: cache RAM trống, chỉ còn SQLite
+            add_ruby_new.configure_match_cache(cache_path)
+            second = add_ruby_new.process_word_document(input_path, second_out, dictionary_path)
+            assert second["match_cache_misses"] == 0
+            assert second["match_cache_hits"] == first["match_cache_hits"] + first["match_cache_misses"]
+            assert read_document_xml(first_out) == read_document_xml(second_out)
+            assert first["missing_kanji"] == second["missing_kanji"]
+
+            # đổi dictionary -> fingerprint khác -> không dùng lại kết quả cũ
+            with open(dictionary_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            data["楽"] = "たの"
+            with open(dictionary_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            add_ruby_new.configure_match_cache(cache_path)
+            third = add_ruby_new.process_word_document(input_path, second_out, dictionary_path)
+            assert third["match_cache_hits"] < second["match_cache_hits"]
+            assert "楽" not in third["missing_kanji"]
+        finally:
+            add_ruby_new.configure_match_cache(None)
+        print("✓ Cache SQLite dùng lại đúng và bị bỏ khi dictionary đổi")
+
+
+if __name__ == "__main__":
+    test_sqlite_cache_reused_between_runs()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import glob
+import os
+import random
+import re
+
+import add_ruby_to_xml_moodle_format as moodle
+
+RUBY_PAIR_PATTERN = re.compile(r'<ruby>(.*?)<rt>(.*?)</rt></ruby>', re.DOTALL)
+TEXT_PATTERN = re.compile(r'<text><!\[CDATA\[(.*?)\]\]></text>', re.DOTALL)
+
+
+def legacy_add_ruby_to_text(text, dictionary):
+    """add_ruby_to_text trước khi tối ưu (để so sánh)"""
+    if not text or not moodle.has_japanese(text) or moodle.has_ruby_tags(text):
+        return text
+
+    pattern = r'問題([０-９]+)'
+    def replace_problem_number(match):
+        number = match.group(1)
+        number_reading = ''.join([moodle.fullwidth_numbers.get(ch, ch) for ch in number])
+        return f'<ruby>問題<rt>もんだい</rt></ruby><ruby>{number}<rt>{number_reading}</rt></ruby>'
+    processed_text = re.sub(pattern, replace_problem_number, text)
+
+    matches = moodle.find_kanji_matches(processed_text, dictionary)
+    if not matches:
+        return processed_text
+
+    result = ""
+    last_end = 0
+    for start, end, kanji, hiragana in matches:
+        result += processed_text[last_end:start]
+        result += f"<ruby>{kanji}<rt>{hiragana}</rt></ruby>"
+        last_end = end
+    result += processed_text[last_end:]
+    return result
+
+
+def load_sample():
+    """(texts đã gỡ ruby, dictionary dựng từ các cặp ruby) từ file XML mẫu"""
+    folder = os.path.dirname(os.path.abspath(__file__))
+    with open(glob.glob(os.path.join(folder, "questions-*.xml"))[0], "r", encoding="utf-8") as f:
+        xml_content = f.read()
+
+    dictionary = {kanji: rt for kanji, rt in RUBY_PAIR_PATTERN.findall(xml_content)}
+    dictionary.update(moodle.fullwidth_numbers)
+    texts = [RUBY_PAIR_PATTERN.sub(r'\1', t) for t in TEXT_PATTERN.findall(xml_content)]
+    return [t for t in texts if moodle.has_japanese(t)], dictionary
+
+
+def reference_find_kanji_matches(text, dictionary, missing):
+    """Thuật toán cũ (cắt chuỗi 10 -> 1 tại mỗi vị trí) để so sánh"""
+    if not text or not moodle.has_japanese(text):
+        return []
+    matches = []
+    text_len = len(text)
+    covered = [False] * text_len
+    for ruby_match in moodle.RUBY_PATTERN.finditer(text):
+        for i in range(*ruby_match.span()):
+            covered[i] = True
+    i = 0
+    while i < text_len:
+        if covered[i] or moodle.is_choice_marker(text, i):
+            i += 1
+            continue
+        found = False
+        for length in range(min(10, text_len - i), 0, -1):
+            substring = text[i:i + length]
+            if substring in dictionary and not any(covered[i:i + length]):
+                matches.append((i, i + length, substring, dictionary[substring]))
+                for j in range(i, i + length):
+                    covered[j] = True
+                i += length
+                found = True
+                break
+        if found:
+            continue
+        if moodle.FULLWIDTH_NUMBER_PATTERN.match(text[i]):
+            start = i
+            while i < text_len and not covered[i] and moodle.FULLWIDTH_NUMBER_PATTERN.match(text[i]):
+                i += 1
+            num_str = text[start:i]
+            matches.append((start, i, num_str, ''.join(moodle.fullwidth_numbers.get(ch, ch) for ch in num_str)))
+            for j in range(start, i):
+                covered[j] = True
+            continue
+        i += 1
+    for i in range(text_len):
+        if not covered[i] and moodle.has_kanji(text[i]) and not moodle.is_choice_marker(text, i):
+            missing.add(text[i])
+    return matches
+
+
+def test_trie_matches_same_as_window_scan():
+    """Trie 1 lượt phải cho đúng matches + kanji thiếu như thuật toán cũ"""
+    print("=== TEST MOODLE TRIE MATCHER ===")
+    rng = random.Random(7)
+    alphabet = "品質管理日本学校生活問題鉄のはをアイ．１２３"
+    pieces = list(alphabet) + ["<ruby>日本<rt>にほん</rt></ruby>", "<p>", "</p>", "ア．", "イ．"]
+
+    # dictionary có cả số full-width lẻ (như load_dictionary) và không có (nhánh gom chuỗi số)
+    for with_digits in (True, False):
+        dictionary = {"".join(rng.choice("品質管理日本学校生活問題") for _ in range(rng.randint(1, 4))): "よみ"
+                      for _ in range(60)}
+        dictionary["品質管理"] = "ひんしつかんり"
+        if with_digits:
+            dictionary.update(moodle.fullwidth_numbers)
+
+        for _ in range(400):
+            text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 30)))
+            expected_missing = set()
+            expected = reference_find_kanji_matches(text, dictionary, expected_missing)
+
+            moodle.missing_kanji.clear()
+            assert moodle.find_kanji_matches(text, dictionary) == expected, text
+            assert moodle.missing_kanji == expected_missing, text
+    print("✓ 800 đoạn text ngẫu nhiên khớp")
+
+
+def test_add_ruby_to_text_same_as_legacy():
+    """annotate_text (ghép list + fragment đã cache) cho đúng chuỗi như bản cũ trên XML mẫu"""
+    texts, dictionary = load_sample()
+    texts += ["問題１２　生産管理", "ア．生産", ""]
+    for text in texts:
+        assert moodle.add_ruby_to_text(text, dictionary) == legacy_add_ruby_to_text(text, dictionary), text
+
+
+if __name__ == "__main__":
+    test_trie_matches_same_as_window_scan()
+    test_add_ruby_to_text_same_as_legacy()
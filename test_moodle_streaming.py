@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import glob
+import json
+import os
+import tempfile
+
+import add_ruby_to_xml_moodle_format as moodle
+
+DICTIONARY = {"生産": "せいさん", "管理": "かんり", "記述": "きじゅつ", "適切": "てきせつ", "計画": "けいかく"}
+
+
+def test_streaming_identical_to_regex_mode():
+    """Chế độ streaming (iterparse) phải ghi ra đúng từng byte như chế độ regex trên file XML mẫu"""
+    print("=== TEST MOODLE STREAMING ===")
+    sample = glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions-*.xml"))[0]
+    with tempfile.TemporaryDirectory() as folder:
+        dictionary_path = os.path.join(folder, "dict.json")
+        with open(dictionary_path, "w", encoding="utf-8") as f:
+            json.dump(DICTIONARY, f, ensure_ascii=False)
+        regex_out = os.path.join(folder, "regex.xml")
+        stream_out = os.path.join(folder, "stream.xml")
+
+        moodle.process_xml_file(sample, regex_out, dictionary_path)
+        regex_missing = set(moodle.missing_kanji)
+        stats = moodle.process_xml_file_streaming(sample, stream_out, dictionary_path)
+        processed = stats["processed_html_count"]
+
+        with open(regex_out, "rb") as a, open(stream_out, "rb") as b:
+            regex_bytes, stream_bytes = a.read(), b.read()
+        assert regex_bytes == stream_bytes
+        assert processed > 0
+        assert moodle.missing_kanji == regex_missing
+        assert stats["missing_kanji"] == sorted(regex_missing)
+        # tag đã thêm ruby vẫn giữ format="html"
+        assert b'<answer fraction="0" format="html">' in stream_bytes
+        print(f"✓ Giống hệt ({processed} tag đã thêm ruby)")
+
+
+def test_parallel_folder_matches_sequential():
+    """process_xml_folder chạy song song phải cho output + báo cáo gộp giống khi chạy tuần tự"""
+    print("=== TEST MOODLE BATCH ===")
+    sample = glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions-*.xml"))[0]
+    with open(sample, "rb") as f:
+        sample_bytes = f.read()
+    with tempfile.TemporaryDirectory() as folder:
+        dictionary_path = os.path.join(folder, "dict.json")
+        with open(dictionary_path, "w", encoding="utf-8") as f:
+            json.dump(DICTIONARY, f, ensure_ascii=False)
+        for name in ("a.xml", "b.xml", "c.xml"):
+            with open(os.path.join(folder, name), "wb") as f:
+                f.write(sample_bytes)
+
+        sequential = moodle.process_xml_folder(folder, dictionary_path, jobs=1)
+        outputs = {}
+        for item in sequential["files"]:
+            with open(item["output"], "rb") as f:
+                outputs[item["output"]] = f.read()
+
+        # chạy lại: file output của lần trước không bị coi là input
+        parallel = moodle.process_xml_folder(folder, dictionary_path, jobs=3, stream=True)
+        assert parallel["files_processed"] == sequential["files_processed"] == 3
+        assert parallel["files_failed"] == 0
+        assert parallel["processed_html_count"] == sequential["processed_html_count"]
+        assert parallel["missing_kanji_count"] == sequential["missing_kanji_count"] > 0
+        for item in parallel["files"]:
+            with open(item["output"], "rb") as f:
+                assert f.read() == outputs[item["output"]]
+
+        with open(os.path.join(folder, "moodle_batch_summary.json"), "r", encoding="utf-8") as f:
+            assert json.load(f)["jobs"] == 3
+        with open(parallel["missing_kanji_report"], "r", encoding="utf-8") as f:
+            merged = [line for line in f.read().splitlines()[2:] if line]
+        assert len(merged) == parallel["missing_kanji_count"]
+        print(f"✓ 3 file, {parallel['processed_html_count']} tag, "
+              f"{parallel['missing_kanji_count']} kanji thiếu (gộp)")
+
+
+if __name__ == "__main__":
+    test_streaming_identical_to_regex_mode()
+    test_parallel_folder_matches_sequential()
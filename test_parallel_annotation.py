@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+from docx import Document
+
+import add_ruby_new
+
+DICTIONARY = {
+    "日本": "にほん",
+    "学校": "がっこう",
+    "生活": "せいかつ",
+    "品質管理": {"rt": "ひんしつかんり", "map": [
+        {"i": 0, "ch": "品", "rt": "ひん"}, {"i": 1, "ch": "質", "rt": "しつ"},
+        {"i": 2, "ch": "管", "rt": "かん"}, {"i": 3, "ch": "理", "rt": "り"},
+    ]},
+}
+
+LINES = [
+    "日本の品質管理について説明する。",
+    "学校生活は楽しい。",
+    "English only paragraph",
+    "問題１ 次の記述のうち、品質管理として最も適切なものはどれか。",
+]
+
+
+def build_sample(folder):
+    doc = Document()
+    for n in range(30):
+        p = doc.add_paragraph(LINES[n % len(LINES)])
+        run = p.add_run("学校")
+        run.bold = True
+    table = doc.add_table(rows=2, cols=2)
+    for row in table.rows:
+        for cell in row.cells:
+            cell.text = "学校の日本語"
+    # table lồng trong ô: cả 2 engine đều phải thêm ruby
+    table.cell(1, 1).add_table(rows=1, cols=1).cell(0, 0).text = "中の学校"
+    input_path = os.path.join(folder, "input.docx")
+    doc.save(input_path)
+
+    dictionary_path = os.path.join(folder, "dict.json")
+    with open(dictionary_path, "w", encoding="utf-8") as f:
+        json.dump(DICTIONARY, f, ensure_ascii=False)
+    return input_path, dictionary_path
+
+
+def read_document_xml(path):
+    with zipfile.ZipFile(path) as z:
+        return z.read("word/document.xml")
+
+
+def test_parallel_output_identical():
+    """--workers N phải cho ra document.xml giống hệt bản tuần tự"""
+    print("=== TEST PARALLEL == SERIAL ===")
+    with tempfile.TemporaryDirectory() as folder:
+        input_path, dictionary_path = build_sample(folder)
+        serial_out = os.path.join(folder, "serial.docx")
+        parallel_out = os.path.join(folder, "parallel.docx")
+
+        add_ruby_new.process_word_document(input_path, serial_out, dictionary_path)
+        serial_missing = set(add_ruby_new.missing_kanji)
+        add_ruby_new.process_word_document(input_path, parallel_out, dictionary_path, workers=2)
+        parallel_missing = set(add_ruby_new.missing_kanji)
+
+        assert read_document_xml(serial_out) == read_document_xml(parallel_out)
+        assert serial_missing == parallel_missing
+        print("✓ Output giống hệt")
+
+
+def test_batch_skips_up_to_date_outputs():
+    """Batch mode: lần 2 bỏ qua file đã có output mới hơn input và dictionary"""
+    print("=== TEST BATCH MODE ===")
+    with tempfile.TemporaryDirectory() as folder:
+        input_path, dictionary_path = build_sample(folder)
+        shutil.copy(input_path, os.path.join(folder, "second.docx"))
+        out_dir = os.path.join(folder, "out")
+
+        summary = add_ruby_new.process_batch(folder, dictionary_path, output_dir=out_dir, jobs=2)
+        assert summary["files_processed"] == 2 and summary["files_skipped"] == 0
+        assert os.path.exists(os.path.join(out_dir, "input_ruby.docx"))
+        assert os.path.exists(os.path.join(out_dir, "batch_summary.json"))
+        assert all(item["processed_paragraphs"] > 0 for item in summary["files"])
+
+        # output batch giống hệt khi xử lý riêng từng file
+        serial_out = os.path.join(out_dir, "serial.docx")
+        add_ruby_new.process_word_document(input_path, serial_out, dictionary_path)
+        assert read_document_xml(os.path.join(out_dir, "input_ruby.docx")) == read_document_xml(serial_out)
+
+        summary = add_ruby_new.process_batch(folder, dictionary_path, output_dir=out_dir, jobs=2)
+        assert summary["files_processed"] == 0 and summary["files_skipped"] == 2
+        print("✓ Batch xử lý và bỏ qua đúng")
+
+
+if __name__ == "__main__":
+    test_parallel_output_identical()
+    test_batch_skips_up_to_date_outputs()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from docx import Document
+from lxml import etree
+
+from add_ruby_new import _build_ruby_element, create_ruby_element
+
+
+def test_template_clone_same_xml():
+    """Element clone từ template phải giống hệt element dựng từ đầu"""
+    print("=== TEST RUBY TEMPLATE ===")
+    doc = Document()
+    p = doc.add_paragraph()
+    plain = p.add_run("a")
+    styled = p.add_run("b")
+    styled.bold = True
+    styled.font.highlight_color = 7
+    styled.font.size = 200000
+
+    for run in (None, plain, styled):
+        for kanji, hiragana in [("日本", "にほん"), ("明日", "あす あした"), ("品", "ひん")]:
+            expected = etree.tostring(_build_ruby_element(kanji, hiragana, run))
+            actual = etree.tostring(create_ruby_element(kanji, hiragana, run))
+            assert actual == expected, (kanji, hiragana)
+
+    # element clone ra là bản độc lập
+    a = create_ruby_element("日本", "にほん", styled)
+    b = create_ruby_element("学校", "がっこう", styled)
+    assert a is not b and a[2][0][-1].text == "日本"
+    print("✓ XML giống hệt")
+
+
+if __name__ == "__main__":
+    test_template_clone_same_xml()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import glob
+import os
+import re
+import tempfile
+
+import convert_ruby_for_moodle as formats
+
+RUBY = r'<ruby>([^<]*)<rt>([^<]*)</rt></ruby>'
+EXTRA = (
+    '<question><name><text>  <![CDATA[<ruby>問題<rt>もんだい</rt></ruby>１]]>\n'
+    '  <![CDATA[ <ruby>管理<rt>かんり</rt></ruby>]]> </text></name>\n'
+    '<answer><text><ruby>生産<rt>せいさん</rt></ruby></text></answer></question>\n'
+)
+
+
+def legacy_merge_cdata(text):
+    """merge_cdata cũ của create_multiple_formats"""
+    def cdata_replacer(match):
+        all_cdata = re.findall(r'<!\[CDATA\[(.*?)\]\]>', match.group(0), re.DOTALL)
+        return f'<text><![CDATA[{"".join(all_cdata)}]]></text>'
+    return re.sub(r'<text>(?:\s*<!\[CDATA\[(.*?)\]\]>\s*)+</text>', cdata_replacer, text, flags=re.DOTALL)
+
+
+def legacy_outputs(content):
+    """3 format của create_multiple_formats cũ + create_version_without_ruby"""
+    return {
+        "parentheses": legacy_merge_cdata(re.sub(RUBY, r'\1(\2)', content)),
+        "brackets": legacy_merge_cdata(re.sub(RUBY, r'\1[\2]', content)),
+        "span": legacy_merge_cdata(re.sub(
+            RUBY, r'<span style="border-top: 1px solid #666; font-size: 0.8em; position: relative;" title="\2">\1</span>',
+            content)),
+        "plain": re.sub(RUBY, r'\1', content),
+    }
+
+
+def test_single_pass_matches_legacy_formats():
+    """Đọc 1 lần, ghi 4 format: từng file phải giống hệt cách làm cũ (mỗi format 1 lượt regex)"""
+    print("=== TEST RUBY FORMATS ===")
+    sample = glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions-*.xml"))[0]
+    with open(sample, "r", encoding="utf-8") as f:
+        content = f.read() + EXTRA
+    expected = legacy_outputs(content)
+
+    with tempfile.TemporaryDirectory() as folder:
+        input_file = os.path.join(folder, "input.xml")
+        with open(input_file, "w", encoding="utf-8") as f:
+            f.write(content)
+        outputs = {os.path.join(folder, f"{name}.xml"): name for name in expected}
+        ruby_count = formats.write_ruby_formats(input_file, outputs)
+
+        assert ruby_count == len(re.findall(RUBY, content)) > 0
+        for output_file, name in outputs.items():
+            with open(output_file, "r", encoding="utf-8") as f:
+                assert f.read() == expected[name], name
+
+    assert formats.convert_ruby_for_moodle(content) == expected["parentheses"]
+    formats.register_renderer("tortoise", lambda kanji, hiragana: f"{kanji}〔{hiragana}〕")
+    try:
+        assert "問題〔もんだい〕１ 管理〔かんり〕" in formats.render_ruby_text(EXTRA, "tortoise")
+    finally:
+        del formats.RENDERERS["tortoise"]
+    print(f"✓ {ruby_count} ruby, 4 format giống cách làm cũ")
+
+
+if __name__ == "__main__":
+    test_single_pass_matches_legacy_formats()
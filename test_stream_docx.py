@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import zipfile
+
+from docx import Document
+from lxml import etree
+
+import add_ruby_new
+from stream_docx import process_word_document_streaming
+from test_parallel_annotation import build_sample
+
+W_P = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p"
+
+
+def paragraph_xml(path):
+    """Canonical XML (exclusive c14n) của từng <w:p> trong document.xml"""
+    with zipfile.ZipFile(path) as z:
+        root = etree.fromstring(z.read("word/document.xml"))
+    return [etree.tostring(p, method="c14n", exclusive=True) for p in root.iter(W_P)]
+
+
+def test_stream_engine_same_paragraphs():
+    """Engine streaming phải cho ra paragraph giống hệt engine python-docx"""
+    print("=== TEST STREAM ENGINE ===")
+    with tempfile.TemporaryDirectory() as folder:
+        input_path, dictionary_path = build_sample(folder)
+        docx_out = os.path.join(folder, "docx.docx")
+        stream_out = os.path.join(folder, "stream.docx")
+
+        docx_stats = add_ruby_new.process_word_document(input_path, docx_out, dictionary_path)
+        stream_stats = process_word_document_streaming(input_path, stream_out, dictionary_path)
+
+        assert paragraph_xml(docx_out) == paragraph_xml(stream_out)
+        nested = [p for p in paragraph_xml(docx_out) if "中の".encode("utf-8") in p]
+        assert len(nested) == 1 and b"w:ruby" in nested[0]
+        for key in ("total_paragraphs", "japanese_paragraphs", "processed_paragraphs", "missing_kanji"):
+            assert docx_stats[key] == stream_stats[key], key
+
+        # các part khác copy nguyên byte
+        with zipfile.ZipFile(input_path) as zin, zipfile.ZipFile(stream_out) as zout:
+            assert zin.namelist() == zout.namelist()
+            for name in zin.namelist():
+                if name != "word/document.xml":
+                    assert zin.read(name) == zout.read(name), name
+
+        # python-docx vẫn mở được file output
+        assert len(Document(stream_out).paragraphs) == len(Document(docx_out).paragraphs)
+        print("✓ Paragraph giống hệt")
+
+
+def test_stream_engine_rejects_docx_only_options():
+    """--workers / --incremental không áp dụng cho engine stream -> báo lỗi thay vì bỏ qua"""
+    for extra in (["--workers", "2"], ["--incremental"]):
+        try:
+            add_ruby_new.parse_args(["in.docx", "--engine", "stream"] + extra)
+            assert False, extra
+        except SystemExit as e:
+            assert e.code == 2
+    args = add_ruby_new.parse_args(["in.docx", "--workers", "2", "--incremental"])
+    assert args.workers == 2 and args.incremental
+
+
+if __name__ == "__main__":
+    test_stream_engine_same_paragraphs()
+    test_stream_engine_rejects_docx_only_options()